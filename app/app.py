@@ -1,6 +1,6 @@
 # Load needed libraries
 import streamlit as st      # For streamlit framework
-from src.sepsis_mortality_risk_predictor import SepsisMortalityRiskPredictor
+from src.sepsis_mortality_risk_predictor import get_prediction_model_handle
 import src.data_loader as data_loader
 import datetime
 import random
@@ -49,9 +49,9 @@ if "training_finished" not in st.session_state:
 if "patient_order" not in st.session_state:
     st.session_state.patient_order = 1
 
-# Session state for the prediction model
+# Session state for the prediction model, which is loaded in the background
 if "sepsis_prediction_model" not in st.session_state:
-    st.session_state.sepsis_prediction_model = SepsisMortalityRiskPredictor()
+    st.session_state.sepsis_prediction_model = get_prediction_model_handle()
 
 
 ### Study Flow Session State Variables ###
@@ -147,10 +147,10 @@ if 'patient' not in st.session_state:
     st.session_state.patient = None
 if 'counterfactual_patient' not in st.session_state:
     st.session_state.counterfactual_patient = None
-if 'counterfactual_data_changed' not in st.session_state:
-    st.session_state.counterfactual_data_changed = False
-if 'counterfactual_changed_state_changed' not in st.session_state:
-    st.session_state.counterfactual_changed_state_changed = False
+if 'counterfactual_engine' not in st.session_state:
+    st.session_state.counterfactual_engine = None
+if 'scenario_store' not in st.session_state:
+    st.session_state.scenario_store = None
 if 'static_feature_names' not in st.session_state:
     st.session_state.static_feature_names = None
 if 'timeseries_feature_names' not in st.session_state:
@@ -184,6 +184,18 @@ if "scenario_risk" not in st.session_state:
 # Initialize SHAP-related variables in session state.
 if 'shap_values' not in st.session_state:
     st.session_state.shap_values = None
+# Incremented whenever the SHAP values change; keys the memoized risk table.
+if 'shap_values_version' not in st.session_state:
+    st.session_state.shap_values_version = 0
+# Key of the pending SHAP job of the current patient (see submit_local_shap_values).
+if 'shap_job_key' not in st.session_state:
+    st.session_state.shap_job_key = None
+# Key of the pending SHAP job of the What-if scenario (see counterfactuals_xui.collect_scenario_shap_values).
+if 'scenario_shap_job_key' not in st.session_state:
+    st.session_state.scenario_shap_job_key = None
+# Next study patient, prepared while the current patient is evaluated (see data_loader.prefetch_patient_data).
+if 'prefetched_patient' not in st.session_state:
+    st.session_state.prefetched_patient = None
 if 'shap_group_contributions' not in st.session_state:
     st.session_state.shap_group_contributions = None
 
@@ -231,22 +243,15 @@ with st.sidebar:
     def load_training_patient():
         if not st.session_state.training_patient_loaded:
             data_loader.load_patient_data(3, 0)
-            # Calculate the risk for the patient
+            # load_patient_data() also sets the risk of the patient
             print("Checking if patient data is loaded...")
             if st.session_state.patient is None:
                 st.write("No patient data loaded. Please check the data loader.")
                 return
-            risk_array = st.session_state.sepsis_prediction_model.predict_sepsis_mortality_risk()
-            st.session_state.patient_risk = round(risk_array[0, 0], 2)
 
-            # Calculate the SHAP values for the patient
-            st.session_state.sepsis_prediction_model.generate_local_shap_values()
-
-            # Calculate the mean of timeseries SHAP values for the patient
-            st.session_state.sepsis_prediction_model.aggregate_timeseries_shap_values()
-
-            # Now aggregate the SHAP values into overall and category-specific evidence.
-            st.session_state.sepsis_prediction_model.aggregate_shap_values()
+            # Calculate the SHAP values for the patient in the background; they are aggregated
+            # into overall and category-specific evidence once the job has finished.
+            st.session_state.sepsis_prediction_model.submit_local_shap_values()
 
             # Set a new random seed for the button order
             st.session_state.random_seed = random.randint(1, 10000)
@@ -259,19 +264,11 @@ with st.sidebar:
             # If the patient evaluation is currently not running, load a new patient and start the new patient study.
             data_loader.load_patient_data(
                 st.session_state.study_xui_selection, st.session_state.current_patient_index)
+            # load_patient_data() also sets the patient's risk, predicted by the prefetch if the patient was prefetched.
 
-            # Calculate the risk for the patient
-            risk_array = st.session_state.sepsis_prediction_model.predict_sepsis_mortality_risk()
-            st.session_state.patient_risk = round(risk_array[0, 0], 2)
-
-            # Calculate the SHAP values for the patient
-            st.session_state.sepsis_prediction_model.generate_local_shap_values()
-
-            # Calculate the mean of timeseries SHAP values for the patient
-            st.session_state.sepsis_prediction_model.aggregate_timeseries_shap_values()
-
-            # Now aggregate the SHAP values into overall and category-specific evidence.
-            st.session_state.sepsis_prediction_model.aggregate_shap_values()
+            # Calculate the SHAP values for the patient in the background; they are aggregated
+            # into overall and category-specific evidence once the job has finished.
+            st.session_state.sepsis_prediction_model.submit_local_shap_values()
 
             if st.session_state.patient is not None:
                 # Start patient evaluation
@@ -367,7 +364,8 @@ with st.sidebar:
                 st.session_state.patient_risk = 0.0
                 st.session_state.scenario_risk = 0.0
                 st.session_state.counterfactual_patient = None
-                st.session_state.counterfactual_data_changed = False
+                st.session_state.counterfactual_engine = None
+                st.session_state.scenario_store = None
                 st.session_state.current_patient_index += 1
                 st.session_state.exploratory_view = None
 
@@ -472,6 +470,9 @@ with st.sidebar:
         if st.session_state.patient_evaluation_running:
             if st.button("Evaluate Patient",
                         type="primary",):
+                # Prepare the next patient in the background while this one is evaluated
+                data_loader.prefetch_patient_data(
+                    st.session_state.study_xui_selection, st.session_state.current_patient_index + 1)
                 # Show dialog when button is clicked
                 st.session_state.show_evaluation_dialog = True
                 evaluate_patient()
@@ -564,7 +565,8 @@ with st.sidebar:
                 st.session_state.patient_risk = 0.0
                 st.session_state.scenario_risk = 0.0
                 st.session_state.counterfactual_patient = None
-                st.session_state.counterfactual_data_changed = False
+                st.session_state.counterfactual_engine = None
+                st.session_state.scenario_store = None
                 st.rerun()
 
     else:
@@ -0,0 +1,30 @@
+"""
+Import-time benchmark of the app's modules and the ML stack they load lazily.
+Run from the app directory: python benchmarks/import_time.py
+Each module is imported in a fresh interpreter; streamlit and pandas are the baseline,
+as the Streamlit server has imported them before the first script run.
+"""
+import os
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+MODULES = ["streamlit, pandas", "src.sepsis_mortality_risk_predictor", "tensorflow", "shap"]
+
+
+def measure_import_time(module):
+    """Returns the seconds needed to import the module, without the interpreter start-up."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True,
+                   capture_output=True, cwd=APP_DIR)
+    total = time.perf_counter() - start
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    interpreter = time.perf_counter() - start
+    return total - interpreter
+
+
+if __name__ == "__main__":
+    for module in MODULES:
+        print(f"{module}: {measure_import_time(module):.2f} s")
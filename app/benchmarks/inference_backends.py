@@ -0,0 +1,59 @@
+"""
+Load time, peak memory and forward pass time of the Keras and NumPy inference backends.
+Run from the app directory: python benchmarks/inference_backends.py
+The Keras parity of the NumPy forward pass is tested in tests/test_numpy_inference.py.
+"""
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+MODEL_PATH = os.path.join(APP_DIR, "models", "sepsis_mortality_model.keras")
+LOAD_CODE = {
+    "numpy": "from src.numpy_inference import NumpyInferenceModel; "
+             f"NumpyInferenceModel.from_keras_archive({MODEL_PATH!r})",
+    "keras": f"import tensorflow as tf; tf.keras.models.load_model({MODEL_PATH!r})",
+}
+
+
+def measure_load(backend):
+    """Loads the model in a fresh interpreter; returns the seconds taken and the peak RSS in MiB."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", LOAD_CODE[backend] + "; import resource; "
+         "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"],
+        check=True, capture_output=True, text=True, cwd=APP_DIR)
+    return time.perf_counter() - start, int(result.stdout.split()[-1]) / 1024
+
+
+def measure_forward_pass(model, static_data, timeseries_data, repeats=20):
+    """Returns the average milliseconds of one forward pass."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model(static_data, timeseries_data)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, APP_DIR)
+    from src.numpy_inference import NumpyInferenceModel
+
+    for backend in LOAD_CODE:
+        seconds, peak_rss = measure_load(backend)
+        print(f"{backend}: model loaded in {seconds:.2f} s, peak RSS {peak_rss:.0f} MiB")
+
+    numpy_model = NumpyInferenceModel.from_keras_archive(MODEL_PATH)
+    input_names = numpy_model.input_names
+    static_shape, timeseries_shape = (
+        tuple(next(layer for layer in numpy_model.layers
+                   if layer["config"]["name"] == name)["config"]["batch_shape"][1:])
+        for name in input_names)
+    rng = np.random.default_rng(0)
+    static_data = rng.uniform(-1, 1, (512,) + static_shape).astype(np.float32)
+    timeseries_data = rng.uniform(-1, 1, (512,) + timeseries_shape).astype(np.float32)
+    for n_inputs in (1, 50, 512):
+        milliseconds = measure_forward_pass(
+            numpy_model, static_data[:n_inputs], timeseries_data[:n_inputs])
+        print(f"numpy forward pass of {n_inputs} inputs: {milliseconds:.2f} ms")
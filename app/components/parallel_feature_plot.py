@@ -16,8 +16,108 @@ def format_contribution(x):
         return f"{x:.2f}"  # Negative values already include the minus sign
 
 
-def create_parallel_feature_plot():
-    patient_base_statistics = st.session_state.patient_base
+def format_reference(meta):
+    """Formats the reference range of a feature's metadata as "lower-upper", or "" if it has none."""
+    normal_lower = meta.get("normal_lower", None)
+    normal_upper = meta.get("normal_upper", None)
+    if (normal_lower not in [None, "", "nan"] and normal_upper not in [None, "", "nan"] and
+            not pd.isna(normal_lower) and not pd.isna(normal_upper)):
+        return f"{normal_lower}-{normal_upper}"
+    return ""
+
+
+@st.cache_data(max_entries=32)
+def load_feature_table(patient_id, data_version, contributions: pd.Series,
+                       _patient, _patient_base, _feature_metadata) -> pd.DataFrame:
+    """
+    Builds the columnar table of all features of the plot for one patient: the survivor and
+    non-survivor ranges from PatientBase.get_statistics_table(), the patient's values, the units,
+    reference ranges, labels and SHAP contributions, sorted by the absolute contribution.
+    Cached per patient (id and data version) and contributions; the patient base statistics and
+    feature metadata are the same for all sessions.
+    """
+    features = _patient_base.get_available_features()
+    table = _patient_base.get_statistics_table(features)
+    table["survivors_mean"] = (table["survivors_lower"] + table["survivors_upper"]) / 2
+    table["non_survivors_mean"] = (
+        table["non_survivors_lower"] + table["non_survivors_upper"]) / 2
+    table["patient"] = _patient.get_feature_values(features)
+    table["contribution"] = contributions.reindex(features).fillna(0).to_numpy()
+
+    table["title"] = table.index.str.replace("_", " ").str.title()
+    table["option"] = table["title"] + " (" + table["contribution"].map(format_contribution) + ")"
+    units = pd.Series([_feature_metadata.get(feature, {}).get("unit", "") for feature in features],
+                      index=table.index, dtype=object)
+    table["unit"] = units.where(~units.isna() & ~units.isin(["nan", ""]), "")
+    table["reference"] = [format_reference(_feature_metadata.get(feature, {}))
+                          for feature in features]
+
+    return table.sort_values("contribution", key=abs, ascending=False, kind="stable")
+
+
+def build_plot_data(feature_table: pd.DataFrame):
+    """
+    Converts the rows of the selected features into the long format of the plot and the tooltip table.
+
+    Returns:
+        tuple: (df_long, tooltip_df), where df_long holds the Survivor, Non-Survivor and Patient points
+        (and the group bounds) of each feature with the values scaled per feature.
+    """
+    groups = {
+        "Survivor": "survivors_mean",
+        "Survivor_lower": "survivors_lower",
+        "Survivor_upper": "survivors_upper",
+        "Non-Survivor": "non_survivors_mean",
+        "Non-Survivor_lower": "non_survivors_lower",
+        "Non-Survivor_upper": "non_survivors_upper",
+        "Patient": "patient",
+    }
+    values = feature_table[list(groups.values())].to_numpy(dtype=float)
+
+    # Scale each feature independently into [0, 1] with 10% padding, ignoring missing values.
+    # Missing values and features whose valid values are all the same are placed in the middle.
+    min_values = pd.DataFrame(values).min(axis=1).to_numpy()[:, np.newaxis]
+    max_values = pd.DataFrame(values).max(axis=1).to_numpy()[:, np.newaxis]
+    padding = 0.1 * (max_values - min_values)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scaled = (values - (min_values - padding)) / \
+            ((max_values + padding) - (min_values - padding))
+    scaled[np.broadcast_to(max_values == min_values, scaled.shape) | np.isnan(scaled)] = 0.5
+
+    n_features, n_groups = values.shape
+    df_long = pd.DataFrame({
+        "Feature": np.repeat(feature_table["title"].to_numpy(), n_groups),
+        "Group": np.tile(list(groups), n_features),
+        "Value": values.ravel(),
+        "Scaled Value": scaled.ravel(),
+    })
+    # Flag missing patient data.
+    df_long["IsMissing"] = (df_long["Group"] == "Patient") & df_long["Value"].isnull()
+
+    def format_range(prefix):
+        lower, upper, mean = (np.char.mod("%.2f", feature_table[f"{prefix}_{statistic}"].to_numpy())
+                              for statistic in ("lower", "upper", "mean"))
+        return np.char.add(np.char.add(np.char.add(lower, " - "), np.char.add(upper, " (")),
+                           np.char.add(mean, ")"))
+
+    tooltip_df = pd.DataFrame({
+        "Feature": feature_table["title"].to_numpy(),
+        "Unit": feature_table["unit"].to_numpy(),
+        "Reference": feature_table["reference"].to_numpy(),
+        "Patient": feature_table["patient"].to_numpy(),
+        "Survivor": format_range("survivors"),
+        "Non-Survivor": format_range("non_survivors"),
+    })
+    return df_long, tooltip_df
+
+
+def create_parallel_feature_plot() -> dict:
+    """
+    Shows the feature selection and returns the Vega-Lite spec of the parallel coordinates plot,
+    for st.vega_lite_chart(). The feature table is cached per patient by load_feature_table(), and
+    the spec is memoized per patient and feature selection, so it is rebuilt only when these change.
+    """
+    patient = st.session_state.patient
 
     # --- Combine SHAP Values from Static and Timeseries ---
     static_feature_names = st.session_state.static_feature_names
@@ -31,141 +131,41 @@ def create_parallel_feature_plot():
     combined_shap_dict.update(timeseries_shap)
 
     # --- Smart Feature Selection based on Combined SHAP values ---
-    available_features = patient_base_statistics.get_available_features()
-    sorted_features = sorted(available_features, key=lambda f: abs(
-        combined_shap_dict.get(f, 0)), reverse=True)
-    default_features = sorted_features[:5]
-
-    options = {
-        f"{f.replace('_', ' ').title()} ({format_contribution(combined_shap_dict.get(f, 0))})": f
-        for f in sorted_features
-    }
+    # The table is sorted by the absolute SHAP values.
+    feature_table = load_feature_table(
+        patient.patient_id, patient.data_version,
+        pd.Series(combined_shap_dict, dtype=float),
+        patient, st.session_state.patient_base, st.session_state.feature_metadata)
+    options = dict(zip(feature_table["option"], feature_table.index))
     selected_feature_options = st.multiselect(
         'Select features for Parallel Coordinates Plot:',
         options=list(options.keys()),
-        default=[
-            f"{f.replace('_', ' ').title()} ({format_contribution(combined_shap_dict.get(f, 0))})"
-            for f in default_features
-        ],
+        default=list(feature_table["option"][:5]),
         max_selections=10
     )
-    selected_features = [options[opt] for opt in selected_feature_options]
-    selected_features = sorted(selected_features, key=lambda f: abs(
-        combined_shap_dict.get(f, 0)), reverse=True)
+    # Keep the features in the order of the table, i.e. by absolute SHAP value.
+    selected_feature_set = {options[opt] for opt in selected_feature_options}
+    selected_features = [feature for feature in feature_table.index
+                         if feature in selected_feature_set]
 
     if len(selected_features) < 3:
         st.warning('Please select at least 3 features.')
         st.stop()
 
-    @st.cache_data
-    def load_feature_data(selected_features, patient_number=None, xui_selected=None):
-        data = {'Feature': [], 'Group': [], 'Value': []}
-        for feature in selected_features:
-            feature_title = feature.replace("_", " ").title()
-            stats = patient_base_statistics.get_feature_statistics(feature)
-
-            # Survivor group (using the average for mean)
-            survivor_mean = (stats['survivors_lower'] +
-                             stats['survivors_upper']) / 2
-            data['Feature'].extend([feature_title] * 3)
-            data['Group'].extend(
-                ['Survivor', 'Survivor_lower', 'Survivor_upper'])
-            data['Value'].extend(
-                [survivor_mean, stats['survivors_lower'], stats['survivors_upper']])
-
-            # Non-Survivor group
-            nonsurvivor_mean = (
-                stats['non_survivors_lower'] + stats['non_survivors_upper']) / 2
-            data['Feature'].extend([feature_title] * 3)
-            data['Group'].extend(
-                ['Non-Survivor', 'Non-Survivor_lower', 'Non-Survivor_upper'])
-            data['Value'].extend(
-                [nonsurvivor_mean, stats['non_survivors_lower'], stats['non_survivors_upper']])
-
-            # Patient data: can be NaN
-            patient_value = st.session_state.patient.get_feature_value(feature)
-            data['Feature'].append(feature_title)
-            data['Group'].append('Patient')
-            data['Value'].append(patient_value)
-        return pd.DataFrame(data)
-
-    df_long = load_feature_data(selected_features, st.session_state.current_patient_index,
-                                st.session_state.study_xui_selection)
-
-    # --- Improved scaling: Use nan-aware functions, and assign a constant for missing values ---
-    scaled_values = []
-    selected_features_titles = [
-        f.replace("_", " ").title() for f in selected_features]
-    # Iterate feature by feature so that each column's scaling is done independently.
-    for feature in selected_features_titles:
-        feature_vals = df_long.loc[df_long['Feature']
-                                   == feature, 'Value'].values
-        # Use nanmin and nanmax to ignore missing values in min/max computation.
-        min_val = np.nanmin(feature_vals)
-        max_val = np.nanmax(feature_vals)
-        if max_val == min_val:
-            # When all valid values are the same, assign a middle value.
-            scaled_feature_vals = [0.5 if not np.isnan(
-                val) else 0.5 for val in feature_vals]
-        else:
-            padding = 0.1 * (max_val - min_val)
-            padded_min = min_val - padding
-            padded_max = max_val + padding
-            # Scale each value and assign 0.5 if the value is missing.
-            scaled_feature_vals = [((val - padded_min) / (padded_max - padded_min)) if not np.isnan(val) else 0.5
-                                   for val in feature_vals]
-        scaled_values.extend(scaled_feature_vals)
-    df_long['Scaled Value'] = scaled_values
-
-    # --- Flag missing patient data.
-    df_long['IsMissing'] = False
-    df_long.loc[(df_long['Group'] == 'Patient') & (
-        df_long['Value'].isnull()), 'IsMissing'] = True
-
-    # --- Prepare tooltip data in a separate dataframe ---
-    tooltip_data = []
-    for feature in selected_features_titles:
-        # Get the original feature key (assuming underscores were used in the original key).
-        original_feature = feature.replace(" ", "_").lower()
-        # Retrieve and clean the unit
-        unit = st.session_state.feature_metadata.get(
-            original_feature, {}).get("unit", "")
-        if pd.isna(unit) or unit in [None, "nan", ""]:
-            unit = ""
-
-        # Retrieve reference range values from metadata.
-        meta = st.session_state.feature_metadata.get(original_feature, {})
-        normal_lower = meta.get("normal_lower", None)
-        normal_upper = meta.get("normal_upper", None)
-        if (normal_lower not in [None, "", "nan"] and normal_upper not in [None, "", "nan"] and
-                not pd.isna(normal_lower) and not pd.isna(normal_upper)):
-            reference = f"{normal_lower}-{normal_upper}"
-        else:
-            reference = ""
-
-        patient_val = df_long[(df_long['Feature'] == feature) & (
-            df_long['Group'] == 'Patient')]['Value'].values[0]
-        surv_lower = df_long[(df_long['Feature'] == feature) & (
-            df_long['Group'] == 'Survivor_lower')]['Value'].values[0]
-        surv_upper = df_long[(df_long['Feature'] == feature) & (
-            df_long['Group'] == 'Survivor_upper')]['Value'].values[0]
-        surv_mean = df_long[(df_long['Feature'] == feature) & (
-            df_long['Group'] == 'Survivor')]['Value'].values[0]
-        nonsurv_lower = df_long[(df_long['Feature'] == feature) & (
-            df_long['Group'] == 'Non-Survivor_lower')]['Value'].values[0]
-        nonsurv_upper = df_long[(df_long['Feature'] == feature) & (
-            df_long['Group'] == 'Non-Survivor_upper')]['Value'].values[0]
-        nonsurv_mean = df_long[(df_long['Feature'] == feature) & (
-            df_long['Group'] == 'Non-Survivor')]['Value'].values[0]
-        tooltip_data.append({
-            'Feature': feature,
-            'Unit': unit,
-            'Reference': reference,
-            'Patient': patient_val,
-            'Survivor': f"{surv_lower:.2f} - {surv_upper:.2f} ({surv_mean:.2f})",
-            'Non-Survivor': f"{nonsurv_lower:.2f} - {nonsurv_upper:.2f} ({nonsurv_mean:.2f})"
-        })
-    tooltip_df = pd.DataFrame(tooltip_data)
+    cache_key = (patient.patient_id, patient.data_version, tuple(selected_features))
+    cache = st.session_state.get("parallel_feature_plot_cache")
+    if cache is None or cache["key"] != cache_key:
+        st.session_state.parallel_feature_plot_cache = cache = {
+            "key": cache_key,
+            "spec": generate_parallel_feature_plot(
+                *build_plot_data(feature_table.loc[selected_features])).to_dict(),
+        }
+    return cache["spec"]
+
+
+def generate_parallel_feature_plot(df_long: pd.DataFrame, tooltip_df: pd.DataFrame):
+    """Builds the parallel coordinates plot from the data of build_plot_data()."""
+    selected_features_titles = list(tooltip_df["Feature"])
 
     # --- Base chart for Patient, Survivor, and Non-Survivor lines and points ---
     base = alt.Chart(
@@ -0,0 +1,33 @@
+import altair as alt
+import pandas as pd
+
+
+def create_risk_sensitivity_curve(values, risks, scenario_value=None, height=60):
+    """
+    Creates a small Altair line chart of the predicted risk along a slider's value range.
+    The current scenario value is marked with a vertical rule.
+
+    Args:
+        values (np.ndarray): Feature values of the sweep.
+        risks (np.ndarray): Predicted risk (0-1) per feature value.
+        scenario_value (float, optional): Current slider value.
+        height (int): Height of the chart in pixels.
+    """
+    curve_df = pd.DataFrame({"value": values, "risk": risks * 100})
+
+    curve = alt.Chart(curve_df).mark_line(color="#888").encode(
+        x=alt.X("value:Q", axis=None, scale=alt.Scale(nice=False, zero=False)),
+        y=alt.Y("risk:Q", axis=alt.Axis(title=None, tickCount=2, labelFontSize=9),
+                scale=alt.Scale(domain=[0, 100])),
+        tooltip=[
+            alt.Tooltip("value:Q", title="Value", format=".1f"),
+            alt.Tooltip("risk:Q", title="Risk (%)", format=".0f"),
+        ],
+    )
+
+    if scenario_value is not None:
+        rule = alt.Chart(pd.DataFrame({"value": [scenario_value]})).mark_rule(
+            color="#F08080").encode(x="value:Q")
+        curve = curve + rule
+
+    return curve.properties(height=height)
@@ -1,7 +1,18 @@
 import streamlit as st
 import altair as alt
+import numpy as np
 import pandas as pd
 
+# Dose units of the vasopressors, used if the feature metadata has none.
+VASOPRESSOR_FALLBACK_UNITS = {
+    'dobutamine_dose': 'mcg/kg/min',
+    'dopamine_dose': 'mcg/kg/min',
+    'vasopressin_dose': 'units/min',
+    'phenylephrine_dose': 'mcg/kg/min',
+    'epinephrine_dose': 'mcg/kg/min',
+    'norepinephrine_dose': 'mcg/kg/min'
+}
+
 
 def scale_with_margin(series: pd.Series, margin=0.1):
     if series.empty:
@@ -16,96 +27,179 @@ def scale_with_margin(series: pd.Series, margin=0.1):
     return alt.Scale(domain=[lower, upper], nice=False, zero=False)
 
 
-def generate_trend_graph():
-    # Define a color palette dictionary for the plots.
-    color_palette = {
-        "vasopressor": ['#FFB347', '#FFCC99', '#FFDAB9', '#FFC0CB', '#FFA07A'],
-        "bp_band": '#FF6347',
-        "bp_mean": '#F08080',
-        "heartrate": '#B0E0E6',
-        "resprate": '#5ea9f2',
-        "tempc": '#f7e3c1',
-        "spo2": '#5ea9f2',
-        "urineoutput": '#32CD32'
-    }
+def format_with_unit(values: pd.Series, unit, decimals=1) -> np.ndarray:
+    """Formats values with the given decimals and unit; missing values become empty strings."""
+    values = values.to_numpy(dtype=float)
+    formatted = np.char.add(np.char.mod(f"%.{decimals}f", values), f" {unit}")
+    return np.where(np.isnan(values), "", formatted)
+
+
+def build_attribution_frame(hourly_attribution: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts per-hour SHAP values (hours x features) into the long format of the heatmap:
+    one row per hour and feature with the cell bounds, the value and its tooltip label.
+    """
+    values = hourly_attribution.to_numpy(dtype=np.float32)
+    n_hours, n_features = values.shape
+    hours = np.repeat(hourly_attribution.index.to_numpy(), n_features)
+    flat_values = values.ravel()
+    # The cells are centered on the hours and clipped to the time range of the trend charts
+    return pd.DataFrame({
+        "index": hours,
+        "index_start": np.clip(hours - 0.5, hours.min(), hours.max()),
+        "index_end": np.clip(hours + 0.5, hours.min(), hours.max()),
+        "Feature": np.tile(hourly_attribution.columns.str.replace("_", " ").str.title().to_numpy(), n_hours),
+        "Attribution": flat_values,
+        "Attribution_label": np.char.add(np.char.mod("%+.2f", flat_values), " %-points"),
+    })
+
+
+def generate_attribution_heatmap(hourly_attribution: pd.DataFrame, nearest, show_x=True):
+    """
+    Heatmap of the per-hour SHAP values of the timeseries features, aligned with the trend charts:
+    red cells increased the risk, blue cells decreased it.
+    """
+    attribution_df = build_attribution_frame(hourly_attribution)
+    max_abs = max(float(np.abs(attribution_df["Attribution"]).max()), 1e-6)
+
+    heatmap = alt.Chart(attribution_df).mark_rect().encode(
+        x=alt.X('index_start:Q', axis=alt.Axis(
+            title="Time" if show_x else None,
+            labels=show_x, ticks=show_x, domain=show_x
+        )),
+        x2='index_end:Q',
+        y=alt.Y('Feature:N', title='Risk Drivers', sort=None,
+                axis=alt.Axis(titlePadding=0, titleAlign="center", titleX=-110, labelFontSize=9)),
+        color=alt.Color('Attribution:Q',
+                        scale=alt.Scale(domain=[-max_abs, 0, max_abs],
+                                        range=[st.session_state.color_survivor, '#262730',
+                                               st.session_state.color_non_survivor]),
+                        legend=None),
+        tooltip=[
+            alt.Tooltip('index:Q', title='Time'),
+            alt.Tooltip('Feature:N', title='Parameter'),
+            alt.Tooltip('Attribution_label:N', title='Risk Contribution'),
+        ]
+    ).properties(height=12 * hourly_attribution.shape[1], width=700)
+
+    heatmap_rule = alt.Chart(attribution_df).mark_rule(color='gray').encode(
+        x='index:Q'
+    ).transform_filter(nearest)
+
+    return heatmap + heatmap_rule
+
+
+def get_vasopressor_unit(medication, feature_metadata):
+    """Returns the dose unit of a vasopressor, falling back to the usual unit if the metadata has none."""
+    unit = feature_metadata.get(medication, {}).get("unit", "")
+    if not unit or pd.isna(unit):
+        unit = VASOPRESSOR_FALLBACK_UNITS.get(medication, 'n/a')
+    return unit
 
-    # ================================
-    # Merge Data into a Single DataFrame
-    # ================================
-    vitals_df = st.session_state.patient.vitals.reset_index()
 
-    if hasattr(st.session_state.patient, "urineoutput") and st.session_state.patient.urineoutput is not None:
-        urineoutput_df = st.session_state.patient.urineoutput.copy()
+def build_trend_data(patient, feature_metadata):
+    """
+    Merges the patient's vitals, urine output and vasopressors into the long-format frame of the
+    trend charts (one row per hour and given vasopressor), with the formatted tooltip columns.
+    All formatting is vectorized per column.
+
+    Returns:
+        tuple: (trend_df, vasopressor_cols) with the names of the vasopressors that were given.
+    """
+    vitals_df = patient.vitals.reset_index()
+
+    if hasattr(patient, "urineoutput") and patient.urineoutput is not None:
+        urineoutput_df = patient.urineoutput
         if not urineoutput_df.empty and "urineoutput" in urineoutput_df.columns:
-            vitals_df["urineoutput"] = urineoutput_df["urineoutput"].tolist()
+            vitals_df["urineoutput"] = urineoutput_df["urineoutput"].to_numpy()
 
-    vaso_df = st.session_state.patient.vasopressor.reset_index()
-    vaso_cols = [col for col in vaso_df.columns if col != 'index']
-    filtered_vaso_cols = [
-        col for col in vaso_cols
-        if pd.notnull(vaso_df[col].max()) and vaso_df[col].max() > 0
-    ]
+    vaso_df = patient.vasopressor.reset_index()
+    vaso_max = vaso_df.drop(columns='index').max()
+    vaso_cols = list(vaso_max.index[vaso_max.fillna(0) > 0])
 
-    if filtered_vaso_cols:
-        # Melt vasopressor data into long format.
+    if vaso_cols:
+        # Melt vasopressor data into long format, with the formatted medication names.
         vaso_long_df = vaso_df.melt(
             id_vars=['index'],
-            value_vars=filtered_vaso_cols,
+            value_vars=vaso_cols,
             var_name='Medication',
             value_name='Dose'
         )
-        # Add a new column with formatted medication names.
-        vaso_long_df["Medication_Title"] = vaso_long_df["Medication"].apply(
-            lambda x: x.title()
-        )
+        vaso_long_df["Medication_Title"] = vaso_long_df["Medication"].str.title()
     else:
         vaso_long_df = pd.DataFrame(columns=['index', 'Medication', 'Dose'])
 
     # Merge vitals and vasopressor data on "index" (outer join).
     trend_df = pd.merge(vitals_df, vaso_long_df, on='index', how='outer')
 
-    if not vaso_long_df.empty:
-        def get_vaso_dose_with_unit(row):
-            med = str(row['Medication']).strip().lower()
-            unit = st.session_state.feature_metadata.get(
-                med, {}).get("unit", "")
-            if not unit or pd.isna(unit):
-                fallback_units = {
-                    'dobutamine_dose': 'mcg/kg/min',
-                    'dopamine_dose': 'mcg/kg/min',
-                    'vasopressin_dose': 'units/min',
-                    'phenylephrine_dose': 'mcg/kg/min',
-                    'epinephrine_dose': 'mcg/kg/min',
-                    'norepinephrine_dose': 'mcg/kg/min'
-                }
-                unit = fallback_units.get(med, 'n/a')
-            return f"{row['Dose']:.1f} {unit}" if pd.notna(row['Dose']) else ""
-
-        vaso_long_df["Dose_with_unit"] = vaso_long_df.apply(
-            get_vaso_dose_with_unit, axis=1)
-
-        # Aggregate multiple vasopressor entries per time index using the formatted names.
-        agg_vaso = vaso_long_df.groupby("index").apply(
-            lambda df: "\u2028".join(
-                f"{med_title}: {dose}"
-                for med_title, dose in zip(df["Medication_Title"], df["Dose_with_unit"]) if dose
-            )
-        ).reset_index().rename(columns={0: "VasopressorInfo"})
-        trend_df = pd.merge(trend_df, agg_vaso, on='index', how='left')
-    else:
-        trend_df["VasopressorInfo"] = ""
+    # Join the doses of all given vasopressors per hour, e.g. "Norepinephrine_Dose: 0.1 mcg/kg/min".
+    vaso_info = np.full(len(vaso_df), "", dtype=object)
+    for col in vaso_cols:
+        dose = format_with_unit(
+            vaso_df[col], get_vasopressor_unit(col, feature_metadata)).astype(object)
+        entry = np.where(dose == "", "", f"{col.title()}: " + dose)
+        vaso_info = np.where(entry == "", vaso_info,
+                             np.where(vaso_info == "", entry, vaso_info + "\u2028" + entry))
+    trend_df["VasopressorInfo"] = trend_df["index"].map(
+        pd.Series(vaso_info, index=vaso_df["index"])).fillna("")
 
     for field in ['heartrate', 'resprate', 'spo2', 'tempc', 'urineoutput']:
-        unit = st.session_state.feature_metadata.get(field, {}).get("unit", "")
-        trend_df[f'{field}_with_unit'] = trend_df[field].apply(
-            lambda x: f"{x:.1f} {unit}" if pd.notna(x) else ""
-        )
+        unit = feature_metadata.get(field, {}).get("unit", "")
+        trend_df[f'{field}_with_unit'] = format_with_unit(trend_df[field], unit)
 
     trend_df['BP'] = (
         trend_df['sysbp'].astype(int).astype(str) + '/' +
         trend_df['diasbp'].astype(int).astype(str) +
         " (" + trend_df['meanbp'].astype(int).astype(str) + ") mmHg"
     )
+    return trend_df, vaso_cols
+
+
+def get_trend_graph_spec(hourly_attribution: pd.DataFrame = None, attribution_version=None) -> dict:
+    """
+    Returns the Vega-Lite spec of the current patient's trend graph, for st.vega_lite_chart().
+    The chart data and the serialized charts are memoized per patient and data version
+    (patient.data_version), so reruns, e.g. when switching tabs, neither rebuild nor
+    re-serialize the Altair charts. Charts with the attribution heatmap are additionally
+    keyed by attribution_version (e.g. st.session_state.shap_values_version).
+    """
+    patient = st.session_state.patient
+    cache_key = (patient.patient_id, patient.data_version)
+    cache = st.session_state.get("trend_graph_cache")
+    if cache is None or cache["key"] != cache_key:
+        cache = st.session_state.trend_graph_cache = {
+            "key": cache_key,
+            "data": build_trend_data(patient, st.session_state.feature_metadata),
+            "specs": {},
+        }
+
+    spec_key = attribution_version if hourly_attribution is not None else None
+    if spec_key not in cache["specs"]:
+        # Only the spec without and the latest spec with the heatmap are kept
+        cache["specs"] = {key: spec for key, spec in cache["specs"].items() if key is None}
+        cache["specs"][spec_key] = generate_trend_graph(
+            *cache["data"], hourly_attribution=hourly_attribution).to_dict()
+    return cache["specs"][spec_key]
+
+
+def generate_trend_graph(trend_df: pd.DataFrame, filtered_vaso_cols, hourly_attribution: pd.DataFrame = None):
+    """
+    Builds the trend charts of the patient's vitals, vasopressors and urine output
+    from the data of build_trend_data().
+    If hourly_attribution (per-hour SHAP values, hours x timeseries features) is given,
+    a heatmap of the hours that drove the risk is added below the charts.
+    """
+    # Define a color palette dictionary for the plots.
+    color_palette = {
+        "vasopressor": ['#FFB347', '#FFCC99', '#FFDAB9', '#FFC0CB', '#FFA07A'],
+        "bp_band": '#FF6347',
+        "bp_mean": '#F08080',
+        "heartrate": '#B0E0E6',
+        "resprate": '#5ea9f2',
+        "tempc": '#f7e3c1',
+        "spo2": '#5ea9f2',
+        "urineoutput": '#32CD32'
+    }
 
     # ================================
     # Define the Unified Tooltip and Selection
@@ -176,7 +270,6 @@ def generate_trend_graph():
     # ================================
     # Vitals / Circulation Charts
     # ================================
-    st.markdown("#### Trends")
     vitals_for_plot = trend_df[trend_df['diasbp'].notnull()].copy()
 
     bp_min = min(
@@ -250,7 +343,7 @@ def generate_trend_graph():
     other_cols = [col for col in desired_order if col in trend_df.columns]
     other_charts = []
     for i, col in enumerate(other_cols):
-        show_x = (i == len(other_cols) - 1)
+        show_x = (i == len(other_cols) - 1) and hourly_attribution is None
         chart_rule = alt.Chart(trend_df).mark_rule(color='gray').encode(
             x='index:Q'
         ).transform_filter(nearest)
@@ -269,6 +362,10 @@ def generate_trend_graph():
         combined_chart = (chart + chart_rule + selector)
         other_charts.append(combined_chart)
 
+    if hourly_attribution is not None:
+        other_charts.append(
+            generate_attribution_heatmap(hourly_attribution, nearest))
+
     all_charts = alt.vconcat(
         vaso_chart,
         bp_chart,
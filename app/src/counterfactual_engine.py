@@ -0,0 +1,328 @@
+import numpy as np
+import pandas as pd
+from .patient_data_model import rescale_timeseries_block
+from .patient_store import LAB_STATISTICS, VITAL_FEATURES, URINEOUTPUT_FEATURES, VASOPRESSOR_FEATURES, values_equal
+
+# Number of evenly spaced values per feature in the risk sensitivity sweep.
+SWEEP_POINTS = 50
+
+
+class CounterfactualEngine:
+    """
+    Fast what-if evaluation for one patient.
+    Keeps the raw and scaled model inputs of the original patient and applies changes
+    feature by feature: only changed columns are rescaled, using the scaling kernel's
+    per-column parameters, and the scenario is rescored in place without rebuilding
+    the patient's ML data.
+    """
+
+    def __init__(self, predictor, patient, static_feature_names, timeseries_feature_names):
+        self.predictor = predictor
+        self.patient_id = patient.patient_id
+        self.kernel = predictor.get_scaling_kernel(
+            static_feature_names, timeseries_feature_names)
+        self.static_feature_names = list(static_feature_names)
+        self.timeseries_feature_names = list(timeseries_feature_names)
+        self.static_lookup = {feature: position for position,
+                              feature in enumerate(static_feature_names)}
+        self.channel_lookup = {feature: channel for channel,
+                               feature in enumerate(timeseries_feature_names)}
+
+        # Raw inputs of the original patient: static (F,) and timeseries (24, C).
+        static_raw, timeseries_raw = patient.get_raw_ml_arrays(
+            static_feature_names, timeseries_feature_names)
+        self.original_static_raw = static_raw[0]
+        self.original_timeseries_raw = timeseries_raw[0]
+        self.original_static, self.original_timeseries = self.kernel.transform(
+            static_raw, timeseries_raw)
+
+        self.original_risk = float(predictor.predict_batch(
+            self.original_static, self.original_timeseries)[0])
+        # Risk sensitivity curves of the original patient, keyed by (feature, n_points).
+        self.sensitivity_curves = {}
+        # Counterfactual search results, keyed by target risk.
+        self.search_results = {}
+        # SHAP values per feature of the original patient and the explained scenarios, keyed by get_input_key().
+        self.shap_cache = {}
+        # First-order attribution change of the last explained scenario: (input key, values per feature).
+        self.attribution = (None, None)
+        self.reset()
+
+    def reset(self):
+        """Resets the scenario to the original patient."""
+        self.static_raw = self.original_static_raw.copy()
+        self.timeseries_raw = self.original_timeseries_raw.copy()
+        self.static = self.original_static.copy()
+        self.timeseries = self.original_timeseries.copy()
+        self.risk = self.original_risk
+        self.dirty = False
+
+    def set_static_values(self, values):
+        """
+        Applies static feature values to the scenario.
+        Features that are not model inputs are ignored.
+
+        Args:
+            values (dict): Raw value per static feature name; None is treated as missing.
+
+        Returns:
+            int: Number of features whose value changed.
+        """
+        features = [feature for feature in values if feature in self.static_lookup]
+        if not features:
+            return 0
+        positions = np.array([self.static_lookup[feature]
+                             for feature in features])
+        new_values = np.array([values[feature]
+                              for feature in features], dtype=np.float64)
+
+        changed = ~values_equal(self.static_raw[positions], new_values)
+        if not changed.any():
+            return 0
+        positions = positions[changed]
+        self.static_raw[positions] = new_values[changed]
+        self.static[0, positions] = self.kernel.transform_static_columns(
+            new_values[changed], positions)
+        self.dirty = True
+        return int(changed.sum())
+
+    def set_timeseries_values(self, values):
+        """
+        Applies hourly timeseries values to the scenario.
+        Features that are not model inputs are ignored.
+
+        Args:
+            values (dict): Raw hourly values (24,) per timeseries feature name.
+
+        Returns:
+            int: Number of features whose values changed.
+        """
+        changed_channels = []
+        for feature, hourly_values in values.items():
+            if feature not in self.channel_lookup:
+                continue
+            channel = self.channel_lookup[feature]
+            hourly_values = np.asarray(hourly_values, dtype=np.float64)[
+                :self.timeseries_raw.shape[0]]
+            if values_equal(self.timeseries_raw[:, channel], hourly_values).all():
+                continue
+            self.timeseries_raw[:, channel] = hourly_values
+            changed_channels.append(channel)
+
+        if not changed_channels:
+            return 0
+        channels = np.array(changed_channels)
+        self.timeseries[0][:, channels] = self.kernel.transform_timeseries_channels(
+            self.timeseries_raw[:, channels], channels)
+        self.dirty = True
+        return len(changed_channels)
+
+    def score(self) -> float:
+        """Returns the mortality risk of the scenario, rescoring it only if it changed."""
+        if self.dirty:
+            self.risk = float(self.predictor.predict_batch(
+                self.static, self.timeseries)[0])
+            self.dirty = False
+        return self.risk
+
+    def get_sensitivity_curves(self, bounds, n_points=SWEEP_POINTS):
+        """
+        Returns the risk sensitivity curve of each feature: the risk of the original patient
+        when only that feature is swept over n_points evenly spaced values between its bounds.
+        Timeseries features are swept over their average, rescaled like the What-if sliders.
+        All missing curves are scored in one batched forward pass and cached on the engine.
+
+        Args:
+            bounds (dict): (min, max) per static or timeseries feature name.
+            n_points (int): Number of values per feature.
+
+        Returns:
+            dict: (values, risks) per feature, each an array with shape (n_points,).
+        """
+        missing = [feature for feature in bounds
+                   if (feature, n_points) not in self.sensitivity_curves]
+        if missing:
+            grids = {}
+            static_batches = []
+            timeseries_batches = []
+            for feature in missing:
+                lower, upper = (float(bound) for bound in bounds[feature])
+                grid = np.linspace(lower, upper, n_points)
+                sweep = self.build_sweep_inputs(feature, grid, lower, upper)
+                if sweep is None:
+                    continue
+                grids[feature] = grid
+                static_batches.append(sweep[0])
+                timeseries_batches.append(sweep[1])
+
+            if grids:
+                risks = self.predictor.predict_batch(
+                    np.concatenate(static_batches), np.concatenate(timeseries_batches))
+                for feature, feature_risks in zip(grids, risks.reshape(len(grids), n_points)):
+                    self.sensitivity_curves[(feature, n_points)] = (
+                        grids[feature], feature_risks)
+
+        return {feature: self.sensitivity_curves[(feature, n_points)]
+                for feature in bounds if (feature, n_points) in self.sensitivity_curves}
+
+    def build_sweep_inputs(self, feature, grid, lower, upper):
+        """
+        Builds the scaled model inputs of the original patient with one feature set to each grid value.
+
+        Returns:
+            tuple: Static (K, F) and timeseries (K, 24, C) inputs, or None if the feature
+                is not a model input or cannot be rescaled.
+        """
+        sweep_column = self.get_sweep_column(feature, grid, lower, upper)
+        if sweep_column is None:
+            return None
+
+        n_points = grid.shape[0]
+        static = np.repeat(self.original_static, n_points, axis=0)
+        timeseries = np.repeat(self.original_timeseries, n_points, axis=0)
+        input_type, index, scaled_values = sweep_column
+        if input_type == "static":
+            static[:, index] = scaled_values
+        else:
+            timeseries[:, :, index] = scaled_values
+        return static, timeseries
+
+    def get_sweep_column(self, feature, grid, lower, upper):
+        """
+        Computes the scaled model input column of a feature for each grid value.
+        Timeseries features are rescaled from the original hourly values to each grid average.
+
+        Returns:
+            tuple: ("static", position, values (K,)) or ("timeseries", channel, values (K, 24)),
+                or None if the feature is not a model input or cannot be rescaled.
+        """
+        if feature in self.static_lookup:
+            position = self.static_lookup[feature]
+            return "static", position, self.kernel.transform_static_columns(
+                grid, np.array([position]))
+
+        if feature in self.channel_lookup:
+            if feature in VITAL_FEATURES:
+                data_type = "vitals"
+            elif feature in URINEOUTPUT_FEATURES:
+                data_type = "urineoutput"
+            elif feature in VASOPRESSOR_FEATURES:
+                data_type = "vasopressor"
+            else:
+                return None
+            channel = self.channel_lookup[feature]
+            n_points = grid.shape[0]
+            hourly_values = rescale_timeseries_block(
+                [data_type] * n_points, [feature] * n_points,
+                np.repeat(
+                    self.original_timeseries_raw[np.newaxis, :, channel], n_points, axis=0),
+                grid, np.full(n_points, lower), np.full(n_points, upper))
+            if hourly_values[0] is None:
+                return None
+            return "timeseries", channel, self.kernel.transform_timeseries_channels(
+                np.array(hourly_values, dtype=np.float64)[:, :, np.newaxis], np.array([channel]))[:, :, 0]
+
+        return None
+
+    def has_changes(self) -> bool:
+        """Returns whether the scaled scenario inputs differ from the original patient."""
+        return not (np.array_equal(self.static, self.original_static)
+                    and np.array_equal(self.timeseries, self.original_timeseries))
+
+    def get_attribution_change(self) -> pd.Series:
+        """
+        Returns the instant first-order estimate of how each feature's contribution changed from
+        the original patient to the scenario (gradient x input change, see
+        SepsisMortalityRiskPredictor.compute_gradient_attribution), in percentage points.
+        """
+        key = self.get_input_key(self.static, self.timeseries)
+        if self.attribution[0] != key:
+            self.attribution = (key, self.summarize_attribution(*self.predictor.compute_gradient_attribution(
+                self.original_static, self.original_timeseries, self.static, self.timeseries)))
+        return self.attribution[1]
+
+    def get_shap_values(self, original=False):
+        """Returns the cached SHAP values per feature of the scenario (or the original patient), or None."""
+        if original:
+            return self.shap_cache.get(self.get_input_key(self.original_static, self.original_timeseries))
+        return self.shap_cache.get(self.get_input_key(self.static, self.timeseries))
+
+    def explain(self, explainer=None) -> int:
+        """
+        Computes the SHAP values of the scenario and, if not cached yet, of the original patient
+        in the same explainer call. Scenarios that were explained before are served from the cache.
+
+        Returns:
+            int: Number of explained inputs.
+        """
+        inputs = self.get_unexplained_inputs()
+        if not inputs:
+            return 0
+        self.shap_cache.update(self.compute_shap_values(inputs, explainer))
+        return len(inputs)
+
+    def get_unexplained_inputs(self) -> dict:
+        """
+        Returns copies of the scaled inputs of the original patient and the scenario that have no
+        cached SHAP values, keyed by get_input_key().
+        """
+        inputs = {}
+        for static, timeseries in ((self.original_static, self.original_timeseries),
+                                   (self.static, self.timeseries)):
+            key = self.get_input_key(static, timeseries)
+            if key not in self.shap_cache:
+                inputs[key] = (static.copy(), timeseries.copy())
+        return inputs
+
+    def compute_shap_values(self, inputs, explainer=None) -> dict:
+        """
+        Computes the SHAP values per feature of get_unexplained_inputs() in one explainer call,
+        without changing the engine, so it can run as a job (pass the explainer then).
+        The result is added to shap_cache by the caller.
+
+        Returns:
+            dict: SHAP values per feature (pd.Series), keyed like the inputs.
+        """
+        shap_static, shap_timeseries = self.predictor.compute_shap_values_batch(
+            np.concatenate([static for static, _ in inputs.values()]),
+            np.concatenate([timeseries for _, timeseries in inputs.values()]),
+            explainer)
+        return {key: self.summarize_attribution(static_values, timeseries_values)
+                for key, static_values, timeseries_values in zip(inputs, shap_static, shap_timeseries)}
+
+    def summarize_attribution(self, static_values, timeseries_values) -> pd.Series:
+        """Maps static (F,) and hourly timeseries (24, C) attributions to one value per feature."""
+        return pd.concat([
+            pd.Series(static_values, index=self.static_feature_names[:len(static_values)]),
+            pd.Series(np.sum(timeseries_values, axis=0), index=self.timeseries_feature_names),
+        ])
+
+    @staticmethod
+    def get_input_key(static, timeseries) -> bytes:
+        """Identifies scaled model inputs by their content."""
+        return static.tobytes() + timeseries.tobytes()
+
+    def get_ml_data(self):
+        """Returns copies of the scaled scenario inputs in the Patient.ml_data format."""
+        return {"static": self.static.copy(), "timeseries": self.timeseries.copy()}
+
+    @staticmethod
+    def laboratory_static_values(laboratory, original_laboratory=None):
+        """
+        Maps a laboratory table (labs x statistics) to static feature values ("<lab>_<statistic>").
+        Labs and statistics of original_laboratory that are missing from the table, e.g. rows deleted
+        in the editor, are mapped to NaN, so they are missing in the scenario as well.
+        """
+        values = {}
+        if original_laboratory is not None:
+            values.update({
+                f"{lab}_{statistic}": np.nan
+                for lab in original_laboratory.index
+                for statistic in original_laboratory.columns if statistic in LAB_STATISTICS
+            })
+        values.update({
+            f"{lab}_{statistic}": value
+            for lab, row in laboratory.iterrows()
+            for statistic, value in row.items() if statistic in LAB_STATISTICS
+        })
+        return values
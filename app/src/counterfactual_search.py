@@ -0,0 +1,153 @@
+import time
+import numpy as np
+from .counterfactual_engine import SWEEP_POINTS
+
+# Default risk the search tries to get below.
+SEARCH_TARGET_RISK = 0.5
+# Maximum number of features the search may change.
+SEARCH_MAX_CHANGES = 4
+# Wall-clock budget of one search in seconds; the best result so far is returned after it.
+SEARCH_TIME_BUDGET = 10.0
+
+
+def search_counterfactual(engine, bounds, target_risk=SEARCH_TARGET_RISK, max_changes=SEARCH_MAX_CHANGES,
+                          n_points=SWEEP_POINTS, time_budget=SEARCH_TIME_BUDGET):
+    """
+    Searches the sparsest set of feature changes that brings the patient's risk below target_risk.
+
+    Greedy batched coordinate search over the slider features, starting from the original
+    patient's scaled inputs held by the engine:
+        - every round scores all single-feature changes on top of the current scenario
+          (n_points values between the feature's bounds) in one batched forward pass,
+        - if any candidate crosses the target, the one with the smallest relative change wins
+          and the search stops,
+        - otherwise the candidate with the largest risk reduction is kept and the next round starts.
+    Once the target is reached, changes that are no longer needed to stay below it are dropped.
+    The search also stops early when no candidate lowers the risk, after max_changes rounds,
+    or when the time budget is used up.
+
+    Args:
+        engine (CounterfactualEngine): What-if engine of the patient.
+        bounds (dict): (min, max) per feature that may be changed, e.g. PatientBase min/max.
+        target_risk (float): Risk (0-1) the scenario should get below.
+        max_changes (int): Maximum number of changed features.
+        n_points (int): Number of candidate values per feature.
+        time_budget (float): Maximum search time in seconds.
+
+    Returns:
+        dict: {
+            "changes": list of {"feature", "original_value", "value"} in the order they were found,
+            "risk": risk of the resulting scenario,
+            "original_risk": risk of the original patient,
+            "target_reached": whether the risk is below target_risk,
+            "evaluated": number of scored candidates,
+        }
+    """
+    start_time = time.perf_counter()
+
+    # Candidate columns per feature, computed once and reused in every round.
+    candidates = {}
+    for feature, (lower, upper) in bounds.items():
+        lower, upper = float(lower), float(upper)
+        grid = np.linspace(lower, upper, n_points)
+        sweep_column = engine.get_sweep_column(feature, grid, lower, upper)
+        if sweep_column is not None:
+            candidates[feature] = (grid, (upper - lower) or 1.0, sweep_column)
+
+    static = engine.original_static.copy()
+    timeseries = engine.original_timeseries.copy()
+    risk = engine.original_risk
+    changes = []
+    # Scaled column update per change: (input_type, index, scaled value).
+    updates = []
+    evaluated = 0
+
+    while (risk >= target_risk and len(changes) < max_changes and candidates
+           and time.perf_counter() - start_time < time_budget):
+        features = list(candidates)
+        static_batch = np.repeat(static, len(features) * n_points, axis=0)
+        timeseries_batch = np.repeat(
+            timeseries, len(features) * n_points, axis=0)
+        for i, feature in enumerate(features):
+            rows = slice(i * n_points, (i + 1) * n_points)
+            input_type, index, scaled_values = candidates[feature][2]
+            if input_type == "static":
+                static_batch[rows, index] = scaled_values
+            else:
+                timeseries_batch[rows, :, index] = scaled_values
+
+        risks = engine.predictor.predict_batch(
+            static_batch, timeseries_batch).reshape(len(features), n_points)
+        evaluated += risks.size
+
+        crossing = risks < target_risk
+        if crossing.any():
+            # Smallest change relative to the feature's range among all crossing candidates.
+            original_values = np.array([get_original_value(engine, feature)
+                                        for feature in features])
+            grids = np.array([candidates[feature][0] for feature in features])
+            ranges = np.array([candidates[feature][1]
+                              for feature in features])
+            distance = np.abs(
+                grids - original_values[:, np.newaxis]) / ranges[:, np.newaxis]
+            distance = np.where(crossing, np.nan_to_num(distance, nan=1.0), np.inf)
+            feature_index, point_index = np.unravel_index(
+                np.argmin(distance), distance.shape)
+        else:
+            feature_index, point_index = np.unravel_index(
+                np.argmin(risks), risks.shape)
+            if risks[feature_index, point_index] >= risk:
+                break
+
+        feature = features[feature_index]
+        grid, _, (input_type, index, scaled_values) = candidates.pop(feature)
+        if input_type == "static":
+            static[0, index] = scaled_values[point_index]
+        else:
+            timeseries[0, :, index] = scaled_values[point_index]
+        risk = float(risks[feature_index, point_index])
+        updates.append((input_type, index, scaled_values[point_index]))
+        changes.append({
+            "feature": feature,
+            "original_value": get_original_value(engine, feature),
+            "value": float(grid[point_index]),
+        })
+
+    # Drop earlier changes that the target no longer depends on, one at a time.
+    while risk < target_risk and len(changes) > 1:
+        static_batch = np.repeat(engine.original_static, len(updates), axis=0)
+        timeseries_batch = np.repeat(
+            engine.original_timeseries, len(updates), axis=0)
+        for row in range(len(updates)):
+            for i, (input_type, index, scaled_value) in enumerate(updates):
+                if i == row:
+                    continue
+                if input_type == "static":
+                    static_batch[row, index] = scaled_value
+                else:
+                    timeseries_batch[row, :, index] = scaled_value
+        risks = engine.predictor.predict_batch(static_batch, timeseries_batch)
+        evaluated += risks.size
+        if not (risks < target_risk).any():
+            break
+        row = int(np.argmin(risks))
+        del updates[row]
+        del changes[row]
+        risk = float(risks[row])
+
+    return {
+        "changes": changes,
+        "risk": risk,
+        "original_risk": engine.original_risk,
+        "target_reached": risk < target_risk,
+        "evaluated": evaluated,
+    }
+
+
+def get_original_value(engine, feature):
+    """Returns the original value of a feature, the average for timeseries features."""
+    if feature in engine.static_lookup:
+        return float(engine.original_static_raw[engine.static_lookup[feature]])
+    values = engine.original_timeseries_raw[:, engine.channel_lookup[feature]]
+    return float(np.nanmean(values)) if not np.isnan(values).all() else np.nan
+
@@ -5,94 +5,29 @@ import streamlit as st
 import numpy as np
 from .patient_data_model import Patient
 from .patient_base import PatientBase
-from copy import deepcopy
+from .patient_store import PatientStore, CounterfactualPatient
+from .job_executor import get_job_executor, get_session_id
+from .shap_background import load_summarized_background, expand_weighted_background
+
+
+@st.cache_resource(max_entries=4)
+def load_patient_store(file_path, source_mtime_ns, source_size):
+    """
+    Parses the raw patient data CSV once into a columnar PatientStore.
+    The store is shared across sessions, so each patient load is an O(1) slice instead of a file parse.
+    Later processes load the store from its memory-mapped binary cache next to the CSV.
+    The CSV's modification time and size are part of the cache key, so a changed CSV is reloaded.
+    """
+    return PatientStore.from_csv_cached(file_path)
 
 
-@st.cache_data
 def load_patient_raw_data(file_path, patient_row_index):
 
     try:
-        all_patients = pd.read_csv(
-            file_path, sep=",", header=0, encoding="utf-8")
-
-        patient_row = all_patients.iloc[patient_row_index]
-        # Round all float values to 2 decimal places; leave ints unchanged
-        patient_row = patient_row.apply(
-            lambda x: x if pd.isna(x) or isinstance(x, (int, np.integer))
-            else round(x, 2) if isinstance(x, (float, np.floating)) else x
-        )
-
-        patient = Patient()
-
-        for key in patient.demographics:
-            if key in patient_row.index:
-                if key == "age":
-                    patient.update_demographics(
-                        {key: int(patient_row[key]) if pd.notna(patient_row[key]) else None})
-                elif key == "weight":
-                    patient.update_demographics(
-                        {key: float(patient_row[key]) if pd.notna(patient_row[key]) else None})
-                else:
-                    patient.update_demographics({key: patient_row[key]})
-
-        for key in patient.scores:
-            if key in patient_row.index:
-                patient.update_scores(
-                    {key: float(patient_row[key]) if pd.notna(patient_row[key]) else None})
-
-        for key in patient.clinical_data:
-            if key in patient_row.index:
-                patient.update_clinical_data({key: patient_row[key]})
-
-        for key in patient.specimen:
-            specimen_column = f"specimen_group_{key}"
-            if specimen_column in patient_row.index:
-                patient.update_specimen(
-                    {key: int(patient_row[specimen_column])})
-
-        for key in patient.diagnosis:
-            diagnosis_column = f"diagnosis_{key}"
-            if diagnosis_column in patient_row.index:
-                patient.update_diagnosis(
-                    {key: int(patient_row[diagnosis_column])})
-
-        lab_columns = [col.replace("_count", "").replace("_max", "").replace("_min", "").replace("_slope", "").replace("_mean", "")
-                       for col in patient_row.index if "_count" in col]
-
-        lab_data = []
-
-        for lab in lab_columns:
-            if f"{lab}_count" in patient_row.index:
-                lab_data.append({
-                    "count": float(patient_row.get(f"{lab}_count", float("nan"))),
-                    "mean": round(float(patient_row.get(f"{lab}_mean", float("nan"))), 2),
-                    "max": round(float(patient_row.get(f"{lab}_max", float("nan"))), 2),
-                    "min": round(float(patient_row.get(f"{lab}_min", float("nan"))), 2),
-                    "slope": round(float(patient_row.get(f"{lab}_slope", float("nan"))), 2)
-                })
-
-        if lab_data:
-            df = pd.DataFrame(lab_data, index=lab_columns).astype("float64")
-            patient.update_laboratory(df)
-
-        vitals_data = {}
-        for ts in patient.vitals.columns:
-            vitals_data[ts] = [float(patient_row[f"{ts}_{i}"]) if f"{ts}_{i}" in patient_row.index and pd.notna(
-                patient_row[f"{ts}_{i}"]) else None for i in range(24)]
-        patient.update_vitals(vitals_data)
-
-        urineoutput_data = {}
-        urineoutput_data["urineoutput"] = [float(patient_row[f"urineoutput_{i}"]) if f"urineoutput_{i}" in patient_row.index and pd.notna(
-            patient_row[f"urineoutput_{i}"]) else None for i in range(24)]
-        patient.update_urineoutput(pd.DataFrame(urineoutput_data))
-
-        vasopressor_data = {}
-        vasopressors = ["dobutamine_dose", "dopamine_dose", "vasopressin_dose",
-                        "phenylephrine_dose", "epinephrine_dose", "norepinephrine_dose"]
-        for vasopressor in vasopressors:
-            vasopressor_data[vasopressor] = [float(patient_row[f"{vasopressor}_{i}"]) if f"{vasopressor}_{i}" in patient_row.index and pd.notna(
-                patient_row[f"{vasopressor}_{i}"]) else None for i in range(24)]
-        patient.update_vasopressor(pd.DataFrame(vasopressor_data))
+        source_stat = os.stat(file_path)
+        patient_store = load_patient_store(
+            file_path, source_stat.st_mtime_ns, source_stat.st_size)
+        patient = patient_store.build_compact_patient(patient_row_index)
 
         print(f"Loaded patient data for row index {patient_row_index} from {file_path}")
         print(patient.to_dict())
@@ -103,13 +38,23 @@ def load_patient_raw_data(file_path, patient_row_index):
         return None
 
 
+@st.cache_resource
+def load_patient_ml_arrays(file_path):
+    """
+    Reads the selected patients' ML arrays from the .npz file once.
+    The arrays are shared across sessions and must not be modified.
+    """
+    with np.load(file_path, allow_pickle=True) as data:
+        return {key: data[key] for key in data.files}
+
+
 def load_patient_ml_data(file_path, patient_row_index):
     """
     Loads patient ML data from a .npz file.
     Returns a tuple (static, timeseries, y) if y_sel exists, else (static, timeseries, None).
     """
     try:
-        data = np.load(file_path, allow_pickle=True)
+        data = load_patient_ml_arrays(file_path)
         static = data['X_static_sel'][patient_row_index]
         timeseries = data['X_timeseries_sel'][patient_row_index]
         y = data['y_sel'][patient_row_index] if 'y_sel' in data else None
@@ -131,23 +76,25 @@ def load_patient_ml_data(file_path, patient_row_index):
 def load_shap_background_data(file_path_ml):
     """
     Loads background static and timeseries data for the SHAP deep explainer.
-    Reads all rows from the provided ML file (in .npz format) and extracts the static and timeseries patient data.
+    The patients of the provided ML file (in .npz format) are reduced to a small weighted summary
+    (k-means centroids or a stratified sample, see src/shap_background.py), which is persisted next
+    to the ML file. A weighted summary is expanded to a fixed number of rows, so the explanation cost
+    does not grow with the size of the ML file; small, unweighted cohorts are used as they are.
 
     Args:
     file_path_ml (str): Path to the .npz file containing the ML data.
 
     Returns:
     A tuple (static_data, timeseries_data) where:
-        static_data: numpy array with shape [num_patients, num_features] containing the static data,
-        timeseries_data: numpy array with shape [num_patients, time_steps, features] containing the timeseries data,
+        static_data: numpy array with shape [num_rows, num_features] containing the static data,
+        timeseries_data: numpy array with shape [num_rows, time_steps, features] containing the timeseries data,
     or (None, None) if loading fails.
     """
     try:
-        data = np.load(file_path_ml, allow_pickle=True)
-        static_data = data['X_static_sel']
-        timeseries_data = data['X_timeseries_sel']
-        # Convert data to float32 for the deep explainer
-        return static_data.astype(np.float32), timeseries_data.astype(np.float32)
+        static_data, timeseries_data, weights = load_summarized_background(
+            file_path_ml)
+        # Expand a weighted summary into float32 rows for the deep explainer
+        return expand_weighted_background(static_data, timeseries_data, weights)
     except FileNotFoundError:
         st.error(f"Patient ML file not found: {file_path_ml}")
         return None, None
@@ -192,56 +139,107 @@ def load_feature_metadata(file_path: str) -> dict:
     return feature_metadata
 
 
+def get_data_file_path(file_name):
+    """Returns the path of a file in the app's data directory."""
+    current_dir = os.path.dirname(os.path.realpath(__file__))
+    return os.path.normpath(os.path.join(current_dir, "../data", file_name))
+
+
+def resolve_patient_row_index(study_xui_selection, current_patient_index, patient_order):
+    """
+    Maps the study position to the patient's row in the patient data files.
+    The training patient is row 6; the explanatory and exploratory XUI each show three patients,
+    rows 0-2 and 3-5 in the order given by patient_order.
+
+    Returns:
+        int: Row index of the patient, or None if all patients of the XUI have been loaded.
+    """
+    if study_xui_selection == 3:  # Training Patient
+        return 6
+    if current_patient_index >= 3:
+        return None  # All patients of the XUI loaded
+    if study_xui_selection == 0:  # Explanatory XUI
+        # If patient_order = 0, use 1-3 patients; if patient_order = 1, use next 4-6 patients
+        offsets = {0: 0, 1: 3}
+    else:  # Exploratory XUI
+        offsets = {0: 3, 1: 0}
+    if patient_order not in offsets:
+        return None
+    return current_patient_index + offsets[patient_order]
+
+
+def prefetch_patient_data(study_xui_selection, current_patient_index):
+    """
+    Prepares the patient that load_patient_data() will load for the given study position:
+    the patient and its ML tensors are loaded into st.session_state.prefetched_patient, and
+    its risk and SHAP values are submitted to the job executor. load_patient_data() then swaps in
+    the prefetched patient and its predicted risk, and the SHAP job of the patient is already
+    running or finished.
+    """
+    patient_row_index = resolve_patient_row_index(
+        study_xui_selection, current_patient_index, st.session_state.patient_order)
+    if patient_row_index is None:
+        return
+    prefetched_patient = st.session_state.prefetched_patient
+    if prefetched_patient is not None and prefetched_patient["row_index"] == patient_row_index:
+        return
+
+    patient = load_patient_raw_data(
+        get_data_file_path("patient_raw_data.csv"), patient_row_index)
+    ml_data = load_patient_ml_data(
+        get_data_file_path("patient_ml_data.npz"), patient_row_index)
+    if patient is None or ml_data is None:
+        return
+    static, timeseries, y = ml_data
+
+    st.session_state.sepsis_prediction_model.submit_risk_job(
+        patient.patient_id, static, timeseries)
+    st.session_state.sepsis_prediction_model.submit_shap_values_job(
+        patient.patient_id, static, timeseries)
+    st.session_state.prefetched_patient = {
+        "row_index": patient_row_index,
+        "patient": patient,
+        "ml_data": {"static": static, "timeseries": timeseries, "y": y},
+    }
+
+
 def load_patient_data(study_xui_selection, current_patient_index):
     """
     Loads patient data based on study selection and patient index.
     """
     print("Loading patient data...")
-    current_dir = os.path.dirname(os.path.realpath(__file__))
-    file_path_raw = os.path.normpath(os.path.join(
-        current_dir, "../data", "patient_raw_data.csv"))
-    file_path_ml = os.path.normpath(os.path.join(
-        current_dir, "../data", "patient_ml_data.npz"))
-    file_path_static_feature_names = os.path.normpath(os.path.join(
-        current_dir, "../data", "feature_mapping_static.csv"))
-    file_path_timeseries_feature_names = os.path.normpath(os.path.join(
-        current_dir, "../data", "feature_mapping_timeseries.csv"))
-    file_path_patient_base = os.path.normpath(os.path.join(
-        current_dir, "../data", "patient_base_statistics.csv"))
-    file_path_global_feature_importance_static = os.path.normpath(os.path.join(
-        current_dir, "../data", "global_static_importance.npy"))
-    file_path_global_feature_importance_timeseries = os.path.normpath(os.path.join(
-        current_dir, "../data", "global_timeseries_importance.npy"))
-    if study_xui_selection == 3:  # Training Patient
-        patient_row_index = 6
-    elif study_xui_selection == 0:  # Explanatory XUI
-        if current_patient_index < 3:
-            # If patient_order = 0, use 1-3 patients
-            if st.session_state.patient_order == 0:
-                patient_row_index = current_patient_index
-            # If patient_order = 1, use next 4-6 patients
-            elif st.session_state.patient_order == 1:
-                patient_row_index = current_patient_index + 3
-        else:  # Exploratroy XUI
-            return None  # All explanatory patients loaded
-    else:  # Exploratory
-        if current_patient_index < 3:
-            if st.session_state.patient_order == 0:
-                # Adjust the index for exploratory patients
-                exploratory_index = current_patient_index + 3
-                patient_row_index = exploratory_index
-            elif st.session_state.patient_order == 1:
-                patient_row_index = current_patient_index
-        else:
-            return None  # All exploratory patients loaded
-
-    # Load the patient data
-    patient = load_patient_raw_data(file_path_raw, patient_row_index)
-    print(f"Loaded patient data for row index {patient_row_index} from {file_path_raw}")
-    print(patient.to_dict())
-    static, timeseries, y = load_patient_ml_data(
-        file_path_ml, patient_row_index)
-    patient_ml_data = {"static": static, "timeseries": timeseries, "y": y}
+    file_path_raw = get_data_file_path("patient_raw_data.csv")
+    file_path_ml = get_data_file_path("patient_ml_data.npz")
+    file_path_static_feature_names = get_data_file_path(
+        "feature_mapping_static.csv")
+    file_path_timeseries_feature_names = get_data_file_path(
+        "feature_mapping_timeseries.csv")
+    file_path_patient_base = get_data_file_path(
+        "patient_base_statistics.csv")
+    file_path_global_feature_importance_static = get_data_file_path(
+        "global_static_importance.npy")
+    file_path_global_feature_importance_timeseries = get_data_file_path(
+        "global_timeseries_importance.npy")
+    patient_row_index = resolve_patient_row_index(
+        study_xui_selection, current_patient_index, st.session_state.patient_order)
+    if patient_row_index is None:
+        return None  # All patients of the XUI loaded
+
+    # Load the patient data, unless it was prefetched while the previous patient was evaluated
+    prefetched_patient = st.session_state.prefetched_patient
+    st.session_state.prefetched_patient = None
+    if prefetched_patient is not None and prefetched_patient["row_index"] == patient_row_index:
+        patient = prefetched_patient["patient"]
+        patient_ml_data = prefetched_patient["ml_data"]
+    else:
+        patient = load_patient_raw_data(file_path_raw, patient_row_index)
+        static, timeseries, y = load_patient_ml_data(
+            file_path_ml, patient_row_index)
+        patient_ml_data = {"static": static,
+                           "timeseries": timeseries, "y": y}
+    # Drop the session's jobs of other patients, e.g. the SHAP values of the previous patient
+    get_job_executor().discard_session(
+        get_session_id(), keep_patient_id=patient.patient_id)
     # Load the feature mapping list
     static_feature_names = load_feature_names(file_path_static_feature_names)
     timeseries_feature_names = load_feature_names(
@@ -284,9 +282,15 @@ def load_patient_data(study_xui_selection, current_patient_index):
     st.session_state.background_static = background_static
     st.session_state.background_timeseries = background_timeseries
     st.session_state.patient_base = patient_base
-
-    # Create the counterfactual copy of the patient as initial state
-    st.session_state.counterfactual_patient = deepcopy(patient)
+    # Risk of the patient, predicted by the prefetch of the patient if it was prefetched
+    st.session_state.patient_risk = round(st.session_state.sepsis_prediction_model.collect_risk(
+        patient.patient_id, patient_ml_data["static"], patient_ml_data["timeseries"]), 2)
+
+    # Create the copy-on-write counterfactual of the patient as initial state
+    st.session_state.counterfactual_patient = CounterfactualPatient(patient)
+    # The what-if engine is built from the new patient on first use
+    st.session_state.counterfactual_engine = None
+    st.session_state.scenario_store = None
 
     # Load the aggregated SHAP values from the .npy files
     global_static_importance = np.load(
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Number of worker threads shared by all sessions.
+# Model and SHAP jobs are mostly TensorFlow work, which is parallelized within each job
+# (see configure_tensorflow_threads).
+JOB_WORKERS = 2
+# Seconds between two checks of a pending job by wait_for_job().
+JOB_POLL_INTERVAL = 0.5
+# Seconds a finished job is kept for collection; jobs of closed sessions are dropped after it.
+JOB_RESULT_TTL = 600
+
+
+class JobExecutor:
+    """
+    Process-wide worker pool for model and SHAP jobs, so they do not block the Streamlit script thread.
+    Jobs are keyed, e.g. by (session id, patient id, job name): submitting a key that is still pending
+    returns the existing job, and the script polls the key on later reruns.
+    Finished jobs whose result is not collected within result_ttl seconds are forgotten.
+    Jobs run without a Streamlit script context and must not access st.session_state.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, result_ttl=JOB_RESULT_TTL):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job_executor")
+        self.result_ttl = result_ttl
+        self.futures = {}
+        # Time at which each finished job was first seen finished (time.monotonic()).
+        self.finished_at = {}
+        self.lock = threading.Lock()
+
+    def submit(self, key, function, *args, **kwargs):
+        """
+        Runs function(*args, **kwargs) on a worker thread, unless a job with the same key exists.
+
+        Returns:
+            concurrent.futures.Future: The job's future.
+        """
+        with self.lock:
+            self.evict_expired()
+            future = self.futures.get(key)
+            if future is None or future.cancelled():
+                future = self.executor.submit(function, *args, **kwargs)
+                self.futures[key] = future
+                self.finished_at.pop(key, None)
+            return future
+
+    def evict_expired(self):
+        """
+        Forgets the finished jobs whose result was not collected within result_ttl seconds.
+        Must be called with the lock held; the finish time of a job is taken when it is first seen done.
+        """
+        now = time.monotonic()
+        for key, future in self.futures.items():
+            if key not in self.finished_at and future.done():
+                self.finished_at[key] = now
+        for key in [key for key, finished in self.finished_at.items() if finished <= now - self.result_ttl]:
+            del self.finished_at[key]
+            del self.futures[key]
+
+    def has_job(self, key) -> bool:
+        """Returns whether a job with the key was submitted and its result not yet collected."""
+        with self.lock:
+            return key in self.futures
+
+    def done(self, key) -> bool:
+        """Returns whether the job with the key has finished (False if there is no such job)."""
+        with self.lock:
+            future = self.futures.get(key)
+        return future is not None and future.done()
+
+    def pop_result(self, key):
+        """
+        Returns the result of a finished job and forgets the job.
+        Raises the job's exception if it failed.
+        """
+        with self.lock:
+            future = self.futures.pop(key)
+            self.finished_at.pop(key, None)
+        return future.result()
+
+    def cancel(self, key):
+        """Cancels a job that has not started yet and forgets it; a running job finishes unobserved."""
+        with self.lock:
+            future = self.futures.pop(key, None)
+            self.finished_at.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def discard_session(self, session_id, keep_patient_id=None):
+        """
+        Cancels and forgets the jobs of a session, e.g. when it loads another patient.
+        Jobs are matched by their (session id, patient id, job name) key; those of keep_patient_id are kept.
+        """
+        with self.lock:
+            keys = [key for key in self.futures
+                    if key[0] == session_id and key[1] != keep_patient_id]
+        for key in keys:
+            self.cancel(key)
+
+
+def configure_tensorflow_threads(tf):
+    """
+    Sizes TensorFlow's thread pools for JOB_WORKERS concurrent jobs: each op uses an equal share of
+    the CPU cores (intra-op), and up to JOB_WORKERS ops, one per job, run at the same time (inter-op).
+    Called when TensorFlow is first imported; the pools cannot be resized once TensorFlow has run an op.
+    """
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(
+            max(1, (os.cpu_count() or 1) // JOB_WORKERS))
+        tf.config.threading.set_inter_op_parallelism_threads(JOB_WORKERS)
+    except RuntimeError:
+        # TensorFlow already ran an op before it was loaded through the app; keep its defaults.
+        pass
+
+
+@st.cache_resource
+def get_job_executor() -> JobExecutor:
+    """Returns the job executor shared by all sessions of the app."""
+    return JobExecutor()
+
+
+def get_session_id() -> str:
+    """Returns the id of the current Streamlit session, used to key its jobs."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "default"
+
+
+def wait_for_job(is_ready, message, poll_interval=JOB_POLL_INTERVAL):
+    """
+    Shows a placeholder while a job is pending and reruns the app once is_ready() returns True,
+    so the views that depend on the job are filled in without user interaction.
+    """
+    @st.fragment(run_every=poll_interval)
+    def poll_job():
+        if is_ready():
+            st.rerun(scope="app")
+        st.info(message, icon=":material/hourglass_top:")
+
+    poll_job()
@@ -0,0 +1,33 @@
+import importlib
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is imported on first attribute access.
+    Used for the heavy ML stack (TensorFlow, SHAP), so that importing the app's modules
+    does not pay for it and pages without a model render immediately.
+    on_load(module) is called once after the import, before any other thread can use the module.
+    """
+
+    def __init__(self, name, on_load=None):
+        super().__init__(name)
+        self._lock = threading.Lock()
+        self._module = None
+        self._on_load = on_load
+
+    def load(self) -> types.ModuleType:
+        """Imports the module (once, thread-safe) and returns it."""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    module = importlib.import_module(self.__name__)
+                    if self._on_load is not None:
+                        self._on_load(module)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
@@ -0,0 +1,178 @@
+import io
+import json
+import re
+import zipfile
+import h5py
+import numpy as np
+
+
+def sigmoid(x):
+    """
+    Logistic function split by sign: 1 / (1 + exp(-x)) for x >= 0 and exp(x) / (1 + exp(x)) for x < 0,
+    so exp() never overflows for large negative x.
+    """
+    return np.exp(np.minimum(x, 0)) / (1 + np.exp(-np.abs(x)))
+
+
+# Activations of the supported layers.
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "sigmoid": sigmoid,
+    "tanh": np.tanh,
+}
+
+
+class NumpyInferenceModel:
+    """
+    Forward pass of a functional Keras model in pure NumPy, without importing TensorFlow.
+    Reads the layer graph from the .keras archive's config.json and the weights from its
+    model.weights.h5. Supports the layers of the sepsis mortality model: InputLayer, Dense,
+    LSTM (last output or full sequence), Dropout (identity at inference) and Concatenate.
+    All computations run in float32 on whole batches.
+    """
+
+    def __init__(self, layers, input_names, output_names, weights):
+        # Layer configs in topological order, as saved by Keras.
+        self.layers = layers
+        self.input_names = input_names
+        self.output_names = output_names
+        # Weight arrays per layer name.
+        self.weights = weights
+
+    @classmethod
+    def from_keras_archive(cls, file_path):
+        """
+        Loads the model from a .keras archive.
+
+        Raises:
+            ValueError: If the model contains a layer or option that is not supported.
+        """
+        with zipfile.ZipFile(file_path) as archive:
+            config = json.loads(archive.read("config.json"))
+            weights_file = io.BytesIO(archive.read("model.weights.h5"))
+
+        model_config = config["config"]
+        layers = []
+        weights = {}
+        # Keras stores the weights per layer under the snake case class name, numbered per class.
+        class_counts = {}
+        with h5py.File(weights_file, "r") as weights_h5:
+            for layer in model_config["layers"]:
+                class_name = layer["class_name"]
+                cls.check_layer(layer)
+                weights_name = re.sub(r"([a-z])([A-Z])", r"\1_\2",
+                                      re.sub(r"(.)([A-Z][a-z]+)", r"\1_\2", class_name)).lower()
+                count = class_counts.get(weights_name, 0)
+                class_counts[weights_name] = count + 1
+                if count:
+                    weights_name = f"{weights_name}_{count}"
+
+                group = weights_h5["layers"][weights_name]
+                if class_name == "LSTM":
+                    group = group["cell"]
+                variables = group["vars"]
+                weights[layer["config"]["name"]] = [
+                    np.array(variables[str(i)], dtype=np.float32) for i in range(len(variables))]
+                layers.append(layer)
+
+        return cls(layers,
+                   [name for name, _, _ in model_config["input_layers"]],
+                   [name for name, _, _ in model_config["output_layers"]],
+                   weights)
+
+    @staticmethod
+    def check_layer(layer):
+        """Raises a ValueError if the layer cannot be computed by this engine."""
+        class_name = layer["class_name"]
+        config = layer["config"]
+        if class_name not in ("InputLayer", "Dense", "LSTM", "Dropout", "Concatenate"):
+            raise ValueError(f"Layer type '{class_name}' is not supported.")
+        if config.get("activation", "linear") not in ACTIVATIONS:
+            raise ValueError(
+                f"Activation '{config['activation']}' of layer '{config['name']}' is not supported.")
+        if class_name == "LSTM" and (config["go_backwards"] or config["return_state"] or config["stateful"]
+                                     or config["recurrent_activation"] not in ACTIVATIONS):
+            raise ValueError(f"LSTM options of layer '{config['name']}' are not supported.")
+
+    def __call__(self, static_data, timeseries_data):
+        """Alias of predict() with the call signature of the compiled Keras forward pass."""
+        return self.predict([static_data, timeseries_data])
+
+    def predict(self, inputs):
+        """
+        Runs the forward pass.
+
+        Args:
+            inputs (list): One array per model input, in the model's input order.
+
+        Returns:
+            np.ndarray: Output of the (first) output layer, e.g. (N, 1).
+        """
+        outputs = {name: np.asarray(data, dtype=np.float32)
+                   for name, data in zip(self.input_names, inputs)}
+        for layer in self.layers:
+            name = layer["config"]["name"]
+            if layer["class_name"] == "InputLayer":
+                continue
+            outputs[name] = self.compute_layer(
+                layer, [outputs[source] for source in self.get_sources(layer)])
+        return outputs[self.output_names[0]]
+
+    @staticmethod
+    def get_sources(layer):
+        """Returns the names of the layers whose outputs are the layer's inputs."""
+        arguments = layer["inbound_nodes"][0]["args"]
+        tensors = arguments[0] if isinstance(arguments[0], list) else arguments
+        return [tensor["config"]["keras_history"][0] for tensor in tensors]
+
+    def compute_layer(self, layer, inputs):
+        """Computes the output of one layer from its input arrays."""
+        class_name = layer["class_name"]
+        config = layer["config"]
+        weights = self.weights[config["name"]]
+
+        if class_name == "Dense":
+            output = inputs[0] @ weights[0]
+            if config["use_bias"]:
+                output = output + weights[1]
+            return ACTIVATIONS[config["activation"]](output)
+        if class_name == "Dropout":
+            return inputs[0]
+        if class_name == "Concatenate":
+            return np.concatenate(inputs, axis=config["axis"])
+        return self.compute_lstm(config, weights, inputs[0])
+
+    @staticmethod
+    def compute_lstm(config, weights, sequence):
+        """
+        Runs an LSTM over a batch of sequences (N, T, C).
+        Keras orders the gates as input, forget, cell and output.
+        """
+        kernel, recurrent_kernel = weights[0], weights[1]
+        bias = weights[2] if config["use_bias"] else 0
+        activation = ACTIVATIONS[config["activation"]]
+        recurrent_activation = ACTIVATIONS[config["recurrent_activation"]]
+        units = config["units"]
+
+        n_sequences, n_steps, _ = sequence.shape
+        hidden = np.zeros((n_sequences, units), dtype=np.float32)
+        cell = np.zeros((n_sequences, units), dtype=np.float32)
+        # The input projection of all time steps at once.
+        projected = sequence @ kernel + bias
+        hidden_states = []
+        for step in range(n_steps):
+            gates = projected[:, step] + hidden @ recurrent_kernel
+            input_gate = recurrent_activation(gates[:, :units])
+            forget_gate = recurrent_activation(gates[:, units:2 * units])
+            cell_candidate = activation(gates[:, 2 * units:3 * units])
+            output_gate = recurrent_activation(gates[:, 3 * units:])
+            cell = forget_gate * cell + input_gate * cell_candidate
+            hidden = output_gate * activation(cell)
+            if config["return_sequences"]:
+                hidden_states.append(hidden)
+
+        if config["return_sequences"]:
+            return np.stack(hidden_states, axis=1)
+        return hidden
+
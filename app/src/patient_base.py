@@ -160,3 +160,47 @@ class PatientBase:
                     f"Statistic '{row_key}' not found in dataframe index.")
             result[key] = self._df.at[row_key, feature]
         return result
+
+    def get_statistics_table(self, features: list) -> pd.DataFrame:
+        """
+        Get the statistics of several features at once, as returned by get_feature_statistics().
+
+        Parameters:
+            features (list): The feature (column) names.
+
+        Returns:
+            pd.DataFrame: One row per feature (in the given order) with the float columns "min", "max",
+                          "survivors_lower", "survivors_upper", "non_survivors_lower", "non_survivors_upper"
+                          and an "error" column holding the message get_feature_statistics() would raise
+                          for the feature (None if its statistics are available; the statistics are NaN otherwise).
+
+        Raises:
+            ValueError: If the dataframe is not set.
+        """
+        if self._df is None:
+            raise ValueError(
+                "Dataframe is not set. Please set it using set_dataframe().")
+
+        statistic_mapping = {
+            "min": "min",
+            "max": "max",
+            "survivors_lower": "survivor_lower",
+            "survivors_upper": "survivor_upper",
+            "non_survivors_lower": "non_survivor_lower",
+            "non_survivors_upper": "non_survivor_upper"
+        }
+
+        missing_rows = [row_key for row_key in statistic_mapping.values()
+                        if row_key not in self._df.index]
+        table = self._df.reindex(index=list(statistic_mapping.values()), columns=features).T
+        table = table.apply(pd.to_numeric, errors="coerce").astype(float)
+        table.columns = list(statistic_mapping.keys())
+
+        available = pd.Index(features).isin(self._df.columns)
+        table["error"] = [
+            None if is_available and not missing_rows else
+            f"Feature '{feature}' not found in dataframe columns." if not is_available else
+            f"Statistic '{missing_rows[0]}' not found in dataframe index."
+            for feature, is_available in zip(features, available)
+        ]
+        return table
@@ -70,9 +70,16 @@ class Patient:
         })
         # Add ml_data attribute to store ML data of this patient object
         self.ml_data = {"static": None, "timeseries": None, "y": None}
+        # Row index of this patient in the raw patient data, used to identify the patient in caches
+        self.patient_id = None
+        # Resolved feature values, built on first lookup and dropped by every update_* method
+        self.feature_index = None
+        # Incremented whenever the patient's data changes, used to key caches of derived data
+        self.data_version = 0
 
     def update_demographics(self, data):
         self.demographics.update(data)
+        self.invalidate_feature_index()
 
         # Find Ethnicity and Gender
         if self.demographics['race_white'] == 1:
@@ -91,30 +98,39 @@ class Patient:
 
     def update_scores(self, data):
         self.scores.update(data)
+        self.invalidate_feature_index()
 
     def update_diagnosis(self, data):
         self.diagnosis.update(data)
+        self.invalidate_feature_index()
 
     def update_specimen(self, data):
         self.specimen.update(data)
+        self.invalidate_feature_index()
 
     def update_clinical_data(self, data):
         self.clinical_data.update(data)
+        self.invalidate_feature_index()
 
     def update_laboratory(self, labs):
         self.laboratory = labs
+        self.invalidate_feature_index()
 
     def update_laboratory_df(self, df):
         self.laboratory = df
+        self.invalidate_feature_index()
 
     def update_vitals(self, data):
         self.vitals = pd.DataFrame(data)
+        self.invalidate_feature_index()
 
     def update_vasopressor(self, data):
         self.vasopressor = pd.DataFrame(data)
+        self.invalidate_feature_index()
 
     def update_urineoutput(self, data):
         self.urineoutput = pd.DataFrame(data)
+        self.invalidate_feature_index()
 
     def update_ml_data(self, data):
         self.ml_data.update(data)
@@ -191,6 +207,99 @@ class Patient:
         """
         Provides the value of a feature based on the feature name.
         For timeseries features (vitals, vasopressor, urineoutput), returns the average.
+        Looks the feature up in the feature index; features outside the index are resolved directly.
+
+        Args:
+            feature_name (str): Name of the feature.
+
+        Returns:
+            Value of the feature or None if not found.
+        """
+        if self.feature_index is None:
+            self.feature_index = self.build_feature_index()
+        slot = self.feature_index["slots"].get(feature_name)
+        if slot is None:
+            return self.resolve_feature_value(feature_name)
+        return self.feature_index["objects"][slot]
+
+    def get_feature_values(self, feature_names):
+        """
+        Provides the values of several features as one float array, gathered from the feature index.
+
+        Args:
+            feature_names (list): Names of the features.
+
+        Returns:
+            np.ndarray: Float64 array with one value per feature; NaN for missing or non-numeric values.
+        """
+        if self.feature_index is None:
+            self.feature_index = self.build_feature_index()
+        slots = self.feature_index["slots"]
+        positions = np.fromiter((slots.get(feature_name, -1) for feature_name in feature_names),
+                                dtype=np.intp, count=len(feature_names))
+        values = self.feature_index["values"][positions]
+        for i in np.flatnonzero(positions < 0):
+            values[i] = to_float(self.resolve_feature_value(feature_names[i]))
+        return values
+
+    def invalidate_feature_index(self):
+        """Drops the feature index after a data change; it is rebuilt on the next lookup."""
+        self.feature_index = None
+        self.data_version += 1
+
+    def build_feature_index(self):
+        """
+        Resolves every feature the patient holds once: the values of the demographics, scores,
+        clinical data, specimen and diagnosis entries, every "<lab>_<statistic>" laboratory value and
+        the averages of the timeseries features, keyed by feature name as in resolve_feature_value().
+
+        Returns:
+            dict: {
+                "slots": position of each feature name in the arrays,
+                "objects": the values as resolve_feature_value() returns them,
+                "values": the values as a float64 array (NaN for missing or non-numeric values),
+            }
+        """
+        objects = {}
+        for feature_name in (list(self.demographics) + list(self.scores) + list(self.clinical_data)
+                             + list(self.specimen)):
+            if feature_name not in objects:
+                objects[feature_name] = self.resolve_feature_value(feature_name)
+        for prefix, keys in (("diagnosis_", self.diagnosis), ("specimen_group_", self.specimen)):
+            for key in keys:
+                feature_name = prefix + key
+                if feature_name not in objects:
+                    objects[feature_name] = self.resolve_feature_value(feature_name)
+
+        # Laboratory values are read column-wise instead of one .loc lookup per feature.
+        if isinstance(self.laboratory, pd.DataFrame) and self.laboratory.index.is_unique:
+            lab_names = [lab for lab in self.laboratory.index if isinstance(lab, str)]
+            lab_rows = self.laboratory.index.get_indexer(lab_names)
+            for column_name in ["count", "mean", "max", "min", "slope"]:
+                if column_name not in self.laboratory.columns or not self.laboratory.columns.is_unique:
+                    continue
+                column = self.laboratory[column_name].to_numpy()
+                for lab, row in zip(lab_names, lab_rows):
+                    feature_name = f"{lab}_{column_name}"
+                    if (feature_name not in objects and not feature_name.startswith("diagnosis_")
+                            and not feature_name.startswith("specimen_group_")):
+                        objects[feature_name] = column[row]
+
+        for df in (self.vitals, self.vasopressor, self.urineoutput):
+            for feature_name in df.columns:
+                if isinstance(feature_name, str) and feature_name not in objects:
+                    objects[feature_name] = self.resolve_feature_value(feature_name)
+
+        return {
+            "slots": {feature_name: slot for slot, feature_name in enumerate(objects)},
+            "objects": list(objects.values()),
+            # Trailing NaN slot for the -1 position of features outside the index.
+            "values": np.array([to_float(value) for value in objects.values()] + [np.nan], dtype=np.float64),
+        }
+
+    def resolve_feature_value(self, feature_name):
+        """
+        Resolves the value of a feature from the patient's data sources by its name.
 
         Args:
             feature_name (str): Name of the feature.
@@ -247,7 +356,7 @@ class Patient:
         else:
             return ""
 
-    def update_feature_with_scaling(self, data_type, feature_name, absolute_value):
+    def update_feature_with_scaling(self, data_type, feature_name, absolute_value, patient_base):
         """
         Adjusts the specified feature in the given data source so that its new average becomes close to absolute_value.
         It finds a multiplicative scale (applied to each original value and then clipped to the original bounds)
@@ -262,6 +371,7 @@ class Patient:
             data_type (str): One of "vitals", "urineoutput", or "vasopressor" indicating which dataframe to update.
             feature_name (str): Name of the feature within the specified dataframe.
             absolute_value (float): The desired new average value for the feature.
+            patient_base (PatientBase): Statistics of the patient base; its min and max bound the new values.
         """
         # Select the appropriate DataFrame based on data_type
         if data_type == "vitals":
@@ -276,65 +386,55 @@ class Patient:
         if feature_name not in df.columns:
             return
 
-        # Work with float values and make a copy
-        series = df[feature_name].astype(float).copy()
-        orig = series.copy()
-
-        # Use global bounds from st.session_state.patient_base via get_feature_statistics
-        stats = st.session_state.patient_base.get_feature_statistics(
+        # Use global bounds from the patient base via get_feature_statistics
+        stats = patient_base.get_feature_statistics(
             feature_name)
-        lower_bound = stats["min"]
-        upper_bound = stats["max"]
-
-        # Current mean
-        old_mean = orig.mean()
-
-        # If the series is constant or very close to zero mean for vasopressor, set every value to absolute_value.
-        if data_type == "vasopressor" and abs(old_mean) < 1e-9:
-            new_series = pd.Series(
-                [absolute_value] * len(orig), index=orig.index)
-            new_series = new_series.round(2)
-            df[feature_name] = new_series
+
+        new_values = rescale_timeseries_values(
+            data_type, feature_name, df[feature_name].to_numpy(dtype=float),
+            absolute_value, stats["min"], stats["max"])
+        if new_values is None:
             return
-        elif abs(old_mean) < 1e-9:
+
+        # Update the appropriate DataFrame
+        df[feature_name] = new_values
+        self.invalidate_feature_index()
+
+    def update_features_with_scaling(self, absolute_values, patient_base):
+        """
+        Vectorized update_feature_with_scaling for several timeseries features at once.
+        The scales of all features are solved in one call.
+
+        Args:
+            absolute_values (dict): The desired new average value per vitals, urineoutput or vasopressor feature.
+            patient_base (PatientBase): Statistics of the patient base; its min and max bound the new values.
+        """
+        frames = {"vitals": self.vitals,
+                  "urineoutput": self.urineoutput, "vasopressor": self.vasopressor}
+        data_types, feature_names, targets = [], [], []
+        for feature_name, absolute_value in absolute_values.items():
+            for data_type, df in frames.items():
+                if feature_name in df.columns:
+                    data_types.append(data_type)
+                    feature_names.append(feature_name)
+                    targets.append(absolute_value)
+                    break
+        if not feature_names:
             return
 
-        # Helper function to compute the average after applying a scale and clipping
-        def clipped_avg(scale_factor):
-            scaled = (orig * scale_factor).clip(lower_bound, upper_bound)
-            return scaled.mean()
-
-        # Binary search over a range of possible scale factors
-        tol = 1e-4
-        low = 0.0
-        naive_ratio = absolute_value / old_mean
-        high = max(naive_ratio * 10, 10)
-        scale = 1.0
-        for _ in range(100):
-            mid = (low + high) / 2
-            avg_mid = clipped_avg(mid)
-            if abs(avg_mid - absolute_value) < tol:
-                scale = mid
-                break
-            if avg_mid < absolute_value:
-                low = mid
-            else:
-                high = mid
-            scale = mid
-
-        # Apply the determined scale and clip to bounds
-        new_series = (orig * scale).clip(lower_bound, upper_bound)
-
-        # Convert values: for "tempc" in vitals round to 1 decimal place, for vasopressor round to 2 decimals, for others convert to int.
-        if data_type == "vitals" and feature_name == "tempc":
-            new_series = new_series.round(1)
-        elif data_type == "vasopressor":
-            new_series = new_series.round(2)
-        else:
-            new_series = new_series.round().astype(int)
+        # Use global bounds from the patient base via get_feature_statistics
+        statistics = [patient_base.get_feature_statistics(
+            feature_name) for feature_name in feature_names]
+        values = np.array([frames[data_type][feature_name].to_numpy(dtype=float)
+                           for data_type, feature_name in zip(data_types, feature_names)])
 
-        # Update the appropriate DataFrame
-        df[feature_name] = new_series
+        new_values = rescale_timeseries_block(
+            data_types, feature_names, values, targets,
+            [stats["min"] for stats in statistics], [stats["max"] for stats in statistics])
+        for data_type, feature_name, feature_values in zip(data_types, feature_names, new_values):
+            if feature_values is not None:
+                frames[data_type][feature_name] = feature_values
+        self.invalidate_feature_index()
 
     def update_vitals_average(self, new_average):
         """
@@ -346,79 +446,55 @@ class Patient:
         for key, value in new_average.items():
             if key in self.vitals.columns:
                 self.vitals[key] = value
+        self.invalidate_feature_index()
+
+    def get_raw_ml_arrays(self, static_feature_names, timeseries_feature_names):
+        """
+        Gathers the unscaled patient data in the model's feature order.
+
+        Args:
+            static_feature_names (list): Static feature names in model input order.
+            timeseries_feature_names (list): Timeseries feature names in model input order.
+
+        Returns:
+            tuple: Raw static data (1, F) and timeseries data (1, 24, C) as float64 arrays,
+                with NaN for missing values.
+        """
+        static_raw = self.get_feature_values(static_feature_names)[np.newaxis, :]
+
+        #   (24, n_features) array in the model's feature order
+        timeseries_frames = (self.vitals, self.urineoutput, self.vasopressor)
+        n_hours = 24
+        timeseries_raw = np.full(
+            (1, n_hours, len(timeseries_feature_names)), np.nan)
+        for channel, feature in enumerate(timeseries_feature_names):
+            for df in timeseries_frames:
+                if feature in df.columns:
+                    timeseries_raw[0, :, channel] = df[feature].to_numpy(
+                        dtype=np.float64)[:n_hours]
+                    break
+
+        return static_raw, timeseries_raw
 
     def convert_to_ml_data(self):
         """
         Converts all raw patient data into the machine learning data format.
         Builds numpy arrays for static features and a (1, 24, n_features) timeseries tensor.
+        The raw values are gathered into arrays and scaled by the prediction model's scalers
+        without intermediate DataFrames.
         """
-        import numpy as np
-        import pandas as pd
-        import streamlit as st
-
-        # 1) STATIC FEATURES ---------------------------------------------------
-        static_vals = [
-            self.get_feature_value(f)
-            for f in st.session_state.static_feature_names
-        ]
-        ordered_static_df = pd.DataFrame(
-            [static_vals],
-            columns=st.session_state.static_feature_names
-        )
+        static_feature_names = st.session_state.static_feature_names
+        timeseries_feature_names = st.session_state.timeseries_feature_names
 
-        # 2) TIMESERIES FEATURES ------------------------------------------------
-        #   a) merge raw dataframes
-        merged = pd.concat(
-            [self.vitals, self.urineoutput, self.vasopressor],
-            axis=1
-        )
-        ordered_ts_df = merged[st.session_state.timeseries_feature_names]
+        static_raw, timeseries_raw = self.get_raw_ml_arrays(
+            static_feature_names, timeseries_feature_names)
 
-        #   b) flatten in FEATURE‑MAJOR order: feature_0…feature_23, next_feature_0…_23, …
-        n_hours = 24
-        flattened = {}
-        for feature in ordered_ts_df.columns:
-            for hour in range(n_hours):
-                flattened[f"{feature}_{hour}"] = ordered_ts_df.at[hour, feature]
-        ts_flat_df = pd.DataFrame([flattened])  # shape (1, 24 * n_features)
-
-        #   c) align columns exactly to what the scaler saw at fit time
-        scaler = st.session_state.sepsis_prediction_model.timeseries_scaler
-        expected_cols = list(scaler.feature_names_in_)
-        ts_flat_df = ts_flat_df.reindex(columns=expected_cols)
-
-        # 3) SCALE BOTH STATIC & TIMESERIES -------------------------------------
-        scaled_static_df, scaled_ts_flat_df = (
+        scaled_static, timeseries_array = (
             st.session_state.sepsis_prediction_model
-            .scale_ml_data(ordered_static_df, ts_flat_df)
-        )
-        # fill missing, cast
-        scaled_static = (
-            scaled_static_df
-            .fillna(-1)
-            .astype(np.float32)
-            .to_numpy()
-        )
-        scaled_ts_flat = (
-            scaled_ts_flat_df
-            .fillna(-1)
-            .astype(np.float32)
+            .scale_raw_arrays(static_raw, timeseries_raw,
+                              static_feature_names, timeseries_feature_names)
         )
 
-        # 4) RESHAPE TIMESERIES INTO (1, 24, n_features) ------------------------
-        n_features = len(ordered_ts_df.columns)
-        total_cols = scaled_ts_flat.shape[1]
-        assert total_cols == n_hours * n_features, (
-            f"Expected {n_hours}×{n_features}={n_hours*n_features} cols, "
-            f"got {total_cols}"
-        )
-
-        # scaled_ts_flat is feature-major, so first reshape to (n_features, n_hours)
-        arr = scaled_ts_flat.to_numpy().reshape(n_features, n_hours)
-        # then transpose to (n_hours, n_features) and add batch-dim
-        timeseries_array = arr.T[np.newaxis, :, :]
-
-        # 5) SAVE INTO self.ml_data ---------------------------------------------
         self.ml_data["static"] = scaled_static
         self.ml_data["timeseries"] = timeseries_array
 
@@ -437,3 +513,194 @@ class Patient:
         patient.vasopressor = pd.DataFrame(data.get("vasopressor", {}))
         patient.urineoutput = pd.DataFrame(data.get("urineoutput", {}))
         return patient
+
+
+def to_float(value):
+    """Converts a feature value to float; missing and non-numeric values become NaN."""
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def solve_scale_for_target_mean(values, target_mean, lower_bound, upper_bound):
+    """
+    Solves for the multiplicative scale s >= 0 at which mean(clip(values * s, lower, upper))
+    equals target_mean, in closed form.
+    The clipped mean is piecewise linear in s: every value contributes slope v / n while
+    v * s lies inside the bounds. The breakpoints are sorted once, the mean at every breakpoint
+    follows from a cumulative sum of the slopes, and the scale is interpolated on the first
+    segment that reaches the target. The scale is limited to [0, max(10 * target / mean, 10)],
+    the search range of the former binary search.
+
+    Args:
+        values (np.ndarray): Hourly values with shape (..., n); NaN values are ignored.
+        target_mean (float or np.ndarray): Target average per row, broadcast to shape (...).
+        lower_bound (float or np.ndarray): Lower clip bound per row.
+        upper_bound (float or np.ndarray): Upper clip bound per row.
+
+    Returns:
+        np.ndarray: Scale per row with shape (...).
+    """
+    values = np.asarray(values, dtype=float)
+    batch_shape = values.shape[:-1]
+    target_mean = np.broadcast_to(np.asarray(target_mean, dtype=float), batch_shape)
+    lower_bound = np.broadcast_to(np.asarray(lower_bound, dtype=float), batch_shape)
+    upper_bound = np.broadcast_to(np.asarray(upper_bound, dtype=float), batch_shape)
+
+    valid = ~np.isnan(values)
+    n_valid = np.maximum(valid.sum(axis=-1), 1)
+    v = np.where(valid, values, 0.0)
+    lower = lower_bound[..., np.newaxis]
+    upper = upper_bound[..., np.newaxis]
+
+    # Range of s >= 0 in which v * s lies strictly inside the bounds.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        start = np.where(v > 0, lower / v, upper / v)
+        end = np.where(v > 0, upper / v, lower / v)
+    active = valid & (v != 0)
+    start = np.where(active, np.maximum(start, 0.0), 0.0)
+    end = np.where(active, np.maximum(end, 0.0), 0.0)
+
+    # Slope events, sorted once: +v/n where a value starts moving, -v/n where it saturates.
+    positions = np.concatenate([start, end], axis=-1)
+    deltas = np.concatenate([v, -v], axis=-1) * \
+        np.concatenate([active, active], axis=-1) / n_valid[..., np.newaxis]
+    order = np.argsort(positions, axis=-1)
+    positions = np.take_along_axis(positions, order, axis=-1)
+    slopes = np.cumsum(np.take_along_axis(deltas, order, axis=-1), axis=-1)
+
+    # Clipped mean at s = 0 and at every breakpoint.
+    mean_at_zero = (np.where(valid, np.clip(0.0, lower, upper), 0.0).sum(axis=-1)
+                    / n_valid)
+    segment_gain = slopes[..., :-1] * np.diff(positions, axis=-1)
+    means = np.concatenate([
+        mean_at_zero[..., np.newaxis],
+        mean_at_zero[..., np.newaxis] + np.cumsum(segment_gain, axis=-1),
+    ], axis=-1)
+    # First breakpoint from which the following segment reaches the target.
+    target = target_mean[..., np.newaxis]
+    segment_end_means = np.concatenate(
+        [means[..., 1:], means[..., -1:]], axis=-1)
+    reaches = ((means <= target) & (segment_end_means >= target)) | (
+        (means >= target) & (segment_end_means <= target))
+    reaches[..., -1] = False
+    has_solution = reaches.any(axis=-1)
+    segment = np.argmax(reaches, axis=-1)[..., np.newaxis]
+
+    segment_start = np.take_along_axis(positions, segment, axis=-1)[..., 0]
+    segment_mean = np.take_along_axis(means, segment, axis=-1)[..., 0]
+    segment_slope = np.take_along_axis(slopes, segment, axis=-1)[..., 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        offset = np.where(segment_slope != 0,
+                          (target_mean - segment_mean) / segment_slope, 0.0)
+    scale = np.where(has_solution, segment_start + offset, np.nan)
+
+    # Targets outside the reachable range saturate at the end of the search range.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        old_mean = np.nansum(values, axis=-1) / n_valid
+        max_scale = np.maximum(np.nan_to_num(
+            target_mean / old_mean * 10, nan=10, posinf=10, neginf=10), 10)
+    scale = np.where(np.isnan(scale), np.where(
+        target_mean <= mean_at_zero, 0.0, max_scale), scale)
+    return np.clip(scale, 0.0, max_scale)
+
+
+def scale_to_target_mean(values, target_mean, lower_bound, upper_bound):
+    """
+    Scales the values so that the average of the scaled values, clipped to the bounds,
+    becomes target_mean (see solve_scale_for_target_mean).
+
+    Args:
+        values (np.ndarray): Original hourly values with shape (..., n); NaN values are ignored in the average.
+        target_mean (float or np.ndarray): The desired average per row.
+        lower_bound (float or np.ndarray): Lower clip bound per row.
+        upper_bound (float or np.ndarray): Upper clip bound per row.
+
+    Returns:
+        np.ndarray: The scaled and clipped values (not rounded).
+    """
+    values = np.asarray(values, dtype=float)
+    scale = solve_scale_for_target_mean(
+        values, target_mean, lower_bound, upper_bound)
+    return np.clip(values * scale[..., np.newaxis],
+                   np.asarray(lower_bound, dtype=float)[..., np.newaxis],
+                   np.asarray(upper_bound, dtype=float)[..., np.newaxis])
+
+
+def rescale_timeseries_values(data_type, feature_name, values, absolute_value, lower_bound, upper_bound):
+    """
+    Computes the new hourly values of a timeseries feature whose average should become absolute_value.
+    Vasopressors without any dose are set to absolute_value in every hour. Values are rounded like
+    the raw data: tempc to 1 decimal place, vasopressors to 2 decimals, all others to integers.
+
+    Args:
+        data_type (str): One of "vitals", "urineoutput", or "vasopressor".
+        feature_name (str): Name of the feature.
+        values (np.ndarray): Original hourly values as floats.
+        absolute_value (float): The desired new average value.
+        lower_bound (float): Lower bound of the feature (PatientBase "min").
+        upper_bound (float): Upper bound of the feature (PatientBase "max").
+
+    Returns:
+        np.ndarray: The new hourly values, or None if the values cannot be scaled (zero average).
+    """
+    return rescale_timeseries_block(
+        [data_type], [feature_name], np.asarray(values, dtype=float)[np.newaxis, :],
+        [absolute_value], [lower_bound], [upper_bound])[0]
+
+
+def rescale_timeseries_block(data_types, feature_names, values, absolute_values, lower_bounds, upper_bounds):
+    """
+    Vectorized rescale_timeseries_values for several rows at once, e.g. all timeseries features
+    of a patient or many target averages of one feature. The scales of all rows are solved in one call.
+
+    Args:
+        data_types (list): Data type per row ("vitals", "urineoutput", or "vasopressor").
+        feature_names (list): Feature name per row.
+        values (np.ndarray): Original hourly values with shape (m, n).
+        absolute_values (list): Desired new average per row.
+        lower_bounds (list): Lower bound per row.
+        upper_bounds (list): Upper bound per row.
+
+    Returns:
+        list: The new hourly values per row, or None for rows that cannot be scaled (zero average).
+    """
+    values = np.asarray(values, dtype=float)
+    absolute_values = np.asarray(absolute_values, dtype=float)
+    lower_bounds = np.asarray(lower_bounds, dtype=float)
+    upper_bounds = np.asarray(upper_bounds, dtype=float)
+    is_vasopressor = np.array(
+        [data_type == "vasopressor" for data_type in data_types], dtype=bool)
+
+    valid = ~np.isnan(values)
+    with np.errstate(invalid="ignore"):
+        old_means = np.where(valid.any(axis=1), np.nansum(
+            values, axis=1) / np.maximum(valid.sum(axis=1), 1), np.nan)
+    zero_mean = np.abs(old_means) < 1e-9
+
+    new_values = scale_to_target_mean(
+        values, absolute_values, lower_bounds, upper_bounds)
+    # If the series is constant or very close to zero mean for vasopressor, set every value to absolute_value.
+    new_values[is_vasopressor & zero_mean] = absolute_values[is_vasopressor &
+                                                             zero_mean, np.newaxis]
+
+    # Rounding like the raw data, grouped by the number of decimals.
+    decimals = np.where(is_vasopressor, 2, 0)
+    decimals[[data_type == "vitals" and feature_name == "tempc"
+              for data_type, feature_name in zip(data_types, feature_names)]] = 1
+    for n_decimals in np.unique(decimals):
+        rows = decimals == n_decimals
+        new_values[rows] = np.round(new_values[rows], n_decimals)
+
+    result = []
+    for row in range(values.shape[0]):
+        if not is_vasopressor[row] and not abs(old_means[row]) >= 1e-9:
+            result.append(None)
+        elif decimals[row] == 0 and not np.isnan(new_values[row]).any():
+            result.append(new_values[row].astype(int))
+        else:
+            result.append(new_values[row])
+    return result
@@ -0,0 +1,843 @@
+import os
+import re
+import math
+import json
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+from copy import deepcopy
+from .patient_data_model import Patient, rescale_timeseries_block
+
+N_HOURS = 24
+
+VITAL_FEATURES = ["heartrate", "sysbp", "diasbp",
+                  "meanbp", "resprate", "tempc", "spo2"]
+URINEOUTPUT_FEATURES = ["urineoutput"]
+VASOPRESSOR_FEATURES = ["dobutamine_dose", "dopamine_dose", "vasopressin_dose",
+                        "phenylephrine_dose", "epinephrine_dose", "norepinephrine_dose"]
+# Channel order of the timeseries tensor.
+TIMESERIES_FEATURES = VITAL_FEATURES + URINEOUTPUT_FEATURES + VASOPRESSOR_FEATURES
+
+# Channel of each feature in the timeseries tensor.
+TIMESERIES_CHANNELS = {feature: channel for channel,
+                       feature in enumerate(TIMESERIES_FEATURES)}
+# Timeseries features per data type of Patient.update_feature_with_scaling.
+DATA_TYPE_FEATURES = {"vitals": VITAL_FEATURES,
+                      "urineoutput": URINEOUTPUT_FEATURES, "vasopressor": VASOPRESSOR_FEATURES}
+
+# Statistic order of the laboratory tensor (matches the columns of Patient.laboratory).
+LAB_STATISTICS = ["count", "mean", "max", "min", "slope"]
+
+# Static column prefix of each Patient dict held in CompactPatient.static.
+STATIC_SECTION_PREFIXES = {"demographics": "", "scores": "", "clinical_data": "",
+                           "specimen": "specimen_group_", "diagnosis": "diagnosis_"}
+# Patient attributes and read methods that CompactPatient serves from its Patient view.
+PATIENT_VIEW_ATTRIBUTES = {"demographics", "scores", "diagnosis", "specimen", "clinical_data",
+                           "laboratory", "vitals", "vasopressor", "urineoutput",
+                           "get_vital_average", "get_urineoutput_average", "get_vasopressor_average",
+                           "get_feature_value", "get_feature_unit", "to_dict"}
+
+# Hourly columns such as "heartrate_0" or "aniongap_23".
+HOURLY_COLUMN_PATTERN = re.compile(r"^.+_\d+$")
+
+# Version of the on-disk cache layout; bump it when the blocks change.
+CACHE_FORMAT_VERSION = 1
+CACHE_MANIFEST = "manifest.json"
+
+
+class PatientStore:
+    """
+    Columnar store of all patients of a raw patient data file.
+    The CSV is parsed once into column-typed NumPy blocks:
+        - static blocks: one (N, S) array per dtype kind ("float", "int", "bool"),
+        - timeseries: a (N, 24, C) tensor in TIMESERIES_FEATURES order,
+        - laboratory: a (N, labs, 5) tensor in LAB_STATISTICS order.
+    Patients are built from the store by row index with O(1) slicing.
+    """
+
+    def __init__(self, static_blocks, static_index, timeseries, laboratory, lab_names):
+        self.static_blocks = static_blocks
+        self.static_index = static_index
+        self.timeseries = timeseries
+        self.laboratory = laboratory
+        self.lab_names = lab_names
+
+        # Static columns held by a patient (see STATIC_SECTION_PREFIXES), in a fixed order.
+        template = Patient()
+        columns = list(dict.fromkeys(
+            prefix + key for section, prefix in STATIC_SECTION_PREFIXES.items()
+            for key in getattr(template, section) if prefix + key in static_index))
+        self.compact_columns = {column: position for position,
+                                column in enumerate(columns)}
+        self.compact_kinds = tuple(static_index[column][0] for column in columns)
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame):
+        """
+        Builds the store from the raw patient data table.
+        Float values are rounded to 2 decimal places; ints and bools are left unchanged.
+        """
+        n_patients = len(df)
+
+        lab_names = [col[:-len("_count")]
+                     for col in df.columns if col.endswith("_count")]
+        lab_columns = {f"{lab}_{statistic}"
+                       for lab in lab_names for statistic in LAB_STATISTICS}
+
+        # Static columns, grouped into one block per dtype kind.
+        static_columns = {"float": [], "int": [], "bool": []}
+        for col in df.columns:
+            if col in lab_columns or HOURLY_COLUMN_PATTERN.match(col):
+                continue
+            kind = df[col].dtype.kind
+            if kind == "b":
+                static_columns["bool"].append(col)
+            elif kind in "iu":
+                static_columns["int"].append(col)
+            else:
+                static_columns["float"].append(col)
+
+        static_blocks = {}
+        static_index = {}
+        for kind, columns in static_columns.items():
+            block = df[columns].to_numpy()
+            if kind == "float":
+                block = np.round(block.astype(np.float64), 2)
+            elif kind == "int":
+                block = block.astype(np.int64)
+            else:
+                block = block.astype(np.bool_)
+            static_blocks[kind] = block
+            static_index.update({col: (kind, position)
+                                for position, col in enumerate(columns)})
+
+        # Timeseries tensor (N, 24, C); missing columns stay NaN.
+        timeseries = np.full(
+            (n_patients, N_HOURS, len(TIMESERIES_FEATURES)), np.nan)
+        for channel, feature in enumerate(TIMESERIES_FEATURES):
+            hourly_columns = [f"{feature}_{hour}" for hour in range(N_HOURS)]
+            available = [hour for hour, col in enumerate(
+                hourly_columns) if col in df.columns]
+            if available:
+                timeseries[:, available, channel] = df[[
+                    hourly_columns[hour] for hour in available]].to_numpy(dtype=np.float64)
+        timeseries = np.round(timeseries, 2)
+
+        # Laboratory tensor (N, labs, 5); missing statistics stay NaN.
+        laboratory = np.full(
+            (n_patients, len(lab_names), len(LAB_STATISTICS)), np.nan)
+        for position, statistic in enumerate(LAB_STATISTICS):
+            columns = [f"{lab}_{statistic}" for lab in lab_names]
+            available = [i for i, col in enumerate(
+                columns) if col in df.columns]
+            if available:
+                laboratory[:, available, position] = df[[
+                    columns[i] for i in available]].to_numpy(dtype=np.float64)
+        laboratory = np.round(laboratory, 2)
+
+        return cls(static_blocks, static_index, timeseries, laboratory, lab_names)
+
+    @classmethod
+    def from_csv(cls, file_path):
+        """Parses the raw patient data CSV once and builds the store."""
+        df = pd.read_csv(file_path, sep=",", header=0, encoding="utf-8")
+        return cls.from_dataframe(df)
+
+    @classmethod
+    def from_csv_cached(cls, file_path):
+        """
+        Loads the store from the binary cache next to the CSV, or builds and writes the cache first.
+        The cache is a directory of .npy blocks that are memory-mapped read-only on load, so
+        repeated cold starts skip CSV parsing and processes share the pages of the blocks.
+        It is keyed by the CSV's modification time and size, and by its SHA-256 hash when those changed.
+        """
+        cache_dir = get_cache_dir(file_path)
+        source_stat = os.stat(file_path)
+        manifest_path = os.path.join(cache_dir, CACHE_MANIFEST)
+
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("format_version") == CACHE_FORMAT_VERSION:
+                if (manifest["source_mtime_ns"] == source_stat.st_mtime_ns
+                        and manifest["source_size"] == source_stat.st_size):
+                    return cls.load(cache_dir)
+                if manifest["source_sha256"] == hash_file(file_path):
+                    # The file was touched but not changed: keep the blocks, refresh the key.
+                    manifest["source_mtime_ns"] = source_stat.st_mtime_ns
+                    manifest["source_size"] = source_stat.st_size
+                    write_manifest(cache_dir, manifest)
+                    return cls.load(cache_dir)
+
+        store = cls.from_csv(file_path)
+        try:
+            store.save(cache_dir, {
+                "source_mtime_ns": source_stat.st_mtime_ns,
+                "source_size": source_stat.st_size,
+                "source_sha256": hash_file(file_path),
+            })
+        except OSError as e:
+            # A read-only data directory only costs the cache, not the store itself.
+            print(f"Could not write patient store cache to {cache_dir}: {e}")
+        return store
+
+    def save(self, cache_dir, source_key):
+        """
+        Writes the blocks as .npy files into cache_dir.
+        Each block is written to a temporary file and renamed into place, so processes that have
+        the previous blocks memory-mapped keep reading the old files instead of truncated ones.
+        The manifest is renamed last, so an interrupted write never leaves a valid cache behind.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        manifest_path = os.path.join(cache_dir, CACHE_MANIFEST)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+        for kind, block in self.static_blocks.items():
+            write_block(cache_dir, f"static_{kind}.npy", block)
+        write_block(cache_dir, "timeseries.npy", self.timeseries)
+        write_block(cache_dir, "laboratory.npy", self.laboratory)
+
+        write_manifest(cache_dir, {
+            "format_version": CACHE_FORMAT_VERSION,
+            **source_key,
+            "static_kinds": list(self.static_blocks.keys()),
+            "static_index": {col: list(position) for col, position in self.static_index.items()},
+            "lab_names": self.lab_names,
+        })
+
+    @classmethod
+    def load(cls, cache_dir):
+        """Loads the store from cache_dir with all blocks memory-mapped read-only."""
+        with open(os.path.join(cache_dir, CACHE_MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        static_blocks = {
+            kind: np.load(os.path.join(cache_dir, f"static_{kind}.npy"), mmap_mode="r")
+            for kind in manifest["static_kinds"]
+        }
+        static_index = {col: (kind, position)
+                        for col, (kind, position) in manifest["static_index"].items()}
+        timeseries = np.load(os.path.join(
+            cache_dir, "timeseries.npy"), mmap_mode="r")
+        laboratory = np.load(os.path.join(
+            cache_dir, "laboratory.npy"), mmap_mode="r")
+        return cls(static_blocks, static_index, timeseries, laboratory, manifest["lab_names"])
+
+    def __len__(self):
+        return self.timeseries.shape[0]
+
+    def get_static_value(self, row_index, feature):
+        """Returns the static value of a patient as a NumPy scalar, or None if the column does not exist."""
+        if feature not in self.static_index:
+            return None
+        kind, position = self.static_index[feature]
+        return self.static_blocks[kind][row_index, position]
+
+    def build_patient(self, row_index) -> Patient:
+        """
+        Builds a Patient object from the store row.
+
+        Raises:
+            IndexError: If the row index is out of range.
+        """
+        self.check_row_index(row_index)
+
+        patient = Patient()
+        patient.patient_id = row_index
+        static_values = {column: self.get_static_value(row_index, column)
+                         for column in self.compact_columns}
+        fill_patient(patient, static_values, self.lab_names,
+                     self.laboratory[row_index].copy(), self.timeseries[row_index])
+        return patient
+
+    def build_compact_patient(self, row_index):
+        """
+        Builds a CompactPatient from the store row.
+
+        Raises:
+            IndexError: If the row index is out of range.
+        """
+        self.check_row_index(row_index)
+
+        static = np.empty(len(self.compact_columns), dtype=np.float64)
+        for column, position in self.compact_columns.items():
+            kind, block_position = self.static_index[column]
+            static[position] = self.static_blocks[kind][row_index, block_position]
+        return CompactPatient(
+            self.compact_columns, self.compact_kinds, static,
+            np.array(self.timeseries[row_index], dtype=np.float64),
+            tuple(self.lab_names), np.array(self.laboratory[row_index], dtype=np.float64),
+            patient_id=row_index)
+
+    def check_row_index(self, row_index):
+        """Raises an IndexError if the row index is out of range."""
+        if not -len(self) <= row_index < len(self):
+            raise IndexError(f"Patient index out of range: {row_index}")
+
+
+class CompactPatient:
+    """
+    Array-backed patient with the interface of Patient.
+    The data lives in contiguous float64 arrays:
+        - static: (S,) values of the demographics, scores, clinical data, specimen and diagnosis columns,
+        - timeseries: (24, C) hourly values in TIMESERIES_FEATURES order,
+        - lab_values: (labs, 5) laboratory values in LAB_STATISTICS order.
+    The dict and DataFrame attributes of Patient (demographics, vitals, laboratory, ...) and its
+    read methods are served by a Patient view that is built on first access and dropped by every
+    update, so copies and resets of the patient only copy the arrays.
+    The arrays hold the store values unchanged, so the view matches Patient exactly.
+    """
+
+    __slots__ = ("patient_id", "static_columns", "static_kinds", "static", "timeseries",
+                 "lab_names", "lab_values", "overrides", "ml_data", "data_version", "view")
+
+    def __init__(self, static_columns, static_kinds, static, timeseries, lab_names, lab_values, patient_id=None):
+        # Position and dtype kind of each static column; shared by all patients of a store.
+        self.static_columns = static_columns
+        self.static_kinds = static_kinds
+        self.static = static
+        self.timeseries = timeseries
+        self.lab_names = lab_names
+        self.lab_values = lab_values
+        # Values that the arrays cannot hold (missing columns, None or text), per Patient dict.
+        self.overrides = {}
+        self.ml_data = {"static": None, "timeseries": None, "y": None}
+        self.patient_id = patient_id
+        self.data_version = 0
+        self.view = None
+
+    def __getattr__(self, name):
+        # Only called for names that are not slots: serve the Patient attributes from the view.
+        if name in PATIENT_VIEW_ATTRIBUTES:
+            return getattr(self.get_view(), name)
+        raise AttributeError(
+            f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def __deepcopy__(self, memo):
+        patient = CompactPatient(
+            self.static_columns, self.static_kinds, self.static.copy(), self.timeseries.copy(),
+            self.lab_names, self.lab_values.copy(), patient_id=self.patient_id)
+        patient.overrides = deepcopy(self.overrides, memo)
+        patient.ml_data = deepcopy(self.ml_data, memo)
+        patient.data_version = self.data_version
+        return patient
+
+    def get_view(self) -> Patient:
+        """Returns the Patient view of the arrays, building it on first access."""
+        if self.view is None:
+            self.view = self.to_patient()
+        return self.view
+
+    def to_patient(self) -> Patient:
+        """Builds a Patient with the dicts and DataFrames of this patient."""
+        patient = Patient()
+        patient.patient_id = self.patient_id
+        static = self.static
+        static_values = {}
+        for column, position in self.static_columns.items():
+            kind = self.static_kinds[position]
+            value = static[position]
+            if kind == "bool" and not np.isnan(value):
+                static_values[column] = np.bool_(value)
+            elif kind == "int" and not np.isnan(value):
+                static_values[column] = np.int64(value)
+            else:
+                static_values[column] = value
+        fill_patient(patient, static_values, list(self.lab_names), self.lab_values.copy(),
+                     self.timeseries.copy(), self.overrides)
+        patient.ml_data = self.ml_data
+        return patient
+
+    def invalidate_feature_index(self):
+        """Drops the Patient view after a data change; it is rebuilt on the next access."""
+        self.view = None
+        self.data_version += 1
+
+    def update_static_values(self, section, data):
+        """
+        Writes the values of one Patient dict (e.g. "demographics") into the static array.
+        Values without a static column, None and text are kept as overrides.
+        """
+        prefix = STATIC_SECTION_PREFIXES[section]
+        section_overrides = self.overrides.setdefault(section, {})
+        for key, value in data.items():
+            position = self.static_columns.get(prefix + key)
+            if position is not None and isinstance(value, (bool, int, float, np.number, np.bool_)):
+                self.static[position] = value
+                section_overrides.pop(key, None)
+            else:
+                section_overrides[key] = value
+        self.invalidate_feature_index()
+
+    def update_demographics(self, data):
+        self.update_static_values("demographics", data)
+
+    def update_scores(self, data):
+        self.update_static_values("scores", data)
+
+    def update_diagnosis(self, data):
+        self.update_static_values("diagnosis", data)
+
+    def update_specimen(self, data):
+        self.update_static_values("specimen", data)
+
+    def update_clinical_data(self, data):
+        self.update_static_values("clinical_data", data)
+
+    def update_laboratory(self, labs):
+        """Writes a laboratory table (labs x LAB_STATISTICS) into the laboratory array."""
+        labs = pd.DataFrame(labs)
+        laboratory = labs.reindex(columns=LAB_STATISTICS).apply(
+            pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+        lab_names = tuple(labs.index)
+        if lab_names == self.lab_names and np.array_equal(laboratory, self.lab_values, equal_nan=True):
+            return
+        self.lab_names = lab_names
+        self.lab_values = laboratory
+        self.invalidate_feature_index()
+
+    def update_laboratory_df(self, df):
+        self.update_laboratory(df)
+
+    def update_timeseries(self, data):
+        """Writes hourly columns (feature name -> values) into the timeseries array."""
+        for feature, values in pd.DataFrame(data).items():
+            if feature in TIMESERIES_CHANNELS:
+                values = pd.to_numeric(values, errors="coerce").to_numpy(
+                    dtype=np.float64)[:N_HOURS]
+                self.timeseries[:len(values), TIMESERIES_CHANNELS[feature]] = values
+        self.invalidate_feature_index()
+
+    def update_vitals(self, data):
+        self.update_timeseries(data)
+
+    def update_vasopressor(self, data):
+        self.update_timeseries(data)
+
+    def update_urineoutput(self, data):
+        self.update_timeseries(data)
+
+    def update_vitals_average(self, new_average):
+        """
+        Update the average value of a vital sign feature.
+
+        Args:
+            new_average (dict): Dictionary containing the new average values for each vital sign.
+        """
+        for key, value in new_average.items():
+            if key in VITAL_FEATURES:
+                self.timeseries[:, TIMESERIES_CHANNELS[key]] = value
+        self.invalidate_feature_index()
+
+    def get_timeseries_average(self, feature_name):
+        """
+        Returns the average of a vitals, urine output or vasopressor feature as its slider shows it,
+        see Patient.get_vital_average(), get_urineoutput_average() and get_vasopressor_average().
+        """
+        if feature_name in VITAL_FEATURES:
+            return self.get_vital_average(feature_name)
+        if feature_name in URINEOUTPUT_FEATURES:
+            return self.get_urineoutput_average()
+        if feature_name in VASOPRESSOR_FEATURES:
+            return self.get_vasopressor_average(feature_name)
+        return None
+
+    def update_feature_with_scaling(self, data_type, feature_name, absolute_value, patient_base):
+        """Adjusts the average of one timeseries feature, see Patient.update_feature_with_scaling()."""
+        if feature_name in DATA_TYPE_FEATURES.get(data_type, []):
+            self.update_features_with_scaling({feature_name: absolute_value}, patient_base)
+
+    def update_features_with_scaling(self, absolute_values, patient_base):
+        """Adjusts the averages of several timeseries features, see Patient.update_features_with_scaling()."""
+        data_types, feature_names, targets = [], [], []
+        for feature_name, absolute_value in absolute_values.items():
+            for data_type, features in DATA_TYPE_FEATURES.items():
+                if feature_name in features:
+                    data_types.append(data_type)
+                    feature_names.append(feature_name)
+                    targets.append(absolute_value)
+                    break
+        if not feature_names:
+            return
+
+        # Use global bounds from the patient base via get_feature_statistics
+        statistics = [patient_base.get_feature_statistics(
+            feature_name) for feature_name in feature_names]
+        channels = [TIMESERIES_CHANNELS[feature_name]
+                    for feature_name in feature_names]
+        values = self.timeseries[:, channels].T
+
+        new_values = rescale_timeseries_block(
+            data_types, feature_names, values, targets,
+            [stats["min"] for stats in statistics], [stats["max"] for stats in statistics])
+        for channel, feature_values in zip(channels, new_values):
+            if feature_values is not None:
+                self.timeseries[:, channel] = feature_values
+        self.invalidate_feature_index()
+
+    def update_ml_data(self, data):
+        self.ml_data.update(data)
+
+    def get_ml_data(self):
+        return self.ml_data
+
+    def get_feature_values(self, feature_names):
+        """Provides the values of several features as one float array, see Patient.get_feature_values()."""
+        return self.get_view().get_feature_values(feature_names)
+
+    def get_raw_ml_arrays(self, static_feature_names, timeseries_feature_names):
+        """
+        Gathers the unscaled patient data in the model's feature order, see Patient.get_raw_ml_arrays().
+        The timeseries is read from the array without building the view.
+        """
+        static_raw = self.get_feature_values(static_feature_names)[np.newaxis, :]
+
+        timeseries_raw = np.full(
+            (1, N_HOURS, len(timeseries_feature_names)), np.nan)
+        channels = [(channel, TIMESERIES_CHANNELS[feature]) for channel, feature in enumerate(
+            timeseries_feature_names) if feature in TIMESERIES_CHANNELS]
+        if channels:
+            model_channels, store_channels = zip(*channels)
+            timeseries_raw[0][:, list(model_channels)] = self.timeseries[:, list(store_channels)]
+        return static_raw, timeseries_raw
+
+    convert_to_ml_data = Patient.convert_to_ml_data
+
+
+class CounterfactualPatient(CompactPatient):
+    """
+    Copy-on-write what-if copy of a CompactPatient.
+    References the arrays of the original patient until the first change to them and keeps the
+    changed features as a sparse delta:
+        - static: value per changed static column,
+        - timeseries: hourly values (24,) per changed timeseries feature,
+        - laboratory: value per changed "<lab>_<statistic>" feature (NaN for removed labs).
+    The original patient must not be changed while counterfactuals reference it.
+    """
+
+    __slots__ = ("base", "delta")
+
+    def __init__(self, base):
+        super().__init__(base.static_columns, base.static_kinds, base.static, base.timeseries,
+                         base.lab_names, base.lab_values, patient_id=base.patient_id)
+        self.base = base
+        self.overrides = deepcopy(base.overrides)
+        self.ml_data = dict(base.ml_data)
+        self.delta = {"static": {}, "timeseries": {}, "laboratory": {}}
+
+    def __deepcopy__(self, memo):
+        patient = CounterfactualPatient(self.base)
+        patient.apply(self.get_delta())
+        patient.ml_data = deepcopy(self.ml_data, memo)
+        patient.data_version = self.data_version
+        return patient
+
+    def update_static_values(self, section, data):
+        if self.static is self.base.static:
+            self.static = self.static.copy()
+        super().update_static_values(section, data)
+        prefix = STATIC_SECTION_PREFIXES[section]
+        self.track_static([prefix + key for key in data])
+
+    def update_laboratory(self, labs):
+        super().update_laboratory(labs)
+        self.track_laboratory()
+
+    def update_timeseries(self, data):
+        self.own_timeseries()
+        super().update_timeseries(data)
+        self.track_timeseries()
+
+    def update_vitals_average(self, new_average):
+        self.own_timeseries()
+        super().update_vitals_average(new_average)
+        self.track_timeseries()
+
+    def update_features_with_scaling(self, absolute_values, patient_base):
+        """
+        Adjusts the averages of several timeseries features, see Patient.update_features_with_scaling().
+        Targets equal to the current average are skipped, as rescaling a series to its own rounded
+        average still changes its hourly values; the original series of a feature is restored when
+        its target is the original average.
+        """
+        targets = {}
+        for feature_name, absolute_value in absolute_values.items():
+            current_average = self.get_timeseries_average(feature_name)
+            if current_average is not None and math.isclose(absolute_value, current_average, abs_tol=1e-9):
+                continue
+            if current_average is not None and math.isclose(
+                    absolute_value, self.base.get_timeseries_average(feature_name), abs_tol=1e-9):
+                self.own_timeseries()
+                channel = TIMESERIES_CHANNELS[feature_name]
+                self.timeseries[:, channel] = self.base.timeseries[:, channel]
+                self.invalidate_feature_index()
+                continue
+            targets[feature_name] = absolute_value
+        if targets:
+            self.own_timeseries()
+            super().update_features_with_scaling(targets, patient_base)
+        self.track_timeseries()
+
+    def own_timeseries(self):
+        """Copies the shared timeseries array before the first change to it."""
+        if self.timeseries is self.base.timeseries:
+            self.timeseries = self.timeseries.copy()
+
+    def track_static(self, columns):
+        """Updates the delta of the given static columns."""
+        for column in columns:
+            position = self.static_columns.get(column)
+            if position is None:
+                continue
+            base_value = self.base.static[position]
+            # The view shows some values rounded (see present_static_value()), so writing back an
+            # untouched value must not count as a change.
+            if values_equal(self.static[position], base_value) or \
+                    self.static[position] == present_static_value(column, base_value):
+                self.static[position] = base_value
+                self.delta["static"].pop(column, None)
+            else:
+                self.delta["static"][column] = float(self.static[position])
+
+    def track_timeseries(self):
+        """Rebuilds the delta of the timeseries features."""
+        changed = ~values_equal(self.timeseries, self.base.timeseries).all(axis=0)
+        self.delta["timeseries"] = {
+            TIMESERIES_FEATURES[channel]: self.timeseries[:, channel].copy()
+            for channel in np.flatnonzero(changed)
+        }
+
+    def track_laboratory(self):
+        """Rebuilds the delta of the laboratory values, matching labs by name."""
+        base_rows = {lab: row for row, lab in enumerate(self.base.lab_names)}
+        rows = {lab: row for row, lab in enumerate(self.lab_names)}
+        laboratory = {}
+        for lab in list(rows) + [lab for lab in base_rows if lab not in rows]:
+            values = self.lab_values[rows[lab]] if lab in rows else np.full(
+                len(LAB_STATISTICS), np.nan)
+            base_values = self.base.lab_values[base_rows[lab]] if lab in base_rows else np.full(
+                len(LAB_STATISTICS), np.nan)
+            for position in np.flatnonzero(~values_equal(values, base_values)):
+                laboratory[f"{lab}_{LAB_STATISTICS[position]}"] = float(values[position])
+        self.delta["laboratory"] = laboratory
+
+    def get_override_delta(self):
+        """Returns the overrides that differ from the original patient, per Patient dict."""
+        delta = {}
+        for section, section_overrides in self.overrides.items():
+            base_overrides = self.base.overrides.get(section, {})
+            changed = {key: value for key, value in section_overrides.items()
+                       if key not in base_overrides or base_overrides[key] != value}
+            if changed:
+                delta[section] = changed
+        return delta
+
+    def get_delta(self):
+        """
+        Returns a copy of the sparse delta to the original patient, e.g. to save the scenario.
+
+        Returns:
+            dict: "static", "timeseries" and "laboratory" changes and the changed "overrides".
+        """
+        return {
+            "static": dict(self.delta["static"]),
+            "timeseries": {feature: values.copy() for feature, values in self.delta["timeseries"].items()},
+            "laboratory": dict(self.delta["laboratory"]),
+            "overrides": deepcopy(self.get_override_delta()),
+        }
+
+    def diff(self):
+        """
+        Lists the changed features with their original and new values.
+        Timeseries features are listed with their hourly values.
+
+        Returns:
+            list: {"feature", "original_value", "value"} per changed feature.
+        """
+        changes = []
+        for column, value in self.delta["static"].items():
+            changes.append({"feature": column, "value": value, "original_value": float(
+                self.base.static[self.static_columns[column]])})
+        for feature, values in self.delta["timeseries"].items():
+            changes.append({"feature": feature, "value": values, "original_value": self.base.timeseries[
+                :, TIMESERIES_CHANNELS[feature]].copy()})
+        base_rows = {lab: row for row, lab in enumerate(self.base.lab_names)}
+        for feature, value in self.delta["laboratory"].items():
+            lab, statistic = feature.rsplit("_", 1)
+            original_value = np.nan
+            if lab in base_rows:
+                original_value = float(
+                    self.base.lab_values[base_rows[lab], LAB_STATISTICS.index(statistic)])
+            changes.append({"feature": feature, "value": value,
+                           "original_value": original_value})
+        for section, section_overrides in self.get_override_delta().items():
+            for key, value in section_overrides.items():
+                changes.append({"feature": STATIC_SECTION_PREFIXES[section] + key, "value": value,
+                                "original_value": getattr(self.base, section).get(key)})
+        return changes
+
+    def reset(self):
+        """Resets the counterfactual to the original patient."""
+        self.static = self.base.static
+        self.timeseries = self.base.timeseries
+        self.lab_names = self.base.lab_names
+        self.lab_values = self.base.lab_values
+        self.overrides = deepcopy(self.base.overrides)
+        self.delta = {"static": {}, "timeseries": {}, "laboratory": {}}
+        self.invalidate_feature_index()
+
+    def apply(self, delta):
+        """
+        Applies a delta of get_delta() on top of the current counterfactual.
+        Laboratory changes of labs the counterfactual does not have are ignored.
+        """
+        if delta.get("static"):
+            if self.static is self.base.static:
+                self.static = self.static.copy()
+            for column, value in delta["static"].items():
+                if column in self.static_columns:
+                    self.static[self.static_columns[column]] = value
+            self.track_static(delta["static"])
+
+        if delta.get("timeseries"):
+            self.own_timeseries()
+            for feature, values in delta["timeseries"].items():
+                if feature in TIMESERIES_CHANNELS:
+                    self.timeseries[:, TIMESERIES_CHANNELS[feature]] = values
+            self.track_timeseries()
+
+        if delta.get("laboratory"):
+            rows = {lab: row for row, lab in enumerate(self.lab_names)}
+            self.lab_values = self.lab_values.copy()
+            for feature, value in delta["laboratory"].items():
+                lab, statistic = feature.rsplit("_", 1)
+                if lab in rows and statistic in LAB_STATISTICS:
+                    self.lab_values[rows[lab], LAB_STATISTICS.index(
+                        statistic)] = value
+            self.track_laboratory()
+
+        for section, section_overrides in delta.get("overrides", {}).items():
+            self.overrides.setdefault(section, {}).update(
+                deepcopy(section_overrides))
+        self.invalidate_feature_index()
+
+
+def fill_patient(patient, static_values, lab_names, laboratory, timeseries, overrides=None):
+    """
+    Fills a Patient with the values of one store row.
+
+    Args:
+        patient (Patient): Empty patient to fill.
+        static_values (dict): Value per static column (NumPy scalars), only for columns that exist.
+        lab_names (list): Lab names of the laboratory rows.
+        laboratory (np.ndarray): Laboratory values (labs, 5) in LAB_STATISTICS order.
+        timeseries (np.ndarray): Hourly values (24, C) in TIMESERIES_FEATURES order.
+        overrides (dict, optional): Values per Patient dict that replace or extend the static values.
+    """
+    overrides = overrides or {}
+
+    demographics = {}
+    for key in patient.demographics:
+        if key not in static_values:
+            continue
+        value = static_values[key]
+        if key == "age":
+            demographics[key] = int(value) if pd.notna(value) else None
+        elif key == "weight":
+            demographics[key] = float(value) if pd.notna(value) else None
+        else:
+            demographics[key] = value
+    demographics.update(overrides.get("demographics", {}))
+    patient.update_demographics(demographics)
+
+    scores = {}
+    for key in patient.scores:
+        if key in static_values:
+            value = static_values[key]
+            scores[key] = float(value) if pd.notna(value) else None
+    scores.update(overrides.get("scores", {}))
+    patient.update_scores(scores)
+
+    patient.update_clinical_data({
+        **{key: static_values[key]
+           for key in patient.clinical_data if key in static_values},
+        **overrides.get("clinical_data", {})
+    })
+
+    patient.update_specimen({
+        **{key: int(static_values[f"specimen_group_{key}"])
+           for key in patient.specimen if f"specimen_group_{key}" in static_values},
+        **overrides.get("specimen", {})
+    })
+
+    patient.update_diagnosis({
+        **{key: int(static_values[f"diagnosis_{key}"])
+           for key in patient.diagnosis if f"diagnosis_{key}" in static_values},
+        **overrides.get("diagnosis", {})
+    })
+
+    if lab_names:
+        patient.update_laboratory(pd.DataFrame(
+            laboratory, index=lab_names, columns=LAB_STATISTICS))
+
+    n_vitals = len(VITAL_FEATURES)
+    n_urineoutput = len(URINEOUTPUT_FEATURES)
+    patient.update_vitals(pd.DataFrame(
+        timeseries[:, :n_vitals].copy(), columns=VITAL_FEATURES))
+    patient.update_urineoutput(pd.DataFrame(
+        timeseries[:, n_vitals:n_vitals + n_urineoutput].copy(), columns=URINEOUTPUT_FEATURES))
+    patient.update_vasopressor(pd.DataFrame(
+        timeseries[:, n_vitals + n_urineoutput:].copy(), columns=VASOPRESSOR_FEATURES))
+
+
+def present_static_value(column, value):
+    """Returns a static store value as the Patient view shows it, see fill_patient()."""
+    if column == "age" and pd.notna(value):
+        return int(value)
+    return value
+
+
+def values_equal(a, b):
+    """Elementwise equality that treats two missing values as equal."""
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+def get_cache_dir(file_path):
+    """Returns the directory of the binary cache next to the raw patient data file."""
+    stem, _ = os.path.splitext(file_path)
+    return f"{stem}.cache"
+
+
+def hash_file(file_path):
+    """Returns the SHA-256 hash of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_block(cache_dir, file_name, block):
+    """Writes a block as .npy to a temporary file in cache_dir and renames it to file_name."""
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, block)
+        os.replace(tmp_path, os.path.join(cache_dir, file_name))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def write_manifest(cache_dir, manifest):
+    """Writes the cache manifest atomically."""
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(cache_dir, CACHE_MANIFEST))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+
+# Number of parameters shown before the remaining ones are combined into "Others".
+RISK_TABLE_TOP_N = 9
+# Parameters whose rounded contribution does not exceed this value are left out of the table.
+RISK_TABLE_MIN_CONTRIBUTION = 0.02
+
+# Sentence templates per input type ("static" or "timeseries").
+RISK_TABLE_TEMPLATES = {
+    "static": {
+        "description": "The parameter '{title}' contributes {strength} to the risk.",
+        "position": "Compared to the patient training base of spesis-3 ICU patients, this value is {position}.",
+        "range": "Here, the patient's value is {range_info}.",
+        "outside": "The patient's value is outside the typical range of both survivors and non-survivors.",
+    },
+    "timeseries": {
+        "description": "Over the observed time period, the parameter '{title}' contributes {strength} to the risk.",
+        "position": "Compared to the patient base, this aggregated value is {position}.",
+        "range": "The patient's aggregated value is {range_info}.",
+        "outside": "The patient's aggregated value is outside the typical range of both survivors and non-survivors.",
+    },
+}
+
+
+def build_risk_table(features, input_types, raw_values, risk_contributions, feature_metadata, statistics,
+                     shorten_table=True):
+    """
+    Builds the risk table from one aligned set of columns: raw value, SHAP value,
+    reference range and patient base statistics per parameter.
+    The range classifications are computed as boolean masks over all parameters at once,
+    and the texts are filled from RISK_TABLE_TEMPLATES.
+
+    Args:
+        features (list): Parameter names.
+        input_types (list): "static" or "timeseries" per parameter.
+        raw_values (list): Raw (for timeseries: average) value per parameter, None if not available.
+        risk_contributions (np.ndarray): SHAP value per parameter in percentage points.
+        feature_metadata (dict): Unit and normal reference range per lowercase feature name.
+        statistics (pd.DataFrame): PatientBase.get_statistics_table() of the parameters.
+        shorten_table (bool): Whether to combine all but the top parameters into an "Others" row.
+
+    Returns:
+        pd.DataFrame: Columns "Parameter", "Raw Value", "Risk Contribution", "Description"
+            and "Comparison", sorted by absolute risk contribution.
+    """
+    is_static = np.array([input_type == "static" for input_type in input_types], dtype=bool)
+    available = np.array([raw_value is not None for raw_value in raw_values], dtype=bool)
+    raw = np.array([np.nan if raw_value is None else raw_value for raw_value in raw_values],
+                   dtype=np.float64)
+    risk_contributions = np.asarray(risk_contributions, dtype=np.float64)
+
+    metadata = [feature_metadata.get(feature.lower(), {}) for feature in features]
+    normal_lower, normal_upper = get_reference_bounds(metadata)
+
+    # Reference range: NaN raw values compare False and end up "in the normal reference range".
+    with np.errstate(invalid="ignore"):
+        has_reference = available & ~np.isnan(normal_lower)
+        reference_low = has_reference & (raw < normal_lower)
+        reference_high = has_reference & ~reference_low & (raw > normal_upper)
+
+        # Patient base statistics; missing statistics (NaN) never match.
+        has_statistics = statistics["error"].isna().to_numpy()
+        compared = available & has_statistics
+        minimum = statistics["min"].to_numpy()
+        maximum = statistics["max"].to_numpy()
+        position_low = compared & (raw < minimum + (maximum - minimum) * 0.1)
+        position_high = compared & ~position_low & (raw > maximum - (maximum - minimum) * 0.1)
+        in_survivor_range = ((statistics["survivors_lower"].to_numpy() <= raw)
+                             & (raw <= statistics["survivors_upper"].to_numpy()))
+        in_non_survivor_range = ((statistics["non_survivors_lower"].to_numpy() <= raw)
+                                 & (raw <= statistics["non_survivors_upper"].to_numpy()))
+
+    abs_contributions = np.abs(risk_contributions)
+    strength = np.select([abs_contributions > 5, abs_contributions > 3],
+                         ["much", "slightly"], default="not much")
+    position = np.select([position_low, position_high],
+                         ["comparatively low", "comparatively high"], default="")
+    range_info = np.select(
+        [in_survivor_range & in_non_survivor_range, in_survivor_range, in_non_survivor_range],
+        ["in the overlapping range of survivors and non-survivors",
+         "within the typical range of survivors",
+         "within the typical range of non-survivors"], default="")
+
+    descriptions = []
+    comparisons = []
+    formatted_values = []
+    for i, feature in enumerate(features):
+        templates = RISK_TABLE_TEMPLATES["static" if is_static[i] else "timeseries"]
+        descriptions.append(templates["description"].format(
+            title=feature.replace("_", " ").title(), strength=strength[i]))
+        formatted_values.append(format_value_with_unit(raw_values[i], metadata[i].get("unit", "")))
+
+        comparison_parts = []
+        if has_reference[i]:
+            reference = f"{normal_lower[i]}-{normal_upper[i]}"
+            if reference_low[i]:
+                comparison_parts.append(
+                    f"Compared to the reference range ({reference}), the patient's value is LOW.")
+            elif reference_high[i]:
+                comparison_parts.append(
+                    f"Compared to the reference range ({reference}), the patient's value is HIGH.")
+            else:
+                comparison_parts.append(
+                    f"The patient's value is in the normal reference range ({reference}).")
+
+        if not has_statistics[i]:
+            comparison_parts.append(
+                f"Statistics not available for this feature: {statistics['error'].iat[i]}")
+        elif not available[i]:
+            comparison_parts.append("The patient's value is not available.")
+        else:
+            if position[i]:
+                comparison_parts.append(templates["position"].format(position=position[i]))
+            if range_info[i]:
+                comparison_parts.append(templates["range"].format(range_info=range_info[i]))
+            else:
+                comparison_parts.append(templates["outside"])
+        comparisons.append(" ".join(comparison_parts))
+
+    df = pd.DataFrame({
+        "Parameter": features,
+        "Raw Value": formatted_values,
+        "Risk Contribution": risk_contributions,
+        "Description": descriptions,
+        "Comparison": comparisons,
+    })
+    df["Absolute Risk Contribution"] = df["Risk Contribution"].abs()
+    df = df.sort_values(by="Absolute Risk Contribution", ascending=False).drop(
+        columns=["Absolute Risk Contribution"])
+    df.reset_index(drop=True, inplace=True)
+    df["Risk Contribution"] = df["Risk Contribution"].apply(
+        lambda x: f"{x:.2f}")
+    df = df[df["Risk Contribution"].apply(lambda x: abs(float(x)) > RISK_TABLE_MIN_CONTRIBUTION)]
+
+    if len(df) > RISK_TABLE_TOP_N and shorten_table:
+        top_df = df.iloc[:RISK_TABLE_TOP_N].copy()
+        others_sum = df.iloc[RISK_TABLE_TOP_N:]["Risk Contribution"].astype(float).sum()
+        others_row = {
+            "Parameter": "Others",
+            "Raw Value": "",
+            "Risk Contribution": f"{others_sum:.2f}",
+            "Description": "<div style='font-size: 0.7em; color: #AAAAAA;'>Combined contribution of other less influential parameters.</div>",
+            "Comparison": ""
+        }
+        others_df = pd.DataFrame([others_row])
+        df = pd.concat([top_df, others_df], ignore_index=True)
+
+    return df
+
+
+def get_reference_bounds(metadata):
+    """
+    Returns the normal reference range (lower, upper) per feature as float arrays.
+    Both bounds are NaN if either one is missing or not numeric.
+    """
+    normal_lower = np.full(len(metadata), np.nan)
+    normal_upper = np.full(len(metadata), np.nan)
+    for i, meta in enumerate(metadata):
+        lower = meta.get("normal_lower", None)
+        upper = meta.get("normal_upper", None)
+        if lower in [None, ""] or upper in [None, ""] or pd.isna(lower) or pd.isna(upper):
+            continue
+        try:
+            normal_lower[i], normal_upper[i] = float(lower), float(upper)
+        except (TypeError, ValueError):
+            continue
+    return normal_lower, normal_upper
+
+
+def format_value_with_unit(raw_value, unit):
+    """Formats a raw feature value with two decimals and appends its unit (if available)."""
+    if pd.isna(raw_value):
+        return ""
+
+    if unit == "" or unit is None or pd.isna(unit) or str(unit).lower() == "nan":
+        unit = None
+
+    if isinstance(raw_value, (int, float)):
+        formatted = f"{raw_value:.2f}"
+    else:
+        formatted = str(raw_value)
+
+    return f"{formatted} {unit}" if unit else formatted
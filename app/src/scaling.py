@@ -0,0 +1,188 @@
+import numpy as np
+
+
+def extract_affine_parameters(scaler):
+    """
+    Extracts the affine transformation of a fitted sklearn scaler as float32 arrays.
+    The scaler's transform is equivalent to `X * multiplier + offset` per column.
+    Supports MinMaxScaler (scale_, min_) and StandardScaler (mean_, scale_).
+
+    Args:
+        scaler: A fitted MinMaxScaler or StandardScaler.
+
+    Returns:
+        tuple: (multiplier, offset) as float32 arrays in the scaler's feature order.
+
+    Raises:
+        ValueError: If the scaler type is not supported.
+    """
+    if hasattr(scaler, "min_") and hasattr(scaler, "data_range_"):
+        multiplier = np.asarray(scaler.scale_, dtype=np.float64)
+        offset = np.asarray(scaler.min_, dtype=np.float64)
+    elif hasattr(scaler, "mean_") or hasattr(scaler, "var_"):
+        n_features = scaler.n_features_in_
+        # mean_ is also fitted with with_mean=False, but not subtracted by the scaler.
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(
+            n_features)
+        mean = scaler.mean_ if scaler.with_mean and scaler.mean_ is not None else np.zeros(
+            n_features)
+        multiplier = 1 / np.asarray(scale, dtype=np.float64)
+        offset = -np.asarray(mean, dtype=np.float64) * multiplier
+    else:
+        raise ValueError(
+            f"Scaler type '{type(scaler).__name__}' is not supported. Use MinMaxScaler or StandardScaler.")
+    return multiplier.astype(np.float32), offset.astype(np.float32)
+
+
+def apply_affine(values, multiplier, offset, clip_bounds=None):
+    """
+    Applies `values * multiplier + offset` in float32 and fills missing values with -1.
+    The parameters broadcast over any number of leading batch dimensions.
+
+    Args:
+        values (np.ndarray): Raw values whose trailing dimensions match the parameters.
+        multiplier (np.ndarray): Multiplier per column.
+        offset (np.ndarray): Offset per column.
+        clip_bounds (tuple, optional): (lower, upper) bounds per column, applied before the fill.
+
+    Returns:
+        np.ndarray: Scaled values as a new float32 array.
+    """
+    scaled = np.multiply(values, multiplier, dtype=np.float32)
+    scaled += offset
+    if clip_bounds is not None:
+        np.clip(scaled, clip_bounds[0], clip_bounds[1], out=scaled)
+    np.nan_to_num(scaled, copy=False, nan=-1)
+    return scaled
+
+
+class AffineScalingKernel:
+    """
+    Fused scaling of raw model inputs, laid out in the model's input order.
+    Holds one multiplier and offset per static feature (F,) and per timeseries cell (24, C).
+    Features the scalers do not cover (e.g. binary static features) get multiplier 1 and offset 0.
+    The pickled scalers stay the source of truth; the kernel is derived from them.
+    """
+
+    def __init__(self, static_multiplier, static_offset, timeseries_multiplier, timeseries_offset,
+                 static_positions, timeseries_positions, clip_range=None):
+        self.static_multiplier = static_multiplier
+        self.static_offset = static_offset
+        self.timeseries_multiplier = timeseries_multiplier
+        self.timeseries_offset = timeseries_offset
+        # Position of each scaler column in the static vector / flattened timeseries tensor.
+        self.static_positions = static_positions
+        self.timeseries_positions = timeseries_positions
+        # (lower, upper) bounds per static and timeseries cell for scalers fitted with clip=True.
+        self.clip_range = clip_range
+
+    @classmethod
+    def from_scalers(cls, static_scaler, timeseries_scaler, static_feature_names, timeseries_feature_names, n_hours=24):
+        """
+        Builds the kernel from the fitted scalers and the model's feature order.
+        Timeseries scaler columns are named "<feature>_<hour>".
+        """
+        static_lookup = {feature: position for position,
+                         feature in enumerate(static_feature_names)}
+        static_positions = np.array([static_lookup[feature]
+                                     for feature in static_scaler.feature_names_in_])
+
+        n_channels = len(timeseries_feature_names)
+        channel_lookup = {feature: channel for channel,
+                          feature in enumerate(timeseries_feature_names)}
+        timeseries_positions = []
+        for column in timeseries_scaler.feature_names_in_:
+            feature, hour = column.rsplit("_", 1)
+            timeseries_positions.append(
+                int(hour) * n_channels + channel_lookup[feature])
+        timeseries_positions = np.array(timeseries_positions)
+
+        static_multiplier = np.ones(
+            len(static_feature_names), dtype=np.float32)
+        static_offset = np.zeros(len(static_feature_names), dtype=np.float32)
+        static_multiplier[static_positions], static_offset[static_positions] = extract_affine_parameters(
+            static_scaler)
+
+        timeseries_multiplier = np.ones(
+            n_hours * n_channels, dtype=np.float32)
+        timeseries_offset = np.zeros(n_hours * n_channels, dtype=np.float32)
+        timeseries_multiplier[timeseries_positions], timeseries_offset[timeseries_positions] = extract_affine_parameters(
+            timeseries_scaler)
+
+        clip_range = None
+        if getattr(static_scaler, "clip", False) or getattr(timeseries_scaler, "clip", False):
+            clip_range = cls._build_clip_range(
+                static_scaler, static_positions, len(static_feature_names),
+                timeseries_scaler, timeseries_positions, n_hours * n_channels)
+
+        return cls(
+            static_multiplier, static_offset,
+            timeseries_multiplier.reshape(n_hours, n_channels),
+            timeseries_offset.reshape(n_hours, n_channels),
+            static_positions, timeseries_positions, clip_range)
+
+    @staticmethod
+    def _build_clip_range(static_scaler, static_positions, n_static, timeseries_scaler, timeseries_positions, n_timeseries):
+        """Returns the (lower, upper) clip bounds for scalers fitted with clip=True."""
+        bounds = []
+        for scaler, positions, size in ((static_scaler, static_positions, n_static),
+                                        (timeseries_scaler, timeseries_positions, n_timeseries)):
+            lower = np.full(size, -np.inf, dtype=np.float32)
+            upper = np.full(size, np.inf, dtype=np.float32)
+            if getattr(scaler, "clip", False):
+                lower[positions], upper[positions] = scaler.feature_range
+            bounds.append((lower, upper))
+        return bounds
+
+    def transform(self, static_raw, timeseries_raw):
+        """
+        Scales raw inputs in one vectorized pass and fills missing values with -1.
+
+        Args:
+            static_raw (np.ndarray): Raw static data with shape (N, F).
+            timeseries_raw (np.ndarray): Raw timeseries data with shape (N, 24, C).
+
+        Returns:
+            tuple: Scaled static (N, F) and timeseries (N, 24, C) data as float32 arrays.
+        """
+        static_bounds, timeseries_bounds = self.clip_range or (None, None)
+        static = apply_affine(static_raw, self.static_multiplier,
+                              self.static_offset, static_bounds)
+        timeseries = apply_affine(timeseries_raw, self.timeseries_multiplier, self.timeseries_offset,
+                                  timeseries_bounds and tuple(bound.reshape(self.timeseries_multiplier.shape)
+                                                              for bound in timeseries_bounds))
+        return static, timeseries
+
+    def transform_static_columns(self, values, positions):
+        """
+        Scales raw values of single static features.
+
+        Args:
+            values (np.ndarray): Raw values with shape (..., k).
+            positions (np.ndarray): Positions of the k features in the static vector.
+
+        Returns:
+            np.ndarray: Scaled values as float32 with the shape of values.
+        """
+        bounds = None
+        if self.clip_range is not None:
+            bounds = tuple(bound[positions] for bound in self.clip_range[0])
+        return apply_affine(values, self.static_multiplier[positions], self.static_offset[positions], bounds)
+
+    def transform_timeseries_channels(self, values, channels):
+        """
+        Scales raw hourly values of single timeseries features.
+
+        Args:
+            values (np.ndarray): Raw values with shape (..., 24, k).
+            channels (np.ndarray): Channels of the k features in the timeseries tensor.
+
+        Returns:
+            np.ndarray: Scaled values as float32 with the shape of values.
+        """
+        bounds = None
+        if self.clip_range is not None:
+            bounds = tuple(bound.reshape(self.timeseries_multiplier.shape)[:, channels]
+                           for bound in self.clip_range[1])
+        return apply_affine(values, self.timeseries_multiplier[:, channels],
+                            self.timeseries_offset[:, channels], bounds)
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+
+class Scenario:
+    """
+    One saved what-if scenario of a patient.
+    Holds the sparse delta of the CounterfactualPatient, the scaled model inputs and,
+    once scored or explained, the risk and the SHAP values of the inputs.
+    """
+
+    def __init__(self, name, delta, static, timeseries):
+        self.name = name
+        self.delta = delta
+        # Scaled model inputs: static (1, F) and timeseries (1, 24, C).
+        self.static = static
+        self.timeseries = timeseries
+        self.risk = None
+        # {"static": (F,), "timeseries_means": feature -> value} in percentage points.
+        self.shap_values = None
+        # Whether the risk is missing or outdated.
+        self.dirty = True
+
+    def set_inputs(self, delta, static, timeseries):
+        """Replaces the scenario's inputs; the risk and SHAP values are dropped only if the inputs changed."""
+        self.delta = delta
+        if np.array_equal(static, self.static) and np.array_equal(timeseries, self.timeseries):
+            return
+        self.static = static
+        self.timeseries = timeseries
+        self.risk = None
+        self.shap_values = None
+        self.dirty = True
+
+
+class ScenarioStore:
+    """
+    Named what-if scenarios of one patient.
+    Scenarios are saved unscored and marked dirty; score_dirty() scores all dirty scenarios in
+    one batched forward pass, so unchanged scenarios are never rescored.
+    SHAP values are computed on request in one batch and cached per scenario until its inputs change.
+    """
+
+    def __init__(self, predictor, patient_id, timeseries_feature_names):
+        self.predictor = predictor
+        self.patient_id = patient_id
+        self.timeseries_feature_names = list(timeseries_feature_names)
+        self.scenarios = {}
+
+    def save(self, name, delta, ml_data):
+        """
+        Saves a scenario under a name, replacing the inputs of an existing scenario with that name.
+
+        Args:
+            name (str): Scenario name.
+            delta (dict): Sparse delta of CounterfactualPatient.get_delta().
+            ml_data (dict): Scaled model inputs ("static" (1, F) and "timeseries" (1, 24, C)).
+
+        Returns:
+            Scenario: The saved scenario.
+        """
+        static = np.array(ml_data["static"], dtype=np.float32)
+        timeseries = np.array(ml_data["timeseries"], dtype=np.float32)
+        if name in self.scenarios:
+            self.scenarios[name].set_inputs(delta, static, timeseries)
+        else:
+            self.scenarios[name] = Scenario(name, delta, static, timeseries)
+        return self.scenarios[name]
+
+    def delete(self, name):
+        """Removes a scenario."""
+        self.scenarios.pop(name, None)
+
+    def get_dirty(self) -> list:
+        """Returns the scenarios whose risk is missing or outdated."""
+        return [scenario for scenario in self.scenarios.values() if scenario.dirty]
+
+    def score_dirty(self) -> int:
+        """
+        Scores all dirty scenarios in one batched forward pass.
+
+        Returns:
+            int: Number of scored scenarios.
+        """
+        dirty = self.get_dirty()
+        if not dirty:
+            return 0
+        risks = self.predictor.predict_batch(
+            np.concatenate([scenario.static for scenario in dirty]),
+            np.concatenate([scenario.timeseries for scenario in dirty]))
+        for scenario, risk in zip(dirty, risks):
+            scenario.risk = float(risk)
+            scenario.dirty = False
+        return len(dirty)
+
+    def explain(self, names=None) -> int:
+        """
+        Computes the SHAP values of the given scenarios (default: all) that have none cached yet,
+        in one batched explainer call.
+
+        Returns:
+            int: Number of explained scenarios.
+        """
+        names = list(self.scenarios) if names is None else names
+        missing = [self.scenarios[name] for name in names
+                   if name in self.scenarios and self.scenarios[name].shap_values is None]
+        if not missing:
+            return 0
+        shap_static, shap_timeseries = self.predictor.compute_shap_values_batch(
+            np.concatenate([scenario.static for scenario in missing]),
+            np.concatenate([scenario.timeseries for scenario in missing]))
+        for scenario, static_values, timeseries_values in zip(missing, shap_static, shap_timeseries):
+            scenario.shap_values = {
+                "static": static_values,
+                "timeseries_means": self.predictor.sum_timeseries_shap(
+                    timeseries_values, self.timeseries_feature_names),
+            }
+        return len(missing)
+
+    def get_summary(self) -> pd.DataFrame:
+        """Returns one row per scenario with its risk and the number of changed features."""
+        return pd.DataFrame([{
+            "Scenario": scenario.name,
+            "Risk (%)": None if scenario.risk is None else round(scenario.risk * 100),
+            "Changes": len(scenario.delta["static"]) + len(scenario.delta["timeseries"])
+            + len(scenario.delta["laboratory"])
+            + sum(len(overrides) for overrides in scenario.delta["overrides"].values()),
+        } for scenario in self.scenarios.values()], columns=["Scenario", "Risk (%)", "Changes"])
+
+    def get_shap_comparison(self, static_feature_names, top_n=10) -> pd.DataFrame:
+        """
+        Returns the SHAP values of the explained scenarios side by side.
+        Rows are the top_n features by largest absolute contribution in any scenario.
+
+        Returns:
+            pd.DataFrame: Features as rows and scenario names as columns (percentage points).
+        """
+        columns = {}
+        for scenario in self.scenarios.values():
+            if scenario.shap_values is None:
+                continue
+            columns[scenario.name] = pd.concat([
+                pd.Series(scenario.shap_values["static"],
+                          index=static_feature_names[:len(scenario.shap_values["static"])]),
+                pd.Series(scenario.shap_values["timeseries_means"], dtype=float),
+            ])
+        if not columns:
+            return pd.DataFrame()
+
+        comparison = pd.DataFrame(columns)
+        order = comparison.abs().max(axis=1).sort_values(
+            ascending=False).index[:top_n]
+        return comparison.loc[order].round(2)
@@ -1,25 +1,73 @@
-import tensorflow as tf
 import streamlit as st
 import numpy as np
-import pandas as pd
 import os
-import shap
 import random
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from data.feature_category_mapping import FEATURE_CATEGORY_MAPPING, TIMESERIES_FEATURE_MAPPING
+from .scaling import AffineScalingKernel
+from .risk_table import build_risk_table
+from .job_executor import configure_tensorflow_threads, get_job_executor, get_session_id
+from .lazy_import import LazyModule
+from .numpy_inference import NumpyInferenceModel
 import pickle
 
+# TensorFlow and SHAP are imported when the model is first loaded, not when the app starts.
+tf = LazyModule("tensorflow", on_load=configure_tensorflow_threads)
+shap = LazyModule("shap")
+
+
+class CompiledModelCall:
+    """
+    Stands in for the Keras model where it is called after loading, e.g. by the SHAP explainer.
+    Streamlit calls keras.backend.clear_session() at the end of every script run, which replaces
+    Keras' per-thread state; a Keras model call that is running on another thread at that moment
+    (a job, or another session's script run) fails with an IndexError from Keras' name scope stack.
+    The compiled forward pass runs its traced graph without that state.
+    """
+
+    def __init__(self, inference_function):
+        self.inference_function = inference_function
+
+    def __call__(self, inputs, training=False):
+        static_data, timeseries_data = inputs
+        return self.inference_function(static_data, timeseries_data)
+
 
 class SepsisMortalityRiskPredictor:
-    @st.cache_resource
+    # Backend of the risk predictions: "keras" (compiled TensorFlow forward pass) or "numpy"
+    # (NumpyInferenceModel, which does not import TensorFlow). SHAP values always use TensorFlow.
+    INFERENCE_BACKEND = os.environ.get("SEPSIS_INFERENCE_BACKEND", "keras")
+
+    # Number of patients scored per forward pass in predict_batch.
+    PREDICTION_BATCH_SIZE = 1024
+
+    # Number of background samples drawn per explained input by the SHAP GradientExplainer.
+    SHAP_NSAMPLES = 200
+    # Number of samples the SHAP GradientExplainer evaluates per gradient call.
+    SHAP_BATCH_SIZE = 50
+
+    # The loaders also run on the model loading thread (see start_loading_prediction_model) and in
+    # job executor jobs, which have no script run context to show a spinner in, so they are cached without one.
+    @st.cache_resource(show_spinner=False)
     def load_prediction_model(_self):
         """Loads a Keras neural network model from a .keras file."""
+        model = tf.keras.models.load_model(_self.get_model_path())
+        return model
+
+    @st.cache_resource(show_spinner=False)
+    def load_numpy_inference_model(_self):
+        """Loads the prediction model into the NumPy inference engine, without TensorFlow."""
+        return NumpyInferenceModel.from_keras_archive(_self.get_model_path())
+
+    @staticmethod
+    def get_model_path():
+        """Returns the path of the .keras model file."""
         current_dir = os.path.dirname(os.path.realpath(__file__))
-        model_path = os.path.normpath(os.path.join(
+        return os.path.normpath(os.path.join(
             current_dir, "../models", "sepsis_mortality_model.keras"))
-        model = tf.keras.models.load_model(model_path)
-        return model
 
-    @st.cache_resource
+    @st.cache_resource(show_spinner=False)
     def load_scalers(_self):
         """Loads the scaler objects for static and timeseries data."""
         current_dir = os.path.dirname(os.path.realpath(__file__))
@@ -34,10 +82,129 @@ class SepsisMortalityRiskPredictor:
 
         return static_scaler, timeseries_scaler
 
+    @st.cache_resource(show_spinner=False)
+    def load_inference_function(_self):
+        """
+        Builds a compiled forward pass of the prediction model and warms it up.
+        The tf.function has a fixed input signature of (None, F) and (None, 24, C), so the graph
+        is traced once for any batch size. The warm-up call pays the tracing cost at startup
+        instead of on the first clinician interaction.
+        """
+        model = _self.load_prediction_model()
+        static_shape, timeseries_shape = (tuple(model_input.shape)
+                                          for model_input in model.inputs)
+
+        @tf.function(input_signature=[
+            tf.TensorSpec(shape=(None,) + static_shape[1:], dtype=tf.float32),
+            tf.TensorSpec(shape=(None,) + timeseries_shape[1:], dtype=tf.float32),
+        ])
+        def inference_function(static_data, timeseries_data):
+            return model([static_data, timeseries_data], training=False)
+
+        # Warm-up call to trace the graph once.
+        inference_function(
+            tf.zeros((1,) + static_shape[1:], dtype=tf.float32),
+            tf.zeros((1,) + timeseries_shape[1:], dtype=tf.float32))
+        return inference_function
+
+    @st.cache_resource(show_spinner=False)
+    def load_gradient_function(_self):
+        """
+        Builds a compiled function returning the gradient of the predicted risk with respect to
+        both model inputs, with the same input signature as load_inference_function().
+        The gradient is taken through the compiled forward pass, see CompiledModelCall.
+        """
+        model = _self.load_prediction_model()
+        inference_function = _self.load_inference_function()
+        static_shape, timeseries_shape = (tuple(model_input.shape)
+                                          for model_input in model.inputs)
+
+        @tf.function(input_signature=[
+            tf.TensorSpec(shape=(None,) + static_shape[1:], dtype=tf.float32),
+            tf.TensorSpec(shape=(None,) + timeseries_shape[1:], dtype=tf.float32),
+        ])
+        def gradient_function(static_data, timeseries_data):
+            with tf.GradientTape() as tape:
+                tape.watch([static_data, timeseries_data])
+                risk = inference_function(static_data, timeseries_data)
+            return tape.gradient(risk, [static_data, timeseries_data])
+
+        return gradient_function
+
+    @st.cache_resource(show_spinner=False)
+    def load_shap_explainer(_self, background_hash, _background_static, _background_timeseries):
+        """
+        Builds the SHAP GradientExplainer once per model and background data set.
+        The explainer is cached across patients and sessions; background_hash identifies
+        the background data, which is excluded from Streamlit's argument hashing.
+        """
+        model = _self.load_prediction_model()
+        explainer = shap.GradientExplainer(
+            model, [_background_static, _background_timeseries],
+            batch_size=_self.SHAP_BATCH_SIZE)
+        # The explainer reads the inputs and output from the Keras model, but calls the compiled
+        # forward pass, as SHAP jobs run while other script runs clear the Keras session.
+        explainer.explainer.model = CompiledModelCall(_self.load_inference_function())
+        return explainer
+
+    @st.cache_resource(show_spinner=False)
+    def load_scaling_kernel(_self, static_feature_names, timeseries_feature_names):
+        """Builds the fused scaling kernel from the fitted scalers for the given model feature order."""
+        return AffineScalingKernel.from_scalers(
+            _self.static_scaler, _self.timeseries_scaler,
+            static_feature_names, timeseries_feature_names)
+
     def __init__(self):
-        # Load the pre-trained keras tensorflow model and scaler objects using the method via self.
-        self.model = self.load_prediction_model()
+        # Load the scaler objects and the forward pass of the selected backend using the method via self.
         self.static_scaler, self.timeseries_scaler = self.load_scalers()
+        if self.INFERENCE_BACKEND == "numpy":
+            self.inference_function = self.load_numpy_inference_model()
+        else:
+            self.inference_function = self.load_inference_function()
+
+    @property
+    def model(self):
+        """The pre-trained Keras model, loaded on first use (always needed for SHAP values)."""
+        return self.load_prediction_model()
+
+    @property
+    def gradient_function(self):
+        """The compiled gradient of the predicted risk, built on first use."""
+        return self.load_gradient_function()
+
+    def predict_batch(self, static_data, timeseries_data, batch_size=None) -> np.ndarray:
+        """
+        Predicts the sepsis mortality risk for a whole cohort of patients.
+        The cohort is scored in chunks by calling the compiled forward pass directly,
+        which avoids the per-call setup of model.predict (dataset wrapping, callbacks, progress bar).
+        Args:
+            static_data (np.ndarray): Scaled static data with shape (N, F).
+            timeseries_data (np.ndarray): Scaled timeseries data with shape (N, 24, C).
+            batch_size (int, optional): Number of patients per forward pass.
+                Defaults to PREDICTION_BATCH_SIZE.
+        Returns:
+            np.ndarray: Mortality risk per patient with shape (N,).
+        """
+        static_data = np.asarray(static_data, dtype=np.float32)
+        timeseries_data = np.asarray(timeseries_data, dtype=np.float32)
+        if static_data.ndim == 1:
+            static_data = static_data[np.newaxis, :]
+        if timeseries_data.ndim == 2:
+            timeseries_data = timeseries_data[np.newaxis, :, :]
+        if static_data.shape[0] != timeseries_data.shape[0]:
+            raise ValueError(
+                f"Static and timeseries data must contain the same number of patients, "
+                f"got {static_data.shape[0]} and {timeseries_data.shape[0]}.")
+
+        n_patients = static_data.shape[0]
+        batch_size = batch_size or self.PREDICTION_BATCH_SIZE
+        risks = np.empty(n_patients, dtype=np.float32)
+        for start in range(0, n_patients, batch_size):
+            end = min(start + batch_size, n_patients)
+            predictions = self.inference_function(
+                static_data[start:end], timeseries_data[start:end])
+            risks[start:end] = np.asarray(predictions).reshape(-1)
+        return risks
 
     def predict_sepsis_mortality_risk(self, counterfactual_patient=False) -> np.ndarray:
         # Extract timeseries and static components from the raw patient data
@@ -52,57 +219,189 @@ class SepsisMortalityRiskPredictor:
         timeseries_data = patient_ml_data.get('timeseries')
         static_data = patient_ml_data.get('static')
 
-        # Predict sepsis mortality risk using the two input streams
-        predictions = self.model.predict([static_data, timeseries_data])
-        return predictions
+        # Predict sepsis mortality risk using the two input streams.
+        # Keep the (N, 1) shape of model.predict for the callers.
+        predictions = self.predict_batch(static_data, timeseries_data)
+        return predictions.reshape(-1, 1)
+
+    @staticmethod
+    def hash_background_data(background_static, background_timeseries) -> str:
+        """Returns a content hash of the SHAP background data, used as the explainer cache key."""
+        digest = hashlib.sha1()
+        for array in (background_static, background_timeseries):
+            array = np.ascontiguousarray(array)
+            digest.update(str(array.shape).encode())
+            digest.update(array.tobytes())
+        return digest.hexdigest()
+
+    def get_shap_explainer(self, background_static, background_timeseries):
+        """Returns the cached SHAP explainer for the given background data."""
+        background_hash = self.hash_background_data(
+            background_static, background_timeseries)
+        return self.load_shap_explainer(
+            background_hash, background_static, background_timeseries)
+
+    def get_session_shap_explainer(self):
+        """Returns the cached SHAP explainer for the session's background data."""
+        # For background data, here we reuse the same sample.
+        # For improved explanations, consider using a larger background dataset.
+        return self.get_shap_explainer(
+            st.session_state.background_static, st.session_state.background_timeseries)
 
-    def generate_local_shap_values(self):
+    def submit_local_shap_values(self):
+        """
+        Starts computing the SHAP values of the current patient on the job executor.
+        collect_local_shap_values() stores the result once the job has finished.
+        """
+        patient = st.session_state.patient
+        patient_ml_data = patient.get_ml_data()
+        st.session_state.shap_job_key = self.submit_shap_values_job(
+            patient.patient_id, patient_ml_data.get('static'), patient_ml_data.get('timeseries'))
+        st.session_state.shap_values = None
+        st.session_state.shap_group_contributions = None
+
+    def submit_shap_values_job(self, patient_id, static_data, timeseries_data):
         """
-        Generate local SHAP values for the current patient's data using the loaded Keras model.
-        The SHAP values are computed using the GradientExplainer, which is suitable for deep learning models.
-        The SHAP values are stored in the session state for later use.
-        Note: The SHAP values are multiplied by 100 to present them as percentages.
+        Submits the SHAP computation of a patient's scaled model inputs to the job executor.
+        The job is keyed by session and patient, so a job submitted earlier for the same patient
+        (e.g. by the prefetch of the next study patient) is reused.
+        The explainer is resolved here, on the script thread, because the job has no access to
+        the session state.
         Returns:
-            None: The SHAP values are stored in the session state.
+            tuple: Key of the job.
         """
+        job_key = (get_session_id(), patient_id, "local_shap_values")
+        get_job_executor().submit(
+            job_key, self.compute_shap_values,
+            np.array(static_data), np.array(timeseries_data),
+            self.get_session_shap_explainer())
+        return job_key
+
+    def submit_risk_job(self, patient_id, static_data, timeseries_data):
+        """
+        Submits the risk prediction of a patient's scaled model inputs to the job executor.
+        The job is keyed by session and patient like submit_shap_values_job(), so it survives the
+        discard of the session's jobs when the patient is loaded; collect_risk() returns its result.
+        Returns:
+            tuple: Key of the job.
+        """
+        job_key = (get_session_id(), patient_id, "risk")
+        get_job_executor().submit(
+            job_key, self.predict_batch, np.array(static_data), np.array(timeseries_data))
+        return job_key
 
-        # Retrieve patient raw data
-        patient_ml_data = st.session_state.patient.get_ml_data()
-        timeseries_data = patient_ml_data.get('timeseries')
-        static_data = patient_ml_data.get('static')
-
-        # For background data, here we reuse the same sample.
-        # For improved explanations, consider using a larger background dataset.
-        background_static = st.session_state.background_static
-        background_timeseries = st.session_state.background_timeseries
-
-        # Initialize SHAP GradientExplainer using the model and background data.
-        explainer = shap.GradientExplainer(
-            self.model, [background_static, background_timeseries]
-        )
-
-        # Compute the SHAP values for the current patient's data.
-        shap_values = explainer.shap_values([static_data, timeseries_data])
-
-        # Split shap values into static and timeseries.
-        shap_static = np.array(shap_values[0])
-        # Bring static SHAP values into the right format: reshape to 1D array and multiply by 100.
-        shap_static = shap_static.flatten() * 100
-
-        # Multiply timeseries SHAP values by 100 as well, if you wish to express them in percentage points.
-        shap_timeseries = shap_values[1] * 100
+    def collect_risk(self, patient_id, static_data, timeseries_data) -> float:
+        """
+        Returns the mortality risk of a patient. The result of its prediction job is used if one was
+        submitted (e.g. by the prefetch of the next study patient), waiting for it if it is still
+        running; otherwise the risk is predicted directly.
+        """
+        job_key = (get_session_id(), patient_id, "risk")
+        executor = get_job_executor()
+        if executor.has_job(job_key):
+            return float(executor.pop_result(job_key)[0])
+        return float(self.predict_batch(static_data, timeseries_data)[0])
 
+    def collect_local_shap_values(self) -> bool:
+        """
+        Stores the SHAP values of the current patient once its job has finished and aggregates them
+        into the timeseries and overall evidence. A job is submitted if the patient has neither SHAP
+        values nor a pending job, e.g. because it was discarded or expired.
+        Returns:
+            bool: Whether the SHAP values of the current patient are available.
+        """
+        if st.session_state.shap_values is not None:
+            return True
+        patient = st.session_state.patient
+        if patient is None:
+            return False
+
+        job_key = st.session_state.shap_job_key
+        executor = get_job_executor()
+        if job_key is None or job_key[1] != patient.patient_id or not executor.has_job(job_key):
+            self.submit_local_shap_values()
+            return False
+        if not executor.done(job_key):
+            return False
+
+        shap_static, shap_timeseries = executor.pop_result(job_key)
+        st.session_state.shap_job_key = None
         st.session_state.shap_values = {
             "static": shap_static,
             "timeseries": shap_timeseries
         }
+        st.session_state.shap_values_version += 1
+        self.aggregate_timeseries_shap_values()
+        self.aggregate_shap_values()
+        return True
 
-    def aggregate_timeseries_shap_values(self):
-        # Define the vital feature names in the same order as in the timeseries data.
-        vital_features = st.session_state.timeseries_feature_names
-        # Retrieve the timeseries SHAP values from session state.
-        timeseries_shap = st.session_state.shap_values['timeseries']
+    def compute_shap_values(self, static_data, timeseries_data, explainer=None):
+        """
+        Computes the SHAP values of one patient's scaled model inputs in percentage points.
+        Uses the cached GradientExplainer for the session's background data.
+        Args:
+            static_data (np.ndarray): Scaled static data with shape (1, F).
+            timeseries_data (np.ndarray): Scaled timeseries data with shape (1, 24, C).
+            explainer (shap.GradientExplainer, optional): Explainer to use instead of the session's.
+        Returns:
+            tuple: Static SHAP values (F,) and timeseries SHAP values (1, 24, C).
+        """
+        shap_static, shap_timeseries = self.compute_shap_values_batch(
+            static_data, timeseries_data, explainer)
+        return shap_static[0], shap_timeseries[:1]
 
+    def compute_shap_values_batch(self, static_data, timeseries_data, explainer=None):
+        """
+        Computes the SHAP values of several scaled model inputs in one explainer call.
+        Args:
+            static_data (np.ndarray): Scaled static data with shape (K, F).
+            timeseries_data (np.ndarray): Scaled timeseries data with shape (K, 24, C).
+            explainer (shap.GradientExplainer, optional): Explainer to use instead of the session's;
+                required when called off the script thread.
+        Returns:
+            tuple: Static SHAP values (K, F) and timeseries SHAP values (K, 24, C) in percentage points.
+        """
+        if explainer is None:
+            explainer = self.get_session_shap_explainer()
+
+        # Compute the SHAP values for all inputs at once.
+        shap_values = explainer.shap_values(
+            [static_data, timeseries_data], nsamples=self.SHAP_NSAMPLES)
+
+        # Split shap values into static and timeseries and drop the single model output dimension.
+        # Multiply by 100 to express them in percentage points.
+        n_inputs = np.shape(static_data)[0]
+        shap_static = np.array(shap_values[0]).reshape(n_inputs, -1) * 100
+        shap_timeseries = np.array(shap_values[1]).reshape(
+            (n_inputs,) + np.shape(timeseries_data)[1:]) * 100
+        return shap_static, shap_timeseries
+
+    def compute_gradient_attribution(self, static_from, timeseries_from, static_to, timeseries_to):
+        """
+        First-order estimate of how the contributions change between two scaled model inputs:
+        the model gradient at the midpoint of both inputs times the input change.
+        The attributions sum approximately to the change in risk and take a single gradient call,
+        so they can be shown instantly while the SHAP values are still being computed.
+        Args:
+            static_from, timeseries_from (np.ndarray): Scaled reference inputs (1, F) and (1, 24, C).
+            static_to, timeseries_to (np.ndarray): Scaled changed inputs (1, F) and (1, 24, C).
+        Returns:
+            tuple: Static attributions (F,) and timeseries attributions (24, C) in percentage points.
+        """
+        static_from = np.asarray(static_from, dtype=np.float32)
+        timeseries_from = np.asarray(timeseries_from, dtype=np.float32)
+        static_change = np.asarray(static_to, dtype=np.float32) - static_from
+        timeseries_change = np.asarray(
+            timeseries_to, dtype=np.float32) - timeseries_from
+
+        static_gradient, timeseries_gradient = self.gradient_function(
+            static_from + static_change / 2, timeseries_from + timeseries_change / 2)
+        return ((np.asarray(static_gradient) * static_change)[0] * 100,
+                (np.asarray(timeseries_gradient) * timeseries_change)[0] * 100)
+
+    @staticmethod
+    def sum_timeseries_shap(timeseries_shap, timeseries_feature_names) -> dict:
+        """Sums timeseries SHAP values over time per feature, rounded to 1 decimal place."""
         # Remove any singleton dimensions (if the array has shape like (T, 1, N, 1), for example).
         # The squeezed version should have shape (num_timesteps, num_features).
         timeseries_shap_squeezed = np.squeeze(timeseries_shap)
@@ -111,12 +410,31 @@ class SepsisMortalityRiskPredictor:
         # This results in an array with one value per feature.
         aggregated_shap = np.round(timeseries_shap_squeezed.sum(axis=0), 1)
 
+        # Map the feature names to their aggregated SHAP value.
+        return {feature: value for feature,
+                value in zip(timeseries_feature_names, aggregated_shap)}
+
+    def aggregate_timeseries_shap_values(self):
+        # Define the vital feature names in the same order as in the timeseries data.
+        vital_features = st.session_state.timeseries_feature_names
+        # Retrieve the timeseries SHAP values from session state.
+        timeseries_shap = st.session_state.shap_values['timeseries']
+
         # Create a dictionary mapping the vital feature names to their aggregated SHAP value.
-        aggregated_shap_dict = {feature: value for feature,
-                                value in zip(vital_features, aggregated_shap)}
+        aggregated_shap_dict = self.sum_timeseries_shap(
+            timeseries_shap, vital_features)
 
         # Save the aggregated results into session state under the key 'timeseries_means'
         st.session_state.shap_values['timeseries_means'] = aggregated_shap_dict
+        # Keep the per-hour SHAP values for the attribution heatmap of the trend graph.
+        st.session_state.shap_values['timeseries'] = self.compact_timeseries_shap(
+            timeseries_shap)
+        st.session_state.shap_values_version += 1
+
+    @staticmethod
+    def compact_timeseries_shap(timeseries_shap) -> np.ndarray:
+        """Returns timeseries SHAP values as a float32 array with shape (num_timesteps, num_features)."""
+        return np.squeeze(timeseries_shap).astype(np.float32)
 
     def aggregate_shap_values(self):
         """
@@ -176,299 +494,111 @@ class SepsisMortalityRiskPredictor:
         """
         Combines raw patient data with both static and timeseries (aggregated) SHAP values
         into a risk table with enhanced descriptions.
+        The table is built column-wise by build_risk_table() and memoized per patient and
+        SHAP version (st.session_state.shap_values_version); callers receive a copy.
         """
-
-        def format_value_with_unit(feature, raw_value):
-            """
-            Format a raw feature value by appending its unit (if available)
-            from st.session_state.feature_metadata.
-            """
-            if pd.isna(raw_value):
-                return ""
-
-            unit = st.session_state.feature_metadata.get(
-                feature.lower(), {}).get("unit", "")
-            if unit == "" or unit is None or pd.isna(unit) or str(unit).lower() == "nan":
-                unit = None
-
-            if isinstance(raw_value, (int, float)):
-                formatted = f"{raw_value:.2f}"
-            else:
-                formatted = str(raw_value)
-
-            return f"{formatted} {unit}" if unit else formatted
-
-        # Get the required data from session state.
-        static_shap_values = st.session_state.shap_values['static']
-        static_feature_names = st.session_state.static_feature_names
-        patient_base = st.session_state.patient_base
-
-        # Prepare rows for static features.
-        rows = []
-        for i in range(len(static_shap_values)):
-            feature_name = static_feature_names[i]
-            raw_value = st.session_state.patient.get_feature_value(
-                feature_name)
-            formatted_value = format_value_with_unit(feature_name, raw_value)
-            risk_contribution = static_shap_values[i]
-
-            abs_contrib = abs(risk_contribution)
-            if abs_contrib > 5:
-                contribution_strength = "much"
-            elif abs_contrib > 3:
-                contribution_strength = "slightly"
-            else:
-                contribution_strength = "not much"
-
-            description_parts = [
-                f"The parameter '{feature_name.replace('_', ' ').title()}' contributes {contribution_strength} to the risk."
-            ]
-            comparison_parts = []
-
-            try:
-                # NEW: Add reference range comparison as the first sentence.
-                if raw_value is not None:
-                    meta = st.session_state.feature_metadata.get(
-                        feature_name.lower(), {})
-                    normal_lower = meta.get("normal_lower", None)
-                    normal_upper = meta.get("normal_upper", None)
-                    # Only add the sentence if both bounds exist.
-                    # Check that both bounds are provided and not NaN or empty.
-                    if (normal_lower not in [None, ""] and normal_upper not in [None, ""] and
-                            not pd.isna(normal_lower) and not pd.isna(normal_upper)):
-                        try:
-                            normal_lower = float(normal_lower)
-                            normal_upper = float(normal_upper)
-                            if raw_value < normal_lower:
-                                range_sentence = f"Compared to the reference range ({normal_lower}-{normal_upper}), the patient's value is LOW."
-                            elif raw_value > normal_upper:
-                                range_sentence = f"Compared to the reference range ({normal_lower}-{normal_upper}), the patient's value is HIGH."
-                            else:
-                                range_sentence = f"The patient's value is in the normal reference range ({normal_lower}-{normal_upper})."
-                            comparison_parts.insert(0, range_sentence)
-                        except Exception:
-                            pass
-
-                feature_stats = patient_base.get_feature_statistics(
-                    feature_name)
-                if raw_value is not None:
-                    min_val = feature_stats['min']
-                    max_val = feature_stats['max']
-                    survivors_lower = feature_stats['survivors_lower']
-                    survivors_upper = feature_stats['survivors_upper']
-                    non_survivors_lower = feature_stats['non_survivors_lower']
-                    non_survivors_upper = feature_stats['non_survivors_upper']
-
-                    comparison_text = "Compared to the patient training base of spesis-3 ICU patients, this value is "
-                    relative_position = []
-                    if raw_value < (min_val + (max_val - min_val) * 0.1):
-                        relative_position.append("comparatively low")
-                    elif raw_value > (max_val - (max_val - min_val) * 0.1):
-                        relative_position.append("comparatively high")
-                    if relative_position:
-                        comparison_text += f"{' and '.join(relative_position)}."
-                        comparison_parts.append(comparison_text)
-
-                    in_survivor_range = survivors_lower <= raw_value <= survivors_upper
-                    in_non_survivor_range = non_survivors_lower <= raw_value <= non_survivors_upper
-                    range_info = []
-                    if in_survivor_range and in_non_survivor_range:
-                        range_info.append(
-                            "in the overlapping range of survivors and non-survivors")
-                    elif in_survivor_range:
-                        range_info.append(
-                            "within the typical range of survivors")
-                    elif in_non_survivor_range:
-                        range_info.append(
-                            "within the typical range of non-survivors")
-
-                    if range_info:
-                        comparison_parts.append(
-                            f"Here, the patient's value is {', '.join(range_info)}.")
-                    else:
-                        comparison_parts.append(
-                            "The patient's value is outside the typical range of both survivors and non-survivors.")
-                else:
-                    comparison_parts.append(
-                        "The patient's value is not available.")
-            except ValueError as e:
-                comparison_parts.append(
-                    f"Statistics not available for this feature: {e}")
-
-            row = {
-                "Parameter": feature_name,
-                "Raw Value": formatted_value,
-                "Risk Contribution": risk_contribution,
-                "Description": " ".join(description_parts),
-                "Comparison": " ".join(comparison_parts)
-            }
-            rows.append(row)
-
-        # Process the aggregated timeseries SHAP values.
-        timeseries_aggregated = st.session_state.shap_values.get(
-            "timeseries_means", {})
-
-        for feature, shap_value in timeseries_aggregated.items():
-            raw_value = st.session_state.patient.get_feature_value(feature)
-            formatted_value = format_value_with_unit(feature, raw_value)
-            abs_contrib = abs(shap_value)
-            if abs_contrib > 5:
-                contribution_strength = "much"
-            elif abs_contrib > 3:
-                contribution_strength = "slightly"
-            else:
-                contribution_strength = "not much"
-
-            description_parts = [
-                f"Over the observed time period, the parameter '{feature.replace('_', ' ').title()}' contributes {contribution_strength} to the risk."
-            ]
-            comparison_parts = []
-
-            try:
-                # NEW: Add reference range sentence for the aggregated value.
-                if raw_value is not None:
-                    meta = st.session_state.feature_metadata.get(
-                        feature.lower(), {})
-                    normal_lower = meta.get("normal_lower", None)
-                    normal_upper = meta.get("normal_upper", None)
-                    if (normal_lower not in [None, ""] and normal_upper not in [None, ""] and
-                            not pd.isna(normal_lower) and not pd.isna(normal_upper)):
-                        try:
-                            normal_lower = float(normal_lower)
-                            normal_upper = float(normal_upper)
-                            if raw_value < normal_lower:
-                                range_sentence = f"Compared to the reference range ({normal_lower}-{normal_upper}), the patient's value is LOW."
-                            elif raw_value > normal_upper:
-                                range_sentence = f"Compared to the reference range ({normal_lower}-{normal_upper}), the patient's value is HIGH."
-                            else:
-                                range_sentence = f"The patient's value is in the normal reference range ({normal_lower}-{normal_upper})."
-                            comparison_parts.insert(0, range_sentence)
-                        except Exception:
-                            pass
-
-                feature_stats = patient_base.get_feature_statistics(feature)
-                if raw_value is not None:
-                    min_val = feature_stats['min']
-                    max_val = feature_stats['max']
-                    survivors_lower = feature_stats['survivors_lower']
-                    survivors_upper = feature_stats['survivors_upper']
-                    non_survivors_lower = feature_stats['non_survivors_lower']
-                    non_survivors_upper = feature_stats['non_survivors_upper']
-
-                    comparison_text = "Compared to the patient base, this aggregated value is "
-                    relative_position = []
-                    if raw_value < (min_val + (max_val - min_val) * 0.1):
-                        relative_position.append("comparatively low")
-                    elif raw_value > (max_val - (max_val - min_val) * 0.1):
-                        relative_position.append("comparatively high")
-                    if relative_position:
-                        comparison_text += f"{' and '.join(relative_position)}."
-                        comparison_parts.append(comparison_text)
-
-                    in_survivor_range = survivors_lower <= raw_value <= survivors_upper
-                    in_non_survivor_range = non_survivors_lower <= raw_value <= non_survivors_upper
-                    range_info = []
-                    if in_survivor_range and in_non_survivor_range:
-                        range_info.append(
-                            "in the overlapping range of survivors and non-survivors")
-                    elif in_survivor_range:
-                        range_info.append(
-                            "within the typical range of survivors")
-                    elif in_non_survivor_range:
-                        range_info.append(
-                            "within the typical range of non-survivors")
-
-                    if range_info:
-                        comparison_parts.append(
-                            f"The patient's aggregated value is {', '.join(range_info)}.")
-                    else:
-                        comparison_parts.append(
-                            "The patient's aggregated value is outside the typical range of both survivors and non-survivors.")
-                else:
-                    comparison_parts.append(
-                        "The patient's value is not available.")
-            except ValueError as e:
-                comparison_parts.append(
-                    f"Statistics not available for this feature: {e}")
-
-            row = {
-                "Parameter": feature,
-                "Raw Value": formatted_value,
-                "Risk Contribution": shap_value,
-                "Description": " ".join(description_parts),
-                "Comparison": " ".join(comparison_parts)
-            }
-            rows.append(row)
-
-        # Build the DataFrame.
-        df = pd.DataFrame(rows)
-        df["Absolute Risk Contribution"] = df["Risk Contribution"].abs()
-        df = df.sort_values(by="Absolute Risk Contribution", ascending=False).drop(
-            columns=["Absolute Risk Contribution"])
-        df.reset_index(drop=True, inplace=True)
-        df["Risk Contribution"] = df["Risk Contribution"].apply(
-            lambda x: f"{x:.2f}")
-        df = df[df["Risk Contribution"].apply(lambda x: abs(float(x)) > 0.02)]
-
-        if len(df) > 9 and shorten_table:
-            top_df = df.iloc[:9].copy()
-            others_sum = df.iloc[9:]["Risk Contribution"].astype(float).sum()
-            others_row = {
-                "Parameter": "Others",
-                "Raw Value": "",
-                "Risk Contribution": f"{others_sum:.2f}",
-                "Description": "<div style='font-size: 0.7em; color: #AAAAAA;'>Combined contribution of other less influential parameters.</div>",
-                "Comparison": ""
-            }
-            others_df = pd.DataFrame([others_row])
-            df = pd.concat([top_df, others_df], ignore_index=True)
-
-        return df
-
-    def scale_ml_data(self, static_df, timeseries_df):
-        """
-        Scales the static and timeseries data using the loaded scaler objects.
+        cache_key = (st.session_state.patient.patient_id,
+                     st.session_state.shap_values_version)
+        cache = st.session_state.get("risk_table_cache")
+        if cache is None or cache["key"] != cache_key:
+            cache = st.session_state.risk_table_cache = {
+                "key": cache_key, "tables": {}}
+
+        if shorten_table not in cache["tables"]:
+            static_shap_values = st.session_state.shap_values['static']
+            static_feature_names = st.session_state.static_feature_names[:len(
+                static_shap_values)]
+            timeseries_aggregated = st.session_state.shap_values.get(
+                "timeseries_means", {})
+
+            features = list(static_feature_names) + list(timeseries_aggregated)
+            patient = st.session_state.patient
+            cache["tables"][shorten_table] = build_risk_table(
+                features,
+                ["static"] * len(static_feature_names) +
+                ["timeseries"] * len(timeseries_aggregated),
+                [patient.get_feature_value(feature) for feature in features],
+                np.concatenate([np.asarray(static_shap_values, dtype=np.float64),
+                                np.fromiter(timeseries_aggregated.values(), dtype=np.float64,
+                                            count=len(timeseries_aggregated))]),
+                st.session_state.feature_metadata,
+                st.session_state.patient_base.get_statistics_table(features),
+                shorten_table=shorten_table)
+
+        return cache["tables"][shorten_table].copy()
+
+    def get_scaling_kernel(self, static_feature_names, timeseries_feature_names) -> AffineScalingKernel:
+        """Returns the cached scaling kernel for the given model feature order."""
+        return self.load_scaling_kernel(
+            tuple(static_feature_names), tuple(timeseries_feature_names))
+
+    def scale_raw_arrays(self, static_raw, timeseries_raw, static_feature_names, timeseries_feature_names):
+        """
+        Scales raw patient arrays into the model input format without intermediate DataFrames.
+        Unscaled (binary) static features are passed through and missing values are filled with -1.
         Args:
-            static_df (pd.DataFrame): Static data to be scaled.
-            timeseries_df (pd.DataFrame): Timeseries data to be scaled.
+            static_raw (np.ndarray): Raw static data with shape (N, F) in static_feature_names order.
+            timeseries_raw (np.ndarray): Raw timeseries data with shape (N, 24, C) in timeseries_feature_names order.
+            static_feature_names (list): Static feature names in model input order.
+            timeseries_feature_names (list): Timeseries feature names in model input order.
         Returns:
-            tuple: Scaled static and timeseries data as pandas DataFrames.
-        """
-        # Work on copies to avoid chained assignment issues
-        static_df = static_df.copy()
-        timeseries_df = timeseries_df.copy()
-
-        #
-
-        # For static data: exclude 'hadm_id' and scale numeric columns
-        numeric_cols_static = static_df.select_dtypes(
-            include=['int64', 'float64']).columns.drop('hadm_id', errors='ignore')
-        static_scaled = self.static_scaler.transform(
-            static_df.loc[:, numeric_cols_static].astype("float32"))
-        scaled_static_df = pd.DataFrame(
-            static_scaled, index=static_df.index, columns=numeric_cols_static)
-
-        # Convert the target columns to float64 before assigning scaled data
-        static_df.loc[:, numeric_cols_static] = static_df.loc[:,
-                                                              numeric_cols_static].astype("float64")
-        static_df.loc[:, numeric_cols_static] = scaled_static_df
-
-        # For timeseries data: exclude 'hadm_id' and scale numeric columns
-        numeric_cols_timeseries = timeseries_df.select_dtypes(
-            include=['int64', 'float64']).columns.drop('hadm_id', errors='ignore')
-        # ensure column order exactly matches what the scaler saw at fit time
-        expected = list(self.timeseries_scaler.feature_names_in_)
-        timeseries_df = timeseries_df.reindex(columns=expected)
-
-        timeseries_scaled = self.timeseries_scaler.transform(
-            timeseries_df.loc[:, numeric_cols_timeseries].astype("float32"))
-        scaled_timeseries_df = pd.DataFrame(
-            timeseries_scaled, index=timeseries_df.index, columns=numeric_cols_timeseries)
-
-        # Convert the target columns to float64 before assigning scaled data
-        timeseries_df.loc[:, numeric_cols_timeseries] = timeseries_df.loc[:,
-                                                                          numeric_cols_timeseries].astype("float64")
-        # Assign the scaled data back to the original DataFrame
-        timeseries_df.loc[:, numeric_cols_timeseries] = scaled_timeseries_df
-
-        return static_df, timeseries_df
+            tuple: Scaled static data (N, F) and timeseries data (N, 24, C) as float32 arrays.
+        """
+        kernel = self.get_scaling_kernel(
+            static_feature_names, timeseries_feature_names)
+        return kernel.transform(static_raw, timeseries_raw)
+
+
+@st.cache_resource(show_spinner=False)
+def start_loading_prediction_model():
+    """
+    Starts loading the prediction model (TensorFlow, Keras model, scalers and compiled forward pass)
+    on a thread of its own, so it does not hold one of the job executor's workers. Cached per process:
+    the model is loaded once, in the background, from the first script run on. A failed load is
+    evicted by SepsisMortalityRiskPredictorHandle.get(), so the next access loads it again.
+    """
+    loader = ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix="prediction_model_loader")
+    future = loader.submit(SepsisMortalityRiskPredictor)
+    # The thread exits once the model is loaded.
+    loader.shutdown(wait=False)
+    return future
+
+
+class SepsisMortalityRiskPredictorHandle:
+    """
+    Handle of the prediction model while it is loaded in the background.
+    Attribute access waits until the model is loaded and delegates to the SepsisMortalityRiskPredictor,
+    so the handle is used like the predictor itself; pages that never use the model never wait.
+    """
+
+    def __init__(self, future):
+        self.future = future
+
+    def is_ready(self) -> bool:
+        """Returns whether the model has finished loading (or failed to load)."""
+        return self.future.done()
+
+    def get(self) -> SepsisMortalityRiskPredictor:
+        """
+        Returns the predictor, waiting until it is loaded.
+        If loading failed, the error is raised and loading starts again for the next access.
+        """
+        try:
+            return self.future.result()
+        except Exception:
+            # Evict the failed load from the cache, unless another session already restarted it.
+            if start_loading_prediction_model() is self.future:
+                start_loading_prediction_model.clear()
+            self.future = start_loading_prediction_model()
+            raise
+
+    def __getattr__(self, name):
+        if name == "future":
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+
+def get_prediction_model_handle() -> SepsisMortalityRiskPredictorHandle:
+    """Returns a handle of the prediction model, starting to load it if this is the first call."""
+    return SepsisMortalityRiskPredictorHandle(start_loading_prediction_model())
@@ -0,0 +1,187 @@
+import os
+import tempfile
+import numpy as np
+
+# Reduction method for the SHAP background data: "kmeans" or "stratified".
+BACKGROUND_METHOD = "kmeans"
+# Number of k-means centroids or stratified samples kept in the background summary.
+BACKGROUND_SIZE = 100
+# Number of rows the weighted summary is expanded to before it is passed to the explainer.
+BACKGROUND_EXPANDED_SIZE = 400
+# Random state for k-means and stratified sampling, so the summary is reproducible.
+BACKGROUND_RANDOM_STATE = 42
+
+
+def kmeans_background(static_data, timeseries_data, size, random_state=BACKGROUND_RANDOM_STATE):
+    """
+    Summarizes the background data with k-means centroids.
+    Clustering runs on the concatenated static and flattened timeseries features,
+    so each centroid is a complete (static, timeseries) model input.
+
+    Args:
+        static_data (np.ndarray): Static data with shape (N, F).
+        timeseries_data (np.ndarray): Timeseries data with shape (N, T, C).
+        size (int): Number of centroids.
+        random_state (int): Random state for the k-means initialisation.
+
+    Returns:
+        tuple: (static, timeseries, weights), where weights is the share of patients per centroid.
+    """
+    from sklearn.cluster import KMeans
+
+    n_patients, n_static = static_data.shape
+    combined = np.concatenate(
+        [static_data, timeseries_data.reshape(n_patients, -1)], axis=1)
+
+    kmeans = KMeans(n_clusters=size, n_init=10, random_state=random_state)
+    cluster_labels = kmeans.fit_predict(combined)
+    centroids = kmeans.cluster_centers_.astype(np.float32)
+
+    weights = np.bincount(cluster_labels, minlength=size) / n_patients
+    static = centroids[:, :n_static]
+    timeseries = centroids[:, n_static:].reshape(
+        (size,) + timeseries_data.shape[1:])
+    return static, timeseries, weights.astype(np.float32)
+
+
+def stratified_background(static_data, timeseries_data, labels, size, random_state=BACKGROUND_RANDOM_STATE):
+    """
+    Summarizes the background data with a survivor/non-survivor stratified sample.
+    Each outcome group gets a share of the samples proportional to its size (at least one),
+    and every sample is weighted with its group's share of the cohort.
+
+    Args:
+        static_data (np.ndarray): Static data with shape (N, F).
+        timeseries_data (np.ndarray): Timeseries data with shape (N, T, C).
+        labels (np.ndarray): Outcome label per patient with shape (N,).
+        size (int): Total number of samples.
+        random_state (int): Random state for the sampling.
+
+    Returns:
+        tuple: (static, timeseries, weights), where weights sum to 1.
+    """
+    if labels is None:
+        raise ValueError(
+            "Stratified background sampling requires outcome labels (y_sel).")
+
+    rng = np.random.default_rng(random_state)
+    labels = np.asarray(labels).reshape(-1)
+    n_patients = labels.shape[0]
+
+    indices = []
+    weights = []
+    for label in np.unique(labels):
+        group = np.flatnonzero(labels == label)
+        group_share = group.size / n_patients
+        n_samples = min(group.size, max(1, int(round(size * group_share))))
+        sample = rng.choice(group, size=n_samples, replace=False)
+        indices.append(sample)
+        weights.append(np.full(n_samples, group_share / n_samples))
+
+    indices = np.concatenate(indices)
+    weights = np.concatenate(weights)
+    return static_data[indices], timeseries_data[indices], weights.astype(np.float32)
+
+
+def summarize_background(static_data, timeseries_data, labels=None, method=BACKGROUND_METHOD, size=BACKGROUND_SIZE):
+    """
+    Reduces the background data to a small weighted summary with the configured method.
+    If the background already has at most `size` patients, it is returned with equal weights.
+
+    Returns:
+        tuple: (static, timeseries, weights) as float32 arrays.
+    """
+    static_data = np.asarray(static_data, dtype=np.float32)
+    timeseries_data = np.asarray(timeseries_data, dtype=np.float32)
+    n_patients = static_data.shape[0]
+
+    if n_patients <= size:
+        weights = np.full(n_patients, 1 / n_patients, dtype=np.float32)
+        return static_data, timeseries_data, weights
+    if method == "kmeans":
+        return kmeans_background(static_data, timeseries_data, size)
+    if method == "stratified":
+        return stratified_background(static_data, timeseries_data, labels, size)
+    raise ValueError(
+        f"Background method '{method}' not recognized. Valid methods are: ['kmeans', 'stratified']")
+
+
+def get_background_cache_path(file_path_ml, method=BACKGROUND_METHOD, size=BACKGROUND_SIZE):
+    """Returns the path of the persisted background summary next to the ML data file."""
+    stem, _ = os.path.splitext(file_path_ml)
+    return f"{stem}_shap_background_{method}_{size}.npz"
+
+
+def load_summarized_background(file_path_ml, method=BACKGROUND_METHOD, size=BACKGROUND_SIZE):
+    """
+    Loads the weighted background summary for the ML data file.
+    The summary is computed once and persisted as .npz next to the ML data file.
+    It is recomputed when the modification time or size of the ML data file has changed since.
+
+    Args:
+        file_path_ml (str): Path to the .npz file containing the ML data.
+        method (str): Reduction method, "kmeans" or "stratified".
+        size (int): Number of rows in the summary.
+
+    Returns:
+        tuple: (static, timeseries, weights) as float32 arrays.
+    """
+    cache_path = get_background_cache_path(file_path_ml, method, size)
+    source_stat = os.stat(file_path_ml)
+
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            if ("source_size" in cached.files
+                    and int(cached["source_mtime_ns"]) == source_stat.st_mtime_ns
+                    and int(cached["source_size"]) == source_stat.st_size):
+                return cached["static"], cached["timeseries"], cached["weights"]
+
+    with np.load(file_path_ml, allow_pickle=True) as data:
+        labels = data["y_sel"] if "y_sel" in data else None
+        static, timeseries, weights = summarize_background(
+            data["X_static_sel"], data["X_timeseries_sel"], labels, method, size)
+
+    save_background_cache(cache_path, static=static, timeseries=timeseries, weights=weights,
+                          source_mtime_ns=source_stat.st_mtime_ns, source_size=source_stat.st_size)
+    return static, timeseries, weights
+
+
+def save_background_cache(cache_path, **arrays):
+    """
+    Writes the background summary to a temporary file next to cache_path and renames it into place,
+    so a process starting at the same time never reads a partially written file.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(cache_path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def expand_weighted_background(static, timeseries, weights, size=BACKGROUND_EXPANDED_SIZE,
+                               summary_size=BACKGROUND_SIZE):
+    """
+    Expands a weighted background summary into an unweighted set of rows.
+    The GradientExplainer draws background rows uniformly, so each row is repeated in
+    proportion to its weight (largest remainder rounding to exactly `size` rows).
+    Unweighted summaries, and cohorts with fewer rows than summary_size (which are kept as they are),
+    are returned unchanged: repeating equally weighted rows unevenly would only bias the background.
+
+    Returns:
+        tuple: (static, timeseries) as float32 arrays.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.size < summary_size or np.allclose(weights, weights[0]):
+        return static, timeseries
+
+    exact_counts = weights / weights.sum() * size
+    counts = np.floor(exact_counts).astype(int)
+    remainder = size - counts.sum()
+    if remainder > 0:
+        counts[np.argsort(exact_counts - counts)[::-1][:remainder]] += 1
+
+    return np.repeat(static, counts, axis=0), np.repeat(timeseries, counts, axis=0)
@@ -1,5 +1,234 @@
+import math
 from streamlit_counterfactual_slider import st_counterfactual_slider
 import streamlit as st
+import pandas as pd
+from src.counterfactual_engine import CounterfactualEngine
+from src.counterfactual_search import search_counterfactual, SEARCH_TARGET_RISK
+from src.scenario_store import ScenarioStore
+from src.job_executor import get_job_executor, get_session_id, wait_for_job
+from components.risk_sensitivity_curve import create_risk_sensitivity_curve
+
+# Numeric slider features the counterfactual search may change.
+SEARCH_FEATURES = [
+    "age", "weight",
+    "suspected_infection_time_poe_days", "sofa", "sirs", "mingcs", "elixhauser_hospital",
+    "heartrate", "sysbp", "diasbp", "meanbp", "resprate", "tempc", "spo2",
+    "urineoutput",
+    "norepinephrine_dose", "epinephrine_dose", "dopamine_dose",
+    "dobutamine_dose", "phenylephrine_dose", "vasopressin_dose",
+]
+
+
+def get_counterfactual_engine():
+    """
+    Returns the what-if engine of the current patient, building it on first use.
+    The engine is reset to None whenever a new patient is loaded.
+    """
+    if st.session_state.counterfactual_engine is None:
+        st.session_state.counterfactual_engine = CounterfactualEngine(
+            st.session_state.sepsis_prediction_model,
+            st.session_state.patient,
+            st.session_state.static_feature_names,
+            st.session_state.timeseries_feature_names,
+        )
+    return st.session_state.counterfactual_engine
+
+
+def get_scenario_store():
+    """
+    Returns the saved what-if scenarios of the current patient.
+    The store is reset to None whenever a new patient is loaded.
+    """
+    if st.session_state.scenario_store is None:
+        st.session_state.scenario_store = ScenarioStore(
+            st.session_state.sepsis_prediction_model,
+            st.session_state.patient.patient_id,
+            st.session_state.timeseries_feature_names,
+        )
+    return st.session_state.scenario_store
+
+
+def show_scenario_workspace():
+    """
+    Display the saved what-if scenarios of the patient.
+    The current slider scenario can be saved under a name; "Calculate Risk" scores all new or
+    changed scenarios in one batch, and SHAP values can be compared side by side.
+    """
+    store = get_scenario_store()
+
+    name_col, save_col, score_col = st.columns(
+        [2, 1, 1], vertical_alignment="bottom")
+    with name_col:
+        scenario_name = st.text_input(
+            "Scenario name",
+            value=f"Scenario {len(store.scenarios) + 1}",
+            key="scenario_name",
+        )
+    with save_col:
+        if st.button("Save scenario", key="scenario_save_button", use_container_width=True) and scenario_name:
+            store.save(scenario_name, st.session_state.counterfactual_patient.get_delta(),
+                       get_counterfactual_engine().get_ml_data())
+    with score_col:
+        if st.button("Calculate Risk", key="scenario_score_button", use_container_width=True,
+                     disabled=not store.get_dirty()):
+            store.score_dirty()
+
+    if not store.scenarios:
+        st.markdown("No scenarios saved yet.")
+        return
+
+    st.dataframe(store.get_summary(), hide_index=True,
+                 use_container_width=True)
+
+    delete_col, explain_col = st.columns([2, 2], vertical_alignment="bottom")
+    with delete_col:
+        scenario_to_delete = st.selectbox(
+            "Scenario", list(store.scenarios), key="scenario_delete_select")
+        if st.button("Delete scenario", key="scenario_delete_button"):
+            store.delete(scenario_to_delete)
+            st.rerun()
+    with explain_col:
+        explain_scenarios = st.toggle(
+            "Compare SHAP values", value=False, key="scenario_explain",
+            help="Explains every saved scenario and shows the most important parameters side by side.")
+
+    if explain_scenarios:
+        with st.spinner("Explaining scenarios..."):
+            store.explain()
+        st.dataframe(store.get_shap_comparison(st.session_state.static_feature_names),
+                     use_container_width=True)
+
+
+def build_scenario_explanation_table(attribution_change, shap_original=None, shap_scenario=None, top_n=10):
+    """
+    Builds the table of the features whose contribution changed most in the scenario.
+    Without SHAP values only the first-order estimate is shown.
+    """
+    table = pd.DataFrame({"Estimated change": attribution_change})
+    if shap_original is not None and shap_scenario is not None:
+        table["Patient"] = shap_original
+        table["Scenario"] = shap_scenario
+        table["Change"] = shap_scenario - shap_original
+    order = table.iloc[:, -1].abs().sort_values(ascending=False).index[:top_n]
+    return table.loc[order].round(2)
+
+
+def collect_scenario_shap_values(engine) -> bool:
+    """
+    Adds the SHAP values of the current scenario to the engine's cache once their job has finished.
+    The job is keyed by session, patient and the scenario's inputs, so every version of the scenario
+    gets its own job; the job of a version the user has moved on from is cancelled.
+
+    Returns:
+        bool: Whether the SHAP values of the scenario are available.
+    """
+    if engine.get_shap_values() is not None:
+        return True
+
+    job_key = (get_session_id(), engine.patient_id, "scenario_shap_values",
+               engine.get_input_key(engine.static, engine.timeseries))
+    executor = get_job_executor()
+    if st.session_state.scenario_shap_job_key not in (None, job_key):
+        executor.cancel(st.session_state.scenario_shap_job_key)
+    st.session_state.scenario_shap_job_key = job_key
+    if not executor.has_job(job_key):
+        # The explainer is resolved here, as the job has no access to the session state.
+        executor.submit(job_key, engine.compute_shap_values, engine.get_unexplained_inputs(),
+                        engine.predictor.get_session_shap_explainer())
+        return False
+    if not executor.done(job_key):
+        return False
+
+    engine.shap_cache.update(executor.pop_result(job_key))
+    st.session_state.scenario_shap_job_key = None
+    return True
+
+
+def show_scenario_explanation():
+    """
+    Display how the feature contributions changed from the patient to the scenario.
+    An instant first-order estimate is shown first; the SHAP values of the scenario are computed
+    on the job executor (together with the patient's SHAP values if needed) and replace it once available.
+    """
+    if not st.toggle("Explain the scenario", value=False, key="scenario_explain_changes",
+                     help="Shows how the contribution of each parameter changes in the scenario (in percentage points)."):
+        return
+
+    engine = get_counterfactual_engine()
+    if not engine.has_changes():
+        st.markdown("The scenario does not differ from the patient yet.")
+        return
+
+    attribution_change = engine.get_attribution_change()
+    if not collect_scenario_shap_values(engine):
+        st.dataframe(build_scenario_explanation_table(attribution_change),
+                     use_container_width=True)
+        st.caption("Estimated change: first-order estimate from the model gradient.")
+        wait_for_job(lambda: collect_scenario_shap_values(engine),
+                     "Computing SHAP values of the scenario...")
+        return
+
+    st.dataframe(build_scenario_explanation_table(
+        attribution_change, engine.get_shap_values(original=True), engine.get_shap_values()),
+        use_container_width=True)
+    st.caption("Estimated change: first-order estimate from the model gradient. "
+               "Patient, Scenario and Change: SHAP values.")
+
+
+def show_counterfactual_search():
+    """
+    Display the automated search for the minimal changes that bring the risk below a target.
+    Results are kept on the patient's what-if engine per target risk.
+    """
+    engine = get_counterfactual_engine()
+
+    target_col, button_col = st.columns([2, 1], vertical_alignment="bottom")
+    with target_col:
+        target_risk = st.number_input(
+            "Target risk (%)",
+            min_value=1,
+            max_value=99,
+            value=int(SEARCH_TARGET_RISK * 100),
+            step=1,
+            key="counterfactual_search_target",
+        ) / 100
+    with button_col:
+        if st.button("Find minimal changes", key="counterfactual_search_button", use_container_width=True):
+            bounds = {}
+            for feature in SEARCH_FEATURES:
+                stats = st.session_state.patient_base.get_feature_statistics(
+                    feature)
+                bounds[feature] = (stats["min"], stats["max"])
+            with st.spinner("Searching..."):
+                engine.search_results[target_risk] = search_counterfactual(
+                    engine, bounds, target_risk)
+
+    result = engine.search_results.get(target_risk)
+    if result is None:
+        return
+    if not result["changes"]:
+        if result["target_reached"]:
+            st.markdown(
+                f"The patient's risk of {result['original_risk']:.0%} is already below the target.")
+        else:
+            st.markdown("No change of a single feature lowers the risk.")
+        return
+
+    st.dataframe(
+        pd.DataFrame([{
+            "Feature": change["feature"].replace("_", " ").capitalize(),
+            "Patient": round(change["original_value"], 2),
+            "Scenario": round(change["value"], 2),
+        } for change in result["changes"]]),
+        hide_index=True,
+        use_container_width=True,
+    )
+    if result["target_reached"]:
+        st.markdown(
+            f"These changes lower the risk from {result['original_risk']:.0%} to {result['risk']:.0%}.")
+    else:
+        st.markdown(
+            f"The target was not reached; the best scenario found has a risk of {result['risk']:.0%}.")
 
 
 def show_counterfactual():
@@ -55,346 +284,391 @@ def show_counterfactual():
             unsafe_allow_html=True
         )
 
-    with st.form("counterfactual_form", clear_on_submit=False):
-        dummy_left_col, save_button_col, dummy_right_col = st.columns([
-                                                                      1.5, 2, 1.5])
-        with save_button_col:
-            if st.form_submit_button(
-                label="Save Changes before Calculating",
-                type="secondary" if st.session_state.counterfactual_data_changed else "primary",
-                use_container_width=True,
-            ):
-                st.session_state.counterfactual_data_changed = True
-                st.session_state.counterfactual_changed_state_changed = True
-
-        categorical_feat_col, numeric_feat_col = st.columns([1, 2])
-        with categorical_feat_col:
-            with st.container(border=True):
-
-                patient_cat_col, scenario_cat_col = st.columns(2)
-                with patient_cat_col:
-                    ethnicity_options = ("White", "Black", "Hispanic", "Other")
-                    patient_ethnicity = st.session_state.patient.get_feature_value(
-                        "ethnicity").capitalize()
-                    ethnicity_index = ethnicity_options.index(
-                        patient_ethnicity) if patient_ethnicity in ethnicity_options else 0
-                    ethnicity_pat = st.selectbox(
-                        "Ethnicity",
-                        ethnicity_options,
-                        disabled=True,
-                        index=ethnicity_index,
-                        key="ethnicity_pat",
-                    )
-
-                    gender_options = ("Female", "Male")
-                    patient_gender = st.session_state.patient.get_feature_value(
-                        "gender").capitalize()
-                    gender_index = gender_options.index(
-                        patient_gender) if patient_gender in gender_options else 0
-                    gender_pat = st.selectbox(
-                        "Gender",
-                        gender_options,
-                        disabled=True,
-                        index=gender_index,
-                        key="gender_pat",
-                    )
-
-                with scenario_cat_col:
-                    ethnicity_scenario = st.selectbox(
-                        "Ethnicity",
-                        ethnicity_options,
-                        disabled=False,
-                        label_visibility="hidden",
-                        index=ethnicity_index,
-                        key="ethnicity_scenario",
-                    )
-
-                    gender_scenario = st.selectbox(
-                        "Gender",
-                        gender_options,
-                        disabled=False,
-                        label_visibility="hidden",
-                        index=gender_index,
-                        key="gender_scenario",
-                    )
-
-                    # Store ethnicity: reset all race options then indicate the selected one
-                    for eth in ethnicity_options:
-                        st.session_state.counterfactual_patient.demographics[
-                            f"race_{eth.lower()}"] = False
-                    st.session_state.counterfactual_patient.demographics[
-                        f"race_{ethnicity_scenario.lower()}"] = True
-
-                    # Store gender: set keys "gender_F" and "gender_M" appropriately
-                    if gender_scenario == "Female":
-                        st.session_state.counterfactual_patient.demographics["gender"] = "Female"
-                        st.session_state.counterfactual_patient.demographics["gender_F"] = True
-                        st.session_state.counterfactual_patient.demographics["gender_M"] = False
-                    else:
-                        st.session_state.counterfactual_patient.demographics["gender"] = "Male"
-                        st.session_state.counterfactual_patient.demographics["gender_F"] = False
-                        st.session_state.counterfactual_patient.demographics["gender_M"] = True
-
-            with st.container(border=True):
-                # Retrieve the diagnosis dictionary from session state
-                diagnosis_dict = st.session_state.patient.diagnosis
-
-                # Get all the keys as options
-                diagnosis_options = list(diagnosis_dict.keys())
-
-                # Determine the default options (those with True or 1)
-                default_diagnoses = [key for key, value in diagnosis_dict.items() if value in [
-                    True, 1]]
-
-                patient_diagnosis = st.multiselect(
-                    "Diagnosis",
-                    diagnosis_options,
-                    default=default_diagnoses,
+    # Raw scenario values per model feature, applied to the what-if engine after all widgets
+    static_values = {}
+    timeseries_values = {}
+    # New averages of the timeseries sliders
+    timeseries_targets = {}
+
+    with st.expander("Find the minimal changes to lower the risk", expanded=False, icon=":material/search:"):
+        show_counterfactual_search()
+
+    show_sensitivity_curves = st.toggle(
+        "Show risk curves along the sliders",
+        value=False,
+        key="show_sensitivity_curves",
+        help="Shows how the patient's predicted risk changes along each slider when only that feature is changed.",
+    )
+
+    categorical_feat_col, numeric_feat_col = st.columns([1, 2])
+    with categorical_feat_col:
+        with st.container(border=True):
+
+            patient_cat_col, scenario_cat_col = st.columns(2)
+            with patient_cat_col:
+                ethnicity_options = ("White", "Black", "Hispanic", "Other")
+                patient_ethnicity = st.session_state.patient.get_feature_value(
+                    "ethnicity").capitalize()
+                ethnicity_index = ethnicity_options.index(
+                    patient_ethnicity) if patient_ethnicity in ethnicity_options else 0
+                ethnicity_pat = st.selectbox(
+                    "Ethnicity",
+                    ethnicity_options,
                     disabled=True,
-                    key="diagnosis_pat",
-                )
-
-                diagnosis_scenario = st.multiselect(
-                    "Diagnosis",
-                    diagnosis_options,
-                    default=default_diagnoses,
-                    disabled=False,
-                    key="diagnosis_scenario",
-                    label_visibility="collapsed",
+                    index=ethnicity_index,
+                    key="ethnicity_pat",
                 )
 
-                # Update the counterfactual patient dictionary with the selected diagnosis
-                updated_diagnosis = {key: (key in diagnosis_scenario)
-                                     for key in diagnosis_options}
-                st.session_state.counterfactual_patient.update_diagnosis(
-                    updated_diagnosis)
-
-            with st.container(border=True):
-                # Retrieve the specimen dictionary from session state
-                specimen_dict = st.session_state.patient.specimen
-
-                # List all available specimen types
-                specimen_options = list(specimen_dict.keys())
-
-                # Determine the default selections (those with True or 1)
-                default_specimens = [key for key, value in specimen_dict.items() if value in [
-                    True, 1]]
-
-                patient_specimen = st.multiselect(
-                    "Specimen",
-                    specimen_options,
-                    default=default_specimens,
+                gender_options = ("Female", "Male")
+                patient_gender = st.session_state.patient.get_feature_value(
+                    "gender").capitalize()
+                gender_index = gender_options.index(
+                    patient_gender) if patient_gender in gender_options else 0
+                gender_pat = st.selectbox(
+                    "Gender",
+                    gender_options,
                     disabled=True,
-                    key="specimen_pat",
+                    index=gender_index,
+                    key="gender_pat",
                 )
 
-                specimen_scenario = st.multiselect(
-                    "Specimen",
-                    specimen_options,
-                    default=default_specimens,
+            with scenario_cat_col:
+                ethnicity_scenario = st.selectbox(
+                    "Ethnicity",
+                    ethnicity_options,
                     disabled=False,
-                    key="specimen_scenario",
-                    label_visibility="collapsed",
+                    label_visibility="hidden",
+                    index=ethnicity_index,
+                    key="ethnicity_scenario",
                 )
 
-                # Update the counterfactual patient dictionary with the selected specimen
-                updated_specimen = {key: (key in specimen_scenario)
-                                    for key in specimen_options}
-                st.session_state.counterfactual_patient.update_specimen(
-                    updated_specimen)
-
-            with st.container(border=True):
-                toggle_features = [
-                    "vent",
-                    "severe_sepsis_explicit",
-                    "positive_culture_poe",
-                    "blood_culture_positive",
-                    "septic_shock_explicit",
-                ]
-                patient_toggle_col, scenario_toggle_col = st.columns([3, 1])
-                with patient_toggle_col:
-                    for feature in toggle_features:
-                        default_value = st.session_state.patient.clinical_data.get(
-                            feature, False)
-                        st.toggle(
-                            label=feature.replace("_", " ").capitalize(),
-                            value=default_value,
-                            disabled=True,
-                            key=f"{feature}_pat",
-                        )
-                with scenario_toggle_col:
-                    updated_clinical_data = {}
-                    for feature in toggle_features:
-                        default_value = st.session_state.patient.clinical_data.get(
-                            feature, False)
-                        scenario_value = st.toggle(
-                            label=feature.replace("_", " ").capitalize(),
-                            value=default_value,
-                            label_visibility="collapsed",
-                            key=f"{feature}_scenario",
-                        )
-                        updated_clinical_data[feature] = scenario_value
-
-                # Update only the toggle-based keys in counterfactual_patient without affecting numeric keys
-                st.session_state.counterfactual_patient.update_clinical_data(
-                    updated_clinical_data)
-
-        with numeric_feat_col:
-            def build_slider(feature, timeseries=None):
-                # Obtain the statistics for the current feature
-                raw_stats = st.session_state.patient_base.get_feature_statistics(
-                    feature)
-                stats = {
-                    "min": float(raw_stats["min"]),
-                    "max": float(raw_stats["max"]),
-                    "survivors_lower": float(raw_stats["survivors_lower"]),
-                    "survivors_upper": float(raw_stats["survivors_upper"]),
-                    "non_survivors_lower": float(raw_stats["non_survivors_lower"]),
-                    "non_survivors_upper": float(raw_stats["non_survivors_upper"]),
-                }
-
-                discrete_features = ["sofa", "sirs",
-                                     "mingcs", "elixhauser_hospital"]
-                if feature in discrete_features:
-                    step_size = 1
-                else:
-                    range_val = stats["max"] - stats["min"]
-                    if range_val >= 20:
-                        step_size = 1
-                    else:
-                        step_size = 0.1
-
-                if not timeseries:
-                    pat_value = st.session_state.patient.get_feature_value(
-                        feature)
-                elif timeseries == "vitals":
-                    pat_value = st.session_state.patient.get_vital_average(
-                        feature)
-                elif timeseries == "urineoutput":
-                    pat_value = st.session_state.patient.get_urineoutput_average()
-                elif timeseries == "vasopressor":
-                    pat_value = st.session_state.patient.get_vasopressor_average(
-                        feature)
-
-                # Replace underscores with spaces for display purposes
-                feature = feature.replace("_", " ")
-
-                return st_counterfactual_slider(
-                    key=f"slider_{feature}",
-                    name=feature.capitalize(),
-                    value=pat_value,
-                    min_value=stats["min"],
-                    max_value=stats["max"],
-                    step=step_size,
-                    survivors_lower=stats["survivors_lower"],
-                    survivors_upper=stats["survivors_upper"],
-                    non_survivors_lower=stats["non_survivors_lower"],
-                    non_survivors_upper=stats["non_survivors_upper"],
+                gender_scenario = st.selectbox(
+                    "Gender",
+                    gender_options,
+                    disabled=False,
+                    label_visibility="hidden",
+                    index=gender_index,
+                    key="gender_scenario",
                 )
 
-            # Counterfactual slider for numeric features grouped by categories
-            with st.expander("Demographics", expanded=True):
-                features = ["age", "weight"]
-
-                for feature in features:
-                    # Dynamically assign the slider result to a variable named '<feature>_scenario'
-                    globals()[f"{feature}_scenario"] = build_slider(feature)
+                # Store ethnicity: reset all race options then indicate the selected one
+                race_values = {f"race_{eth.lower()}": eth == ethnicity_scenario
+                               for eth in ethnicity_options}
 
-                # Update the counterfactual patient's demographics with the new age and weight values
+                # Store gender: set keys "gender_F" and "gender_M" appropriately
+                gender_values = {
+                    "gender_F": gender_scenario == "Female",
+                    "gender_M": gender_scenario == "Male",
+                }
                 st.session_state.counterfactual_patient.update_demographics({
-                    "age": age_scenario,
-                    "weight": weight_scenario
-                })
-
-            with st.expander("Clinical Features", expanded=True):
-                features = [
-                    "suspected_infection_time_poe_days",
-                    "sofa",
-                    "sirs",
-                    "mingcs",
-                    "elixhauser_hospital"
-                ]
-
-                for feature in features:
-                    # Dynamically assign the slider result to a variable named '<feature>_scenario'
-                    globals()[f"{feature}_scenario"] = build_slider(feature)
-
-                # Save 'suspected_infection_time_poe_days' into clinical_data
-                st.session_state.counterfactual_patient.update_clinical_data({
-                    "suspected_infection_time_poe_days": suspected_infection_time_poe_days_scenario
-                })
-
-                # Save the remaining scores into scores
-                st.session_state.counterfactual_patient.update_scores({
-                    "sofa": sofa_scenario,
-                    "sirs": sirs_scenario,
-                    "mingcs": mingcs_scenario,
-                    "elixhauser_hospital": elixhauser_hospital_scenario
-                })
-
-            with st.expander("Vital Signs", expanded=True):
-                features = [
-                    "heartrate",
-                    "sysbp",
-                    "diasbp",
-                    "meanbp",
-                    "resprate",
-                    "tempc",
-                    "spo2"
-                ]
-
-                for feature in features:
-                    slider_value = build_slider(feature, timeseries="vitals")
-                    globals()[f"{feature}_scenario"] = slider_value
-                    if slider_value is not None:
-                        # Update the counterfactual patient's vitals with the new values
-                        st.session_state.counterfactual_patient.update_feature_with_scaling(
-                            "vitals", feature, slider_value)
-
-            with st.expander("Urine Output", expanded=True):
-                urine_scenario = build_slider(
-                    "urineoutput", timeseries="urineoutput")
-                if urine_scenario is not None:
-                    # Update the counterfactual patient's urine output with the new value
-                    st.session_state.counterfactual_patient.update_feature_with_scaling(
-                        "urineoutput", "urineoutput", urine_scenario)
-
-            with st.expander("Vasopressor", expanded=True):
-                features = [
-                    "norepinephrine_dose",
-                    "epinephrine_dose",
-                    "dopamine_dose",
-                    "dobutamine_dose",
-                    "phenylephrine_dose",
-                    "vasopressin_dose"
-                ]
-
-                for feature in features:
-
-                    # Dynamically assign the slider result to a variable named '<feature>_scenario'
-                    slider_value = build_slider(
-                        feature, timeseries="vasopressor")
-                    globals()[f"{feature}_scenario"] = slider_value
-                    if slider_value is not None:
-                        # Update the counterfactual patient's vasopressor with the new values
-                        st.session_state.counterfactual_patient.update_feature_with_scaling(
-                            "vasopressor", feature, slider_value)
-
-            with st.expander("Laboratory Values", expanded=False):
-                # Display an editable laboratory dataframe using st.data_editor.
-                laboratory_df = st.session_state.counterfactual_patient.laboratory
-
-                edited_df = st.data_editor(
-                    laboratory_df,
-                    key="lab_editor",
-                    num_rows="dynamic"
-                )
+                    **race_values, **gender_values})
+                static_values.update(race_values)
+                static_values.update(gender_values)
+
+        with st.container(border=True):
+            # Retrieve the diagnosis dictionary from session state
+            diagnosis_dict = st.session_state.patient.diagnosis
+
+            # Get all the keys as options
+            diagnosis_options = list(diagnosis_dict.keys())
+
+            # Determine the default options (those with True or 1)
+            default_diagnoses = [key for key, value in diagnosis_dict.items() if value in [
+                True, 1]]
+
+            patient_diagnosis = st.multiselect(
+                "Diagnosis",
+                diagnosis_options,
+                default=default_diagnoses,
+                disabled=True,
+                key="diagnosis_pat",
+            )
+
+            diagnosis_scenario = st.multiselect(
+                "Diagnosis",
+                diagnosis_options,
+                default=default_diagnoses,
+                disabled=False,
+                key="diagnosis_scenario",
+                label_visibility="collapsed",
+            )
+
+            # Update the counterfactual patient dictionary with the selected diagnosis
+            updated_diagnosis = {key: (key in diagnosis_scenario)
+                                 for key in diagnosis_options}
+            st.session_state.counterfactual_patient.update_diagnosis(
+                updated_diagnosis)
+            static_values.update({f"diagnosis_{key}": value
+                                  for key, value in updated_diagnosis.items()})
+
+        with st.container(border=True):
+            # Retrieve the specimen dictionary from session state
+            specimen_dict = st.session_state.patient.specimen
+
+            # List all available specimen types
+            specimen_options = list(specimen_dict.keys())
+
+            # Determine the default selections (those with True or 1)
+            default_specimens = [key for key, value in specimen_dict.items() if value in [
+                True, 1]]
+
+            patient_specimen = st.multiselect(
+                "Specimen",
+                specimen_options,
+                default=default_specimens,
+                disabled=True,
+                key="specimen_pat",
+            )
+
+            specimen_scenario = st.multiselect(
+                "Specimen",
+                specimen_options,
+                default=default_specimens,
+                disabled=False,
+                key="specimen_scenario",
+                label_visibility="collapsed",
+            )
+
+            # Update the counterfactual patient dictionary with the selected specimen
+            updated_specimen = {key: (key in specimen_scenario)
+                                for key in specimen_options}
+            st.session_state.counterfactual_patient.update_specimen(
+                updated_specimen)
+            static_values.update({f"specimen_group_{key}": value
+                                  for key, value in updated_specimen.items()})
+
+        with st.container(border=True):
+            # Clinical data key and label of each toggle
+            toggle_features = {
+                "vent": "Vent",
+                "severe_sepsis_explicit": "Severe sepsis explicit",
+                "positiveculture_poe": "Positive culture poe",
+                "blood_culture_positive": "Blood culture positive",
+                "septic_shock_explicit": "Septic shock explicit",
+            }
+            patient_toggle_col, scenario_toggle_col = st.columns([3, 1])
+            with patient_toggle_col:
+                for feature, label in toggle_features.items():
+                    default_value = st.session_state.patient.clinical_data.get(
+                        feature, False)
+                    st.toggle(
+                        label=label,
+                        value=default_value,
+                        disabled=True,
+                        key=f"{feature}_pat",
+                    )
+            with scenario_toggle_col:
+                updated_clinical_data = {}
+                for feature, label in toggle_features.items():
+                    default_value = st.session_state.patient.clinical_data.get(
+                        feature, False)
+                    scenario_value = st.toggle(
+                        label=label,
+                        value=default_value,
+                        label_visibility="collapsed",
+                        key=f"{feature}_scenario",
+                    )
+                    updated_clinical_data[feature] = scenario_value
+
+            # Update only the toggle-based keys in counterfactual_patient without affecting numeric keys
+            st.session_state.counterfactual_patient.update_clinical_data(
+                updated_clinical_data)
+            static_values.update(updated_clinical_data)
+
+    with numeric_feat_col:
+        def build_slider(feature, timeseries=None):
+            # Obtain the statistics for the current feature
+            raw_stats = st.session_state.patient_base.get_feature_statistics(
+                feature)
+            stats = {
+                "min": float(raw_stats["min"]),
+                "max": float(raw_stats["max"]),
+                "survivors_lower": float(raw_stats["survivors_lower"]),
+                "survivors_upper": float(raw_stats["survivors_upper"]),
+                "non_survivors_lower": float(raw_stats["non_survivors_lower"]),
+                "non_survivors_upper": float(raw_stats["non_survivors_upper"]),
+            }
+
+            discrete_features = ["sofa", "sirs",
+                                 "mingcs", "elixhauser_hospital"]
+            if feature in discrete_features:
+                step_size = 1
+            else:
+                range_val = stats["max"] - stats["min"]
+                if range_val >= 20:
+                    step_size = 1
+                else:
+                    step_size = 0.1
 
-                st.session_state.counterfactual_patient.update_laboratory(
-                    edited_df
-                )
+            if not timeseries:
+                pat_value = st.session_state.patient.get_feature_value(
+                    feature)
+            elif timeseries == "vitals":
+                pat_value = st.session_state.patient.get_vital_average(
+                    feature)
+            elif timeseries == "urineoutput":
+                pat_value = st.session_state.patient.get_urineoutput_average()
+            elif timeseries == "vasopressor":
+                pat_value = st.session_state.patient.get_vasopressor_average(
+                    feature)
 
-            if st.session_state.get("counterfactual_changed_state_changed"):
-                # Reset the flag here to avoid continuously triggering a rerun:
-                st.session_state.counterfactual_changed_state_changed = False
-                st.rerun()
+            # Replace underscores with spaces for display purposes
+            display_name = feature.replace("_", " ")
+
+            slider_value = st_counterfactual_slider(
+                key=f"slider_{display_name}",
+                name=display_name.capitalize(),
+                value=pat_value,
+                min_value=stats["min"],
+                max_value=stats["max"],
+                step=step_size,
+                survivors_lower=stats["survivors_lower"],
+                survivors_upper=stats["survivors_upper"],
+                non_survivors_lower=stats["non_survivors_lower"],
+                non_survivors_upper=stats["non_survivors_upper"],
+            )
+
+            if show_sensitivity_curves:
+                # Risk of the original patient along the slider range, scored in one batch per feature
+                curves = get_counterfactual_engine().get_sensitivity_curves(
+                    {feature: (stats["min"], stats["max"])})
+                if feature in curves:
+                    values, risks = curves[feature]
+                    st.altair_chart(create_risk_sensitivity_curve(
+                        values, risks, slider_value), use_container_width=True)
+
+            return slider_value
+
+        # Counterfactual slider for numeric features grouped by categories
+        with st.expander("Demographics", expanded=True):
+            features = ["age", "weight"]
+
+            for feature in features:
+                # Dynamically assign the slider result to a variable named '<feature>_scenario'
+                globals()[f"{feature}_scenario"] = build_slider(feature)
+
+            # Update the counterfactual patient's demographics with the new age and weight values
+            st.session_state.counterfactual_patient.update_demographics({
+                "age": age_scenario,
+                "weight": weight_scenario
+            })
+            static_values.update({feature: globals()[f"{feature}_scenario"]
+                                  for feature in features if globals()[f"{feature}_scenario"] is not None})
+
+        with st.expander("Clinical Features", expanded=True):
+            features = [
+                "suspected_infection_time_poe_days",
+                "sofa",
+                "sirs",
+                "mingcs",
+                "elixhauser_hospital"
+            ]
+
+            for feature in features:
+                # Dynamically assign the slider result to a variable named '<feature>_scenario'
+                globals()[f"{feature}_scenario"] = build_slider(feature)
+
+            # Save 'suspected_infection_time_poe_days' into clinical_data
+            st.session_state.counterfactual_patient.update_clinical_data({
+                "suspected_infection_time_poe_days": suspected_infection_time_poe_days_scenario
+            })
+
+            # Save the remaining scores into scores
+            st.session_state.counterfactual_patient.update_scores({
+                "sofa": sofa_scenario,
+                "sirs": sirs_scenario,
+                "mingcs": mingcs_scenario,
+                "elixhauser_hospital": elixhauser_hospital_scenario
+            })
+            static_values.update({feature: globals()[f"{feature}_scenario"]
+                                  for feature in features if globals()[f"{feature}_scenario"] is not None})
+
+        with st.expander("Vital Signs", expanded=True):
+            features = [
+                "heartrate",
+                "sysbp",
+                "diasbp",
+                "meanbp",
+                "resprate",
+                "tempc",
+                "spo2"
+            ]
+
+            for feature in features:
+                slider_value = build_slider(feature, timeseries="vitals")
+                globals()[f"{feature}_scenario"] = slider_value
+                if slider_value is not None:
+                    # Collect the new average of the vital sign
+                    timeseries_targets[feature] = slider_value
+
+        with st.expander("Urine Output", expanded=True):
+            urine_scenario = build_slider(
+                "urineoutput", timeseries="urineoutput")
+            if urine_scenario is not None:
+                # Collect the new average of the urine output
+                timeseries_targets["urineoutput"] = urine_scenario
+
+        with st.expander("Vasopressor", expanded=True):
+            features = [
+                "norepinephrine_dose",
+                "epinephrine_dose",
+                "dopamine_dose",
+                "dobutamine_dose",
+                "phenylephrine_dose",
+                "vasopressin_dose"
+            ]
+
+            for feature in features:
+
+                # Dynamically assign the slider result to a variable named '<feature>_scenario'
+                slider_value = build_slider(
+                    feature, timeseries="vasopressor")
+                globals()[f"{feature}_scenario"] = slider_value
+                if slider_value is not None:
+                    # Collect the new average of the vasopressor
+                    timeseries_targets[feature] = slider_value
+
+        # Rescale all changed timeseries features of the counterfactual patient in one call.
+        # Sliders still at the scenario's current average are skipped: rescaling a series to its
+        # rounded average would change its hourly values without any user change.
+        counterfactual_patient = st.session_state.counterfactual_patient
+        changed_targets = {}
+        for feature, value in timeseries_targets.items():
+            current_average = counterfactual_patient.get_timeseries_average(feature)
+            if current_average is None or not math.isclose(value, current_average, abs_tol=1e-9):
+                changed_targets[feature] = value
+        counterfactual_patient.update_features_with_scaling(
+            changed_targets, st.session_state.patient_base)
+        for df in (counterfactual_patient.vitals, counterfactual_patient.urineoutput, counterfactual_patient.vasopressor):
+            timeseries_values.update({feature: df[feature]
+                                     for feature in df.columns})
+
+        with st.expander("Laboratory Values", expanded=False):
+            # Display an editable laboratory dataframe using st.data_editor.
+            laboratory_df = st.session_state.counterfactual_patient.laboratory
+
+            edited_df = st.data_editor(
+                laboratory_df,
+                key="lab_editor",
+                num_rows="dynamic"
+            )
+
+            st.session_state.counterfactual_patient.update_laboratory(
+                edited_df
+            )
+            static_values.update(CounterfactualEngine.laboratory_static_values(
+                edited_df, st.session_state.patient.laboratory))
+
+    # Apply the scenario to the what-if engine and rescore it live
+    engine = get_counterfactual_engine()
+    engine.set_static_values(static_values)
+    engine.set_timeseries_values(timeseries_values)
+    st.session_state.scenario_risk = round(engine.score(), 2)
+    st.session_state.counterfactual_patient.update_ml_data(
+        engine.get_ml_data())
+
+    with st.expander("Explain the changes of the scenario", expanded=False, icon=":material/insights:"):
+        show_scenario_explanation()
+
+    with st.expander("Saved scenarios", expanded=False, icon=":material/bookmarks:"):
+        show_scenario_workspace()
@@ -3,6 +3,7 @@ from components.risk_gauge import create_plotly_risk_gauge
 from components.patient_details import create_patient_tile
 from components.risk_group_table import render_local_group_shap_table, render_local_detail_shap_table
 from src.text_explanations_generator import generate_clinical_interpretation
+from src.job_executor import wait_for_job
 import pandas as pd
 
 
@@ -22,6 +23,12 @@ def display_explanatory_patient_prediction():
 
     with interpretation_col:
         st.markdown("#### Clinical Interpretation")
+        # The SHAP values are computed in the background; the views below are filled in once they are ready
+        predictor = st.session_state.sepsis_prediction_model
+        if not predictor.collect_local_shap_values():
+            wait_for_job(predictor.collect_local_shap_values,
+                         "Computing the explanation of the prediction...")
+            return
         clinical_interpretation = generate_clinical_interpretation(
             patient_risk=st.session_state.patient_risk,
             shap_group_contributions=st.session_state.shap_group_contributions
@@ -5,6 +5,7 @@ from subpages.other_patients_comparison import show_other_patients_comparison
 from subpages.counterfactuals_xui import show_counterfactual
 from subpages.feature_importance_local import show_feature_importance_local
 from subpages.feature_importance_global import show_feature_importance_global
+from src.job_executor import wait_for_job
 import datetime
 import random
 
@@ -47,28 +48,10 @@ def display_exploratory_patient_prediction():
                     unsafe_allow_html=True,
                 )
 
-                # Generate the risk calculation button
-                if st.button("Calculate Risk", key="calculate_risk_button", type="primary", disabled=st.session_state.counterfactual_data_changed == False):
-                    st.session_state.counterfactual_data_changed = False
-                    st.session_state.counterfactual_patient.convert_to_ml_data()
-                    risk_array = st.session_state.sepsis_prediction_model.predict_sepsis_mortality_risk(
-                        counterfactual_patient=True)
-                    st.session_state.scenario_risk = round(risk_array[0, 0], 2)
-                    st.rerun()
-
-                else:
-                    pass
-
     with scenario_risk_col:
-        if st.session_state.exploratory_view == 3:
-            # Generate the risk score gauge
-            scenario_risk_fig = create_plotly_risk_gauge(
-                (st.session_state.scenario_risk))
-            st.markdown("#### Scenario Risk")
-            st.plotly_chart(scenario_risk_fig,
-                            use_container_width=True, key="scenario_risk_gauge")
-        else:
-            pass
+        # The scenario risk is computed live by the What-if Analysis below,
+        # so the gauge is filled in after the view has been rendered
+        scenario_risk_placeholder = st.empty()
 
     with st.container(border=False):
         def change_exploratory_view(view):
@@ -152,6 +135,13 @@ def display_exploratory_patient_prediction():
                 )
 
     with st.container(border=True):
+        # Views 1 and 4 show the SHAP values, which are computed in the background
+        predictor = st.session_state.sepsis_prediction_model
+        if st.session_state.exploratory_view in (1, 4) and not predictor.collect_local_shap_values():
+            wait_for_job(predictor.collect_local_shap_values,
+                         "Computing the explanation of the prediction...")
+            return
+
         match st.session_state.exploratory_view:
             case 1:
                 show_feature_importance_local()
@@ -163,3 +153,12 @@ def display_exploratory_patient_prediction():
                 show_other_patients_comparison()
             case _:
                 pass
+
+    if st.session_state.exploratory_view == 3:
+        with scenario_risk_placeholder.container():
+            # Generate the risk score gauge
+            scenario_risk_fig = create_plotly_risk_gauge(
+                (st.session_state.scenario_risk))
+            st.markdown("#### Scenario Risk")
+            st.plotly_chart(scenario_risk_fig,
+                            use_container_width=True, key="scenario_risk_gauge")
@@ -31,6 +31,6 @@ def show_other_patients_comparison():
             unsafe_allow_html=True
         )
 
-    parallel_feature_plot = create_parallel_feature_plot()
-    st.altair_chart(parallel_feature_plot,
-                    use_container_width=True)
+    parallel_feature_plot_spec = create_parallel_feature_plot()
+    st.vega_lite_chart(parallel_feature_plot_spec,
+                       use_container_width=True)
@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from components.trend_graph import generate_trend_graph
+from components.trend_graph import get_trend_graph_spec
 from components.patient_details import create_patient_tile
 
 
@@ -325,5 +325,19 @@ def display_patient_data():
                 st.write("No laboratory data available.")
 
     with trends_col:
-        trends_chart = generate_trend_graph()
-        st.altair_chart(trends_chart, use_container_width=True)
+        st.markdown("#### Trends")
+        # The per-hour risk attribution is offered once the patient's SHAP values are available,
+        # but not in the study's patient data phase, which evaluates the data without the model.
+        hourly_attribution = None
+        predictor = st.session_state.sepsis_prediction_model
+        if (not st.session_state.patient_data_tab_evaluation_running
+                and predictor.is_ready() and predictor.collect_local_shap_values()):
+            if st.toggle("Show risk attribution per hour", key="trend_attribution",
+                         help="Colors each hour of the timeseries parameters by its SHAP value: "
+                              "red hours increased the mortality risk, blue hours decreased it."):
+                hourly_attribution = pd.DataFrame(
+                    st.session_state.shap_values['timeseries'],
+                    columns=st.session_state.timeseries_feature_names)
+        trends_spec = get_trend_graph_spec(
+            hourly_attribution, attribution_version=st.session_state.shap_values_version)
+        st.vega_lite_chart(trends_spec, use_container_width=True)
@@ -387,7 +387,8 @@ def show_training():
                     st.session_state.patient_risk = 0.0
                     st.session_state.scenario_risk = 0.0
                     st.session_state.counterfactual_patient = None
-                    st.session_state.counterfactual_data_changed = False
+                    st.session_state.counterfactual_engine = None
+                    st.session_state.scenario_store = None
                     st.session_state.current_patient_index = 0
                     st.session_state.exploratory_view = None
                     st.session_state.exploratory_view_start_time = None
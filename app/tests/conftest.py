@@ -0,0 +1,45 @@
+import os
+import sys
+import pytest
+
+# The app imports its modules relative to the app directory (e.g. "from src.data_loader import ...").
+APP_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+
+def load_feature_names(file_name):
+    """Reads the feature names from the header of a feature mapping CSV in the data directory."""
+    import pandas as pd
+    return list(pd.read_csv(os.path.join(APP_DIR, "data", file_name), index_col=0, nrows=0).columns)
+
+
+@pytest.fixture(scope="session")
+def predictor():
+    # The NumPy backend scores the scenarios without TensorFlow.
+    from src.sepsis_mortality_risk_predictor import SepsisMortalityRiskPredictor
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(SepsisMortalityRiskPredictor, "INFERENCE_BACKEND", "numpy")
+        yield SepsisMortalityRiskPredictor()
+
+
+@pytest.fixture(scope="session")
+def feature_names():
+    return (load_feature_names("feature_mapping_static.csv"),
+            load_feature_names("feature_mapping_timeseries.csv"))
+
+
+@pytest.fixture(scope="session")
+def patient_store():
+    from src.patient_store import PatientStore
+    return PatientStore.from_csv(os.path.join(APP_DIR, "data", "patient_raw_data.csv"))
+
+
+@pytest.fixture(scope="session")
+def patient_base():
+    import pandas as pd
+    from src.patient_base import PatientBase
+    patient_base = PatientBase()
+    patient_base.set_dataframe(pd.read_csv(
+        os.path.join(APP_DIR, "data", "patient_base_statistics.csv"), index_col=0))
+    return patient_base
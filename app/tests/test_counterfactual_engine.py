@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from src.counterfactual_engine import CounterfactualEngine
+from src.patient_store import CounterfactualPatient
+
+
+@pytest.fixture(scope="module")
+def patient(patient_store):
+    return patient_store.build_compact_patient(0)
+
+
+def test_laboratory_static_values_marks_removed_labs_missing(patient):
+    original = patient.laboratory
+    removed_lab = original.index[0]
+    edited = original.drop(index=removed_lab)
+
+    values = CounterfactualEngine.laboratory_static_values(edited, original)
+
+    for statistic in original.columns:
+        assert np.isnan(values[f"{removed_lab}_{statistic}"])
+    kept_lab = original.index[1]
+    assert values[f"{kept_lab}_{original.columns[0]}"] == edited.loc[kept_lab, original.columns[0]]
+
+
+def test_engine_matches_patient_after_removing_a_lab(predictor, feature_names, patient):
+    static_feature_names, timeseries_feature_names = feature_names
+    engine = CounterfactualEngine(predictor, patient, static_feature_names, timeseries_feature_names)
+    counterfactual = CounterfactualPatient(patient)
+
+    original = patient.laboratory
+    # Remove a lab that is a model input, so the risk depends on it.
+    removed_lab = next(lab for lab in original.index
+                       if engine.static_lookup.keys() & {f"{lab}_{statistic}" for statistic in original.columns})
+    edited = original.drop(index=removed_lab)
+    counterfactual.update_laboratory(edited)
+    engine.set_static_values(CounterfactualEngine.laboratory_static_values(edited, original))
+
+    static_raw, timeseries_raw = counterfactual.get_raw_ml_arrays(
+        static_feature_names, timeseries_feature_names)
+    static, timeseries = predictor.scale_raw_arrays(
+        static_raw, timeseries_raw, static_feature_names, timeseries_feature_names)
+    np.testing.assert_array_equal(engine.static, static)
+    assert engine.score() == pytest.approx(float(predictor.predict_batch(static, timeseries)[0]), abs=1e-6)
+
+
+@pytest.mark.parametrize("row_index", range(7))
+def test_untouched_scenario_keeps_the_patient_risk(predictor, feature_names, patient_store, row_index):
+    static_feature_names, timeseries_feature_names = feature_names
+    patient = patient_store.build_compact_patient(row_index)
+    engine = CounterfactualEngine(predictor, patient, static_feature_names, timeseries_feature_names)
+    counterfactual = CounterfactualPatient(patient)
+
+    # What the What-if page applies on a render without any user change.
+    engine.set_static_values({feature: patient.get_feature_value(feature) for feature in static_feature_names})
+    engine.set_static_values(CounterfactualEngine.laboratory_static_values(
+        counterfactual.laboratory, patient.laboratory))
+    engine.set_timeseries_values({feature: values for df in (
+        counterfactual.vitals, counterfactual.urineoutput, counterfactual.vasopressor)
+        for feature, values in df.items()})
+
+    assert not engine.has_changes()
+    assert engine.score() == engine.original_risk
+
+
+def test_shap_values_are_computed_from_a_snapshot_of_the_inputs(predictor, feature_names, patient, monkeypatch):
+    static_feature_names, timeseries_feature_names = feature_names
+    engine = CounterfactualEngine(predictor, patient, static_feature_names, timeseries_feature_names)
+    explained = []
+
+    def compute_shap_values_batch(static_data, timeseries_data, explainer=None):
+        explained.append((static_data.copy(), explainer))
+        return static_data * 100, timeseries_data * 100
+
+    monkeypatch.setattr(predictor, "compute_shap_values_batch", compute_shap_values_batch)
+    engine.set_static_values({"age": 90})
+    inputs = engine.get_unexplained_inputs()
+    scenario_static = engine.static.copy()
+    # The scenario changes while its SHAP job would still be running.
+    engine.set_static_values({"age": 30})
+    shap_values = engine.compute_shap_values(inputs, explainer="explainer")
+
+    assert len(inputs) == 2 and len(explained) == 1
+    np.testing.assert_array_equal(explained[0][0][1], scenario_static[0])
+    assert explained[0][1] == "explainer"
+    assert engine.get_shap_values() is None
+
+    engine.set_static_values({"age": 90})
+    engine.shap_cache.update(shap_values)
+    assert engine.get_shap_values()["age"] == pytest.approx(scenario_static[0, engine.static_lookup["age"]] * 100)
+    assert engine.get_shap_values(original=True) is not None
+    assert engine.get_unexplained_inputs() == {}
@@ -0,0 +1,73 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import APP_DIR
+from src.counterfactual_engine import CounterfactualEngine
+from src.counterfactual_search import search_counterfactual
+
+SEARCH_FEATURES = ["age", "weight", "sofa", "sirs", "mingcs", "heartrate", "sysbp",
+                   "meanbp", "resprate", "urineoutput", "norepinephrine_dose"]
+
+
+@pytest.fixture(scope="module")
+def bounds():
+    """(min, max) per search feature from the PatientBase statistics, like the What-if page."""
+    statistics = pd.read_csv(os.path.join(APP_DIR, "data", "patient_base_statistics.csv"), index_col=0)
+    return {feature: (statistics.at["min", feature], statistics.at["max", feature])
+            for feature in SEARCH_FEATURES}
+
+
+def build_engine(predictor, feature_names, patient_store, row_index):
+    static_feature_names, timeseries_feature_names = feature_names
+    return CounterfactualEngine(predictor, patient_store.build_compact_patient(row_index),
+                                static_feature_names, timeseries_feature_names)
+
+
+def replay_risk(engine, bounds, changes):
+    """Scores the original patient with the given changes applied, independent of the search state."""
+    static = engine.original_static.copy()
+    timeseries = engine.original_timeseries.copy()
+    for change in changes:
+        lower, upper = bounds[change["feature"]]
+        input_type, index, scaled_values = engine.get_sweep_column(
+            change["feature"], np.array([change["value"]]), float(lower), float(upper))
+        if input_type == "static":
+            static[0, index] = scaled_values[0]
+        else:
+            timeseries[0, :, index] = scaled_values[0]
+    return float(engine.predictor.predict_batch(static, timeseries)[0])
+
+
+@pytest.mark.parametrize("row_index", [0, 4])
+def test_search_reaches_target_with_minimal_changes(predictor, feature_names, patient_store, bounds, row_index):
+    engine = build_engine(predictor, feature_names, patient_store, row_index)
+    target_risk = engine.original_risk / 2
+
+    result = search_counterfactual(engine, bounds, target_risk)
+
+    assert result["target_reached"]
+    assert result["risk"] < target_risk
+    assert result["original_risk"] == engine.original_risk
+    features = [change["feature"] for change in result["changes"]]
+    assert 0 < len(features) == len(set(features))
+    for change in result["changes"]:
+        lower, upper = bounds[change["feature"]]
+        assert lower <= change["value"] <= upper
+    # The reported risk is the risk of the returned changes.
+    assert replay_risk(engine, bounds, result["changes"]) == pytest.approx(result["risk"], abs=1e-6)
+    # None of the returned changes can be dropped without losing the target.
+    for i in range(len(result["changes"])):
+        remaining = result["changes"][:i] + result["changes"][i + 1:]
+        assert replay_risk(engine, bounds, remaining) >= target_risk
+
+
+def test_search_returns_best_effort_for_unreachable_target(predictor, feature_names, patient_store, bounds):
+    engine = build_engine(predictor, feature_names, patient_store, 0)
+
+    result = search_counterfactual(engine, bounds, target_risk=0.0, max_changes=2)
+
+    assert not result["target_reached"]
+    assert len(result["changes"]) <= 2
+    assert result["risk"] <= engine.original_risk
+    assert replay_risk(engine, bounds, result["changes"]) == pytest.approx(result["risk"], abs=1e-6)
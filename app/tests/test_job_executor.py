@@ -0,0 +1,50 @@
+import threading
+import pytest
+from src.job_executor import JobExecutor
+
+
+def test_uncollected_jobs_expire():
+    executor = JobExecutor(max_workers=1, result_ttl=0)
+    executor.submit(("session", 1, "job"), lambda: 1).result()
+    assert executor.has_job(("session", 1, "job"))
+
+    # Submitting any job evicts the finished jobs older than the TTL.
+    executor.submit(("session", 2, "job"), lambda: 2).result()
+
+    assert not executor.has_job(("session", 1, "job"))
+    assert executor.finished_at.keys() <= executor.futures.keys()
+
+
+def test_pending_jobs_do_not_expire():
+    executor = JobExecutor(max_workers=2, result_ttl=0)
+    release = threading.Event()
+    pending = executor.submit(("session", 1, "job"), release.wait)
+
+    executor.submit(("session", 2, "job"), lambda: 2).result()
+    executor.submit(("session", 3, "job"), lambda: 3)
+
+    assert executor.has_job(("session", 1, "job"))
+    release.set()
+    assert pending.result() is True
+
+
+def test_collected_result_is_forgotten():
+    executor = JobExecutor(max_workers=1)
+    executor.submit(("session", 1, "job"), lambda: 1).result()
+
+    assert executor.pop_result(("session", 1, "job")) == 1
+    assert not executor.has_job(("session", 1, "job"))
+    assert not executor.finished_at
+    with pytest.raises(KeyError):
+        executor.pop_result(("session", 1, "job"))
+
+
+def test_discard_session_keeps_other_sessions_and_the_kept_patient():
+    executor = JobExecutor(max_workers=1)
+    keys = [("a", 1, "job"), ("a", 2, "job"), ("b", 1, "job")]
+    for key in keys:
+        executor.submit(key, lambda: None).result()
+
+    executor.discard_session("a", keep_patient_id=2)
+
+    assert [executor.has_job(key) for key in keys] == [False, True, True]
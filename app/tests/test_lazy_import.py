@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+import pytest
+from conftest import APP_DIR
+from src.job_executor import JOB_WORKERS
+from src.lazy_import import LazyModule
+
+# Modules imported by the pages; none of them may import the ML stack at import time.
+APP_MODULES = ["src.sepsis_mortality_risk_predictor", "src.counterfactual_engine",
+               "src.counterfactual_search", "src.patient_store", "src.job_executor"]
+
+
+def test_app_modules_do_not_import_tensorflow_or_shap():
+    # A fresh interpreter, as the test session itself may have imported TensorFlow already.
+    code = (f"import sys\nimport {', '.join(APP_MODULES)}\n"
+            "print(sorted({'tensorflow', 'keras', 'shap'} & sys.modules.keys()))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_lazy_module_imports_on_first_attribute_access():
+    module = LazyModule("json")
+    assert module._module is None
+
+    assert module.dumps([1]) == "[1]"
+    assert module._module is sys.modules["json"]
+
+
+def test_on_load_runs_once_before_the_module_is_used():
+    loaded = []
+    module = LazyModule("json", on_load=loaded.append)
+
+    module.dumps([1])
+    module.loads("[1]")
+
+    assert loaded == [sys.modules["json"]]
+
+
+def test_tensorflow_thread_pools_are_sized_for_the_job_workers():
+    pytest.importorskip("tensorflow")
+    code = ("from src.sepsis_mortality_risk_predictor import tf\n"
+            "threading = tf.config.threading\n"
+            "print(threading.get_intra_op_parallelism_threads(), threading.get_inter_op_parallelism_threads())")
+    result = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR,
+                            capture_output=True, text=True, check=True)
+    intra_op, inter_op = map(int, result.stdout.strip().splitlines()[-1].split())
+    assert intra_op == max(1, (os.cpu_count() or 1) // JOB_WORKERS)
+    assert inter_op == JOB_WORKERS
@@ -0,0 +1,44 @@
+import os
+import numpy as np
+import pytest
+from conftest import APP_DIR
+from src.numpy_inference import NumpyInferenceModel, sigmoid
+
+MODEL_PATH = os.path.join(APP_DIR, "models", "sepsis_mortality_model.keras")
+
+
+def test_sigmoid_is_stable_for_large_inputs():
+    x = np.array([-1000, -100, -20, 0, 20, 100, 1000], dtype=np.float32)
+
+    with np.errstate(over="raise"):
+        values = sigmoid(x)
+
+    assert values.dtype == np.float32
+    np.testing.assert_allclose(values, [0, 0, 2.0611537e-09, 0.5, 1, 1, 1], rtol=1e-6, atol=1e-30)
+    moderate = np.linspace(-30, 30, 601)
+    np.testing.assert_allclose(sigmoid(moderate), 1 / (1 + np.exp(-moderate)), rtol=1e-12)
+
+
+@pytest.fixture(scope="module")
+def keras_model():
+    tf = pytest.importorskip("tensorflow")
+    return tf.keras.models.load_model(MODEL_PATH)
+
+
+@pytest.mark.parametrize("input_scale", [1, 20])
+def test_forward_pass_matches_keras(keras_model, input_scale):
+    numpy_model = NumpyInferenceModel.from_keras_archive(MODEL_PATH)
+    static_shape, timeseries_shape = (tuple(model_input.shape)[1:]
+                                      for model_input in keras_model.inputs)
+
+    # MinMax scaled inputs lie in [0, 1] and missing values are filled with -1; the larger
+    # scale drives the gates into saturation.
+    rng = np.random.default_rng(0)
+    static_data = (rng.uniform(-1, 1, (512,) + static_shape) * input_scale).astype(np.float32)
+    timeseries_data = (rng.uniform(-1, 1, (512,) + timeseries_shape) * input_scale).astype(np.float32)
+
+    keras_risks = keras_model([static_data, timeseries_data], training=False).numpy()
+    numpy_risks = numpy_model(static_data, timeseries_data)
+
+    assert numpy_risks.shape == keras_risks.shape
+    np.testing.assert_allclose(numpy_risks, keras_risks, rtol=0, atol=1e-5)
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from src.patient_data_model import rescale_timeseries_values, scale_to_target_mean, solve_scale_for_target_mean
+
+
+def bisection_scale(values, target_mean, lower_bound, upper_bound, tol=1e-4, max_iter=100):
+    """Reference: the binary search over the scale factor that the closed-form solver replaced."""
+    def clipped_avg(scale_factor):
+        return np.nanmean(np.clip(values * scale_factor, lower_bound, upper_bound))
+
+    low = 0.0
+    high = max(target_mean / np.nanmean(values) * 10, 10)
+    scale = 1.0
+    for _ in range(max_iter):
+        mid = (low + high) / 2
+        avg_mid = clipped_avg(mid)
+        if abs(avg_mid - target_mean) < tol:
+            return mid
+        if avg_mid < target_mean:
+            low = mid
+        else:
+            high = mid
+        scale = mid
+    return scale
+
+
+def draw_rows(rng, n_rows, n_hours=24, nan_share=0.1):
+    """Random positive hourly series with bounds around them and targets inside and outside the bounds."""
+    values = rng.uniform(0, 200, (n_rows, n_hours))
+    values[rng.random(values.shape) < nan_share] = np.nan
+    lower = rng.uniform(0, 50, n_rows)
+    upper = lower + rng.uniform(10, 250, n_rows)
+    targets = rng.uniform(lower - 20, upper + 20)
+    return values, targets, lower, upper
+
+
+def clipped_mean(values, scale, lower, upper):
+    return np.nanmean(np.clip(values * scale, lower, upper))
+
+
+def test_closed_form_scale_matches_bisection():
+    values, targets, lower, upper = draw_rows(np.random.default_rng(0), 500)
+
+    scales = solve_scale_for_target_mean(values, targets, lower, upper)
+
+    for row in range(len(values)):
+        reference = bisection_scale(values[row], targets[row], lower[row], upper[row])
+        assert clipped_mean(values[row], scales[row], lower[row], upper[row]) == pytest.approx(
+            clipped_mean(values[row], reference, lower[row], upper[row]), abs=1e-4)
+
+
+def test_reachable_targets_are_hit_exactly():
+    rng = np.random.default_rng(1)
+    values, _, lower, upper = draw_rows(rng, 200)
+    # Targets that some scale inside the search range reaches.
+    targets = np.array([clipped_mean(row, scale, row_lower, row_upper) for row, scale, row_lower, row_upper
+                        in zip(values, rng.uniform(0, 5, len(values)), lower, upper)])
+
+    new_values = scale_to_target_mean(values, targets, lower, upper)
+
+    np.testing.assert_allclose(np.nanmean(new_values, axis=1), targets, atol=1e-9)
+    assert (np.isnan(new_values) == np.isnan(values)).all()
+
+
+def test_vectorized_rows_match_single_rows():
+    values, targets, lower, upper = draw_rows(np.random.default_rng(2), 20)
+
+    scales = solve_scale_for_target_mean(values, targets, lower, upper)
+
+    for row in range(len(values)):
+        assert solve_scale_for_target_mean(values[row], targets[row], lower[row], upper[row]) == scales[row]
+
+
+def test_rescale_timeseries_values_special_cases():
+    # Vasopressors without any dose are set to the target in every hour.
+    np.testing.assert_array_equal(
+        rescale_timeseries_values("vasopressor", "norepinephrine_dose", np.zeros(24), 0.125, 0, 2),
+        np.full(24, 0.12))
+    # Other features with a zero average cannot be scaled.
+    assert rescale_timeseries_values("vitals", "heartrate", np.zeros(24), 80, 0, 300) is None
+    # tempc keeps one decimal, other vitals are rounded to integers.
+    tempc = rescale_timeseries_values("vitals", "tempc", np.full(24, 37.0), 38.15, 30, 45)
+    np.testing.assert_array_equal(tempc, np.round(tempc, 1))
+    heartrate = rescale_timeseries_values("vitals", "heartrate", np.linspace(60, 90, 24), 100, 0, 300)
+    np.testing.assert_array_equal(heartrate, np.round(heartrate))
@@ -0,0 +1,127 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import APP_DIR
+from src.patient_store import CounterfactualPatient, PatientStore, get_cache_dir
+
+RAW_DATA_PATH = os.path.join(APP_DIR, "data", "patient_raw_data.csv")
+
+
+@pytest.fixture
+def raw_data_path(tmp_path):
+    """Copy of the raw patient data CSV, so the tests write their caches into tmp_path."""
+    path = tmp_path / "patient_raw_data.csv"
+    shutil.copy(RAW_DATA_PATH, path)
+    return str(path)
+
+
+def assert_stores_equal(store, expected):
+    assert store.static_index == expected.static_index
+    assert store.lab_names == expected.lab_names
+    assert store.static_blocks.keys() == expected.static_blocks.keys()
+    for kind, block in expected.static_blocks.items():
+        np.testing.assert_array_equal(store.static_blocks[kind], block)
+    np.testing.assert_array_equal(store.timeseries, expected.timeseries)
+    np.testing.assert_array_equal(store.laboratory, expected.laboratory)
+    for row_index in range(len(expected)):
+        assert repr(store.build_patient(row_index).to_dict()) == repr(
+            expected.build_patient(row_index).to_dict())
+
+
+def test_cached_store_matches_csv(raw_data_path):
+    parsed = PatientStore.from_csv(raw_data_path)
+
+    written = PatientStore.from_csv_cached(raw_data_path)
+    assert os.path.exists(os.path.join(get_cache_dir(raw_data_path), "manifest.json"))
+    loaded = PatientStore.from_csv_cached(raw_data_path)
+
+    assert isinstance(loaded.timeseries, np.memmap)
+    assert_stores_equal(written, parsed)
+    assert_stores_equal(loaded, parsed)
+
+
+def test_cache_is_rebuilt_when_csv_changes(raw_data_path):
+    PatientStore.from_csv_cached(raw_data_path)
+    df = pd.read_csv(raw_data_path)
+    df.iloc[:-1].to_csv(raw_data_path, index=False)
+
+    store = PatientStore.from_csv_cached(raw_data_path)
+
+    assert len(store) == len(df) - 1
+    assert_stores_equal(store, PatientStore.from_csv(raw_data_path))
+
+
+def test_cache_is_reused_when_csv_is_only_touched(raw_data_path):
+    PatientStore.from_csv_cached(raw_data_path)
+    stat = os.stat(raw_data_path)
+    os.utime(raw_data_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    store = PatientStore.from_csv_cached(raw_data_path)
+
+    assert isinstance(store.timeseries, np.memmap)
+    assert_stores_equal(store, PatientStore.from_csv(raw_data_path))
+
+
+def test_rebuild_does_not_change_mapped_blocks(raw_data_path):
+    mapped = PatientStore.from_csv_cached(raw_data_path)
+    mapped = PatientStore.from_csv_cached(raw_data_path)
+    timeseries_before = np.array(mapped.timeseries)
+
+    df = pd.read_csv(raw_data_path)
+    df.iloc[:2].to_csv(raw_data_path, index=False)
+    PatientStore.from_csv_cached(raw_data_path)
+
+    # The blocks were replaced by new files; the mapped ones still hold the previous data.
+    np.testing.assert_array_equal(mapped.timeseries, timeseries_before)
+    assert not any(name.endswith(".tmp")
+                   for name in os.listdir(get_cache_dir(raw_data_path)))
+
+
+def test_compact_patient_matches_patient():
+    store = PatientStore.from_csv(RAW_DATA_PATH)
+    for row_index in range(len(store)):
+        assert repr(store.build_compact_patient(row_index).to_dict()) == repr(
+            store.build_patient(row_index).to_dict())
+
+
+def test_compact_patient_scaling_matches_patient(patient_base):
+    store = PatientStore.from_csv(RAW_DATA_PATH)
+    targets = {"heartrate": 110, "tempc": 38.4, "urineoutput": 60, "norepinephrine_dose": 0.2}
+
+    patient = store.build_patient(0)
+    patient.update_features_with_scaling(targets, patient_base)
+    compact = CounterfactualPatient(store.build_compact_patient(0))
+    compact.update_features_with_scaling(targets, patient_base)
+
+    for data_type in ("vitals", "urineoutput", "vasopressor"):
+        pd.testing.assert_frame_equal(getattr(compact, data_type), getattr(patient, data_type),
+                                      check_dtype=False)
+    assert {change["feature"] for change in compact.diff()} == targets.keys()
+
+
+@pytest.mark.parametrize("row_index", range(7))
+def test_rescaling_to_current_averages_is_not_a_change(patient_base, row_index):
+    store = PatientStore.from_csv(RAW_DATA_PATH)
+    counterfactual = CounterfactualPatient(store.build_compact_patient(row_index))
+    features = ["heartrate", "tempc", "urineoutput", "norepinephrine_dose"]
+
+    counterfactual.update_features_with_scaling(
+        {feature: counterfactual.get_timeseries_average(feature) for feature in features}, patient_base)
+    counterfactual.update_demographics({"age": counterfactual.demographics["age"]})
+
+    assert counterfactual.diff() == []
+    assert counterfactual.timeseries is counterfactual.base.timeseries
+
+
+def test_rescaling_back_to_the_original_average_restores_the_series(patient_base):
+    store = PatientStore.from_csv(RAW_DATA_PATH)
+    counterfactual = CounterfactualPatient(store.build_compact_patient(0))
+    original_average = counterfactual.get_timeseries_average("heartrate")
+
+    counterfactual.update_features_with_scaling({"heartrate": original_average + 20}, patient_base)
+    assert [change["feature"] for change in counterfactual.diff()] == ["heartrate"]
+    counterfactual.update_features_with_scaling({"heartrate": original_average}, patient_base)
+
+    assert counterfactual.diff() == []
@@ -0,0 +1,96 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from conftest import APP_DIR, load_feature_names
+from src.scaling import AffineScalingKernel
+
+N_HOURS = 24
+
+
+def load_scaler(file_name):
+    with open(os.path.join(APP_DIR, "models", file_name), "rb") as f:
+        return pickle.load(f)
+
+
+def draw_raw_batch(rng, scaler, n_rows, nan_share=0.1):
+    """Random raw values around the range the scaler was fitted on, with missing values."""
+    if hasattr(scaler, "data_min_"):
+        low, high = scaler.data_min_, scaler.data_max_
+    else:
+        low, high = scaler.mean_ - 3 * scaler.scale_, scaler.mean_ + 3 * scaler.scale_
+    span = high - low
+    values = rng.uniform(low - 0.2 * span, high + 0.2 * span, (n_rows, len(low)))
+    values[rng.random(values.shape) < nan_share] = np.nan
+    return values
+
+
+def sklearn_transform(scaler, values):
+    """The sklearn reference: transform by column name and fill missing values with -1."""
+    scaled = scaler.transform(pd.DataFrame(values, columns=scaler.feature_names_in_))
+    return np.nan_to_num(scaled, nan=-1)
+
+
+def assert_kernel_matches_scalers(static_scaler, timeseries_scaler, static_feature_names,
+                                  timeseries_feature_names, n_rows=64, random_state=0):
+    rng = np.random.default_rng(random_state)
+    kernel = AffineScalingKernel.from_scalers(
+        static_scaler, timeseries_scaler, static_feature_names, timeseries_feature_names)
+    n_static, n_channels = len(static_feature_names), len(timeseries_feature_names)
+
+    # Raw inputs in model order; the features the scalers do not cover are binary.
+    static_raw = rng.integers(0, 2, (n_rows, n_static)).astype(np.float64)
+    static_raw[:, kernel.static_positions] = draw_raw_batch(rng, static_scaler, n_rows)
+    timeseries_raw = rng.integers(0, 2, (n_rows, N_HOURS * n_channels)).astype(np.float64)
+    timeseries_raw[:, kernel.timeseries_positions] = draw_raw_batch(rng, timeseries_scaler, n_rows)
+    # The kernel scales float32 inputs, as the model receives them.
+    static_raw = static_raw.astype(np.float32)
+    timeseries_raw = timeseries_raw.astype(np.float32)
+
+    static, timeseries = kernel.transform(
+        static_raw, timeseries_raw.reshape(n_rows, N_HOURS, n_channels))
+    assert static.dtype == np.float32 and timeseries.dtype == np.float32
+    timeseries = timeseries.reshape(n_rows, -1)
+
+    np.testing.assert_allclose(
+        static[:, kernel.static_positions],
+        sklearn_transform(static_scaler, static_raw[:, kernel.static_positions]), atol=1e-5)
+    np.testing.assert_allclose(
+        timeseries[:, kernel.timeseries_positions],
+        sklearn_transform(timeseries_scaler, timeseries_raw[:, kernel.timeseries_positions]), atol=1e-5)
+
+    # Unscaled features are passed through.
+    unscaled_static = np.setdiff1d(np.arange(n_static), kernel.static_positions)
+    np.testing.assert_array_equal(static[:, unscaled_static], static_raw[:, unscaled_static])
+
+
+def test_kernel_matches_fitted_scalers():
+    assert_kernel_matches_scalers(
+        load_scaler("scaler_static.pkl"), load_scaler("scaler_timeseries.pkl"),
+        load_feature_names("feature_mapping_static.csv"),
+        load_feature_names("feature_mapping_timeseries.csv"))
+
+
+@pytest.mark.parametrize("make_scaler", [
+    lambda: MinMaxScaler(),
+    lambda: MinMaxScaler(feature_range=(-1, 1), clip=True),
+    lambda: StandardScaler(),
+    lambda: StandardScaler(with_mean=False),
+])
+def test_kernel_matches_scaler_types(make_scaler):
+    rng = np.random.default_rng(1)
+    static_feature_names = ["age", "weight", "vent", "sofa"]
+    timeseries_feature_names = ["heartrate", "spo2"]
+    static_columns = ["sofa", "age", "weight"]
+    timeseries_columns = [f"{feature}_{hour}" for feature in timeseries_feature_names
+                          for hour in range(N_HOURS)]
+
+    static_scaler = make_scaler().fit(pd.DataFrame(
+        rng.normal(50, 20, (200, len(static_columns))), columns=static_columns))
+    timeseries_scaler = make_scaler().fit(pd.DataFrame(
+        rng.normal(90, 10, (200, len(timeseries_columns))), columns=timeseries_columns))
+
+    assert_kernel_matches_scalers(static_scaler, timeseries_scaler,
+                                  static_feature_names, timeseries_feature_names)
@@ -0,0 +1,111 @@
+import pytest
+from src.patient_store import CounterfactualPatient
+from src.scenario_store import ScenarioStore
+
+
+class CountingPredictor:
+    """Scores with the real predictor and records the size of each batch."""
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+        self.batches = []
+
+    def predict_batch(self, static_data, timeseries_data):
+        self.batches.append(len(static_data))
+        return self.predictor.predict_batch(static_data, timeseries_data)
+
+
+@pytest.fixture
+def counting_predictor(predictor):
+    return CountingPredictor(predictor)
+
+
+@pytest.fixture
+def patient(patient_store):
+    return patient_store.build_compact_patient(0)
+
+
+def get_ml_data(predictor, feature_names, counterfactual):
+    static_feature_names, timeseries_feature_names = feature_names
+    static, timeseries = predictor.scale_raw_arrays(
+        *counterfactual.get_raw_ml_arrays(static_feature_names, timeseries_feature_names),
+        static_feature_names, timeseries_feature_names)
+    return {"static": static, "timeseries": timeseries}
+
+
+def save_scenario(store, name, counterfactual, predictor, feature_names):
+    return store.save(name, counterfactual.get_delta(),
+                      get_ml_data(predictor, feature_names, counterfactual))
+
+
+def test_dirty_scenarios_are_scored_in_one_batch(counting_predictor, predictor, feature_names,
+                                                 patient, patient_base):
+    store = ScenarioStore(counting_predictor, patient.patient_id, feature_names[1])
+    counterfactual = CounterfactualPatient(patient)
+    untouched = save_scenario(store, "Untouched", counterfactual, predictor, feature_names)
+    counterfactual.update_features_with_scaling(
+        {"heartrate": counterfactual.get_timeseries_average("heartrate") + 30}, patient_base)
+    tachycardia = save_scenario(store, "Tachycardia", counterfactual, predictor, feature_names)
+
+    assert store.get_dirty() == [untouched, tachycardia]
+    assert store.score_dirty() == 2
+    assert counting_predictor.batches == [2]
+    assert store.get_dirty() == []
+    assert store.score_dirty() == 0
+    assert counting_predictor.batches == [2]
+    assert untouched.risk != tachycardia.risk
+
+
+def test_resaving_keeps_the_risk_unless_the_inputs_change(counting_predictor, predictor, feature_names,
+                                                          patient):
+    store = ScenarioStore(counting_predictor, patient.patient_id, feature_names[1])
+    counterfactual = CounterfactualPatient(patient)
+    scenario = save_scenario(store, "Scenario", counterfactual, predictor, feature_names)
+    store.score_dirty()
+    risk = scenario.risk
+
+    # A render without changes saves the same inputs again.
+    counterfactual.update_demographics({"age": counterfactual.demographics["age"]})
+    assert save_scenario(store, "Scenario", counterfactual, predictor, feature_names) is scenario
+    assert not scenario.dirty and scenario.risk == risk
+
+    counterfactual.update_demographics({"age": counterfactual.demographics["age"] + 10})
+    save_scenario(store, "Scenario", counterfactual, predictor, feature_names)
+    assert scenario.dirty and scenario.risk is None
+    assert len(store.scenarios) == 1
+
+
+def test_delete_removes_the_scenario(counting_predictor, predictor, feature_names, patient):
+    store = ScenarioStore(counting_predictor, patient.patient_id, feature_names[1])
+    counterfactual = CounterfactualPatient(patient)
+    save_scenario(store, "First", counterfactual, predictor, feature_names)
+    save_scenario(store, "Second", counterfactual, predictor, feature_names)
+
+    store.delete("First")
+    store.delete("Unknown")
+
+    assert list(store.scenarios) == ["Second"]
+    assert list(store.get_summary()["Scenario"]) == ["Second"]
+
+
+def test_summary_counts_only_the_changed_features(counting_predictor, predictor, feature_names,
+                                                  patient, patient_base):
+    store = ScenarioStore(counting_predictor, patient.patient_id, feature_names[1])
+    counterfactual = CounterfactualPatient(patient)
+    # What the What-if page writes back on a render without any user change.
+    counterfactual.update_demographics({"age": counterfactual.demographics["age"]})
+    counterfactual.update_features_with_scaling(
+        {feature: counterfactual.get_timeseries_average(feature)
+         for feature in ("heartrate", "tempc", "urineoutput", "norepinephrine_dose")}, patient_base)
+    save_scenario(store, "Untouched", counterfactual, predictor, feature_names)
+
+    counterfactual.update_demographics({"age": counterfactual.demographics["age"] + 10})
+    counterfactual.update_features_with_scaling(
+        {"heartrate": counterfactual.get_timeseries_average("heartrate") + 30}, patient_base)
+    save_scenario(store, "Older, tachycardic", counterfactual, predictor, feature_names)
+    store.score_dirty()
+
+    summary = store.get_summary()
+    assert list(summary.columns) == ["Scenario", "Risk (%)", "Changes"]
+    assert list(summary["Changes"]) == [0, 2]
+    assert summary["Risk (%)"].notna().all()
@@ -0,0 +1,97 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from src import sepsis_mortality_risk_predictor as predictor_module
+
+
+class FakePredictor:
+    failures = 0
+    threads = []
+
+    def __init__(self):
+        FakePredictor.threads.append(threading.current_thread().name)
+        if FakePredictor.failures:
+            FakePredictor.failures -= 1
+            raise RuntimeError("model file unavailable")
+        self.name = "predictor"
+
+
+@pytest.fixture
+def fake_predictor(monkeypatch):
+    monkeypatch.setattr(predictor_module, "SepsisMortalityRiskPredictor", FakePredictor)
+    FakePredictor.failures = 0
+    FakePredictor.threads = []
+    predictor_module.start_loading_prediction_model.clear()
+    yield FakePredictor
+    predictor_module.start_loading_prediction_model.clear()
+
+
+def test_model_is_loaded_once_on_its_own_thread(fake_predictor):
+    handle = predictor_module.get_prediction_model_handle()
+    other_handle = predictor_module.get_prediction_model_handle()
+
+    assert handle.name == "predictor"
+    assert other_handle.get() is handle.get()
+    assert len(fake_predictor.threads) == 1
+    assert fake_predictor.threads[0].startswith("prediction_model_loader")
+
+
+def test_failed_load_is_retried_on_next_access(fake_predictor):
+    fake_predictor.failures = 1
+    handle = predictor_module.get_prediction_model_handle()
+
+    with pytest.raises(RuntimeError):
+        handle.get()
+    assert handle.name == "predictor"
+    # Sessions started after the failure get the reloaded model as well.
+    assert predictor_module.get_prediction_model_handle().get() is handle.get()
+    assert len(fake_predictor.threads) == 2
+
+
+def test_shap_values_survive_concurrent_keras_session_clears(monkeypatch):
+    # Streamlit clears the Keras session at the end of every script run, also while a SHAP job runs.
+    keras = pytest.importorskip("keras")
+    pytest.importorskip("shap")
+    monkeypatch.setattr(predictor_module.SepsisMortalityRiskPredictor, "INFERENCE_BACKEND", "keras")
+    predictor = predictor_module.SepsisMortalityRiskPredictor()
+    rng = np.random.default_rng(0)
+    static_shape, timeseries_shape = (tuple(model_input.shape)[1:]
+                                      for model_input in predictor.load_prediction_model().inputs)
+    static = rng.uniform(0, 1, (10,) + static_shape).astype(np.float32)
+    timeseries = rng.uniform(0, 1, (10,) + timeseries_shape).astype(np.float32)
+    explainer = predictor.get_shap_explainer(static, timeseries)
+
+    stop = threading.Event()
+
+    def clear_sessions():
+        while not stop.is_set():
+            keras.backend.clear_session(free_memory=False)
+
+    clearer = threading.Thread(target=clear_sessions)
+    clearer.start()
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            shap_static, shap_timeseries = executor.submit(
+                predictor.compute_shap_values_batch, static[:2], timeseries[:2], explainer).result()
+    finally:
+        stop.set()
+        clearer.join()
+
+    assert shap_static.shape == (2,) + static_shape
+    assert shap_timeseries.shape == (2,) + timeseries_shape
+
+
+def test_collect_risk_reuses_the_prefetched_prediction(predictor, patient_store, feature_names):
+    from src.job_executor import get_job_executor, get_session_id
+    static_raw, timeseries_raw = patient_store.build_compact_patient(0).get_raw_ml_arrays(*feature_names)
+    static, timeseries = predictor.scale_raw_arrays(static_raw, timeseries_raw, *feature_names)
+    expected = float(predictor.predict_batch(static, timeseries)[0])
+
+    job_key = predictor.submit_risk_job("prefetched", static, timeseries)
+    assert job_key == (get_session_id(), "prefetched", "risk")
+    # The job's result is returned, not a new prediction of the given inputs.
+    assert predictor.collect_risk("prefetched", static * 0, timeseries * 0) == expected
+    assert not get_job_executor().has_job(job_key)
+
+    assert predictor.collect_risk("not prefetched", static, timeseries) == expected